@@ -0,0 +1,155 @@
+"""Site adapters: what the scrapers know about each news site, declared in sites.json.
+
+An adapter names the site's hosts, its list page, how the list is paginated, which
+article URLs to leave out, which elements the extractors read and the boilerplate
+trimmed from the text before analysis. The scraper class
+implementing a site is imported on first use, so listing the sites (e.g. for --help)
+doesn't load BeautifulSoup or httpx. A site whose pages can be read with CSS selectors
+alone needs no code: its adapter gives `links`, `title`, `content` and `timestamp`
+selectors for the generic `NewsScraper`.
+"""
+import importlib
+import json
+import os
+import threading
+from collections.abc import Mapping
+from typing import Dict, Iterator, NamedTuple, Optional, Tuple
+from urllib.parse import urlsplit
+
+SITES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sites.json")
+
+# BeautifulSoup tree builders `NewsScraper` can parse with. lxml is an optional install
+# and normalizes CRLF line breaks inside text to LF, unlike html.parser.
+PARSERS = ("html.parser", "lxml")
+
+# "next_link": each list page links to the next; "numbered": pages are `?<page_param>=N`
+PAGINATIONS = ("next_link", "numbered")
+
+GENERIC_SCRAPER = "news_scraper:NewsScraper"
+
+# `(tag, attribute, value)` of the elements kept when parsing partially, see `SelectorStrainer`
+Selector = Tuple[Optional[str], Optional[str], Optional[str]]
+
+
+class SiteAdapter(NamedTuple):
+    name: str
+    home: str  # Home page, e.g. "https://www.detik.com"
+    hosts: Tuple[str, ...] = ()  # Domains of the site's pages, subdomains included
+    scraper: str = GENERIC_SCRAPER  # "module:Class" implementing the site
+    list_path: str = "/tag/banjir"
+    pagination: str = "next_link"
+    page_param: str = "page"
+    list_prefetch: int = 1  # List pages fetched ahead of the one being consumed
+    follow_redirects: bool = False  # Whether article URLs redirect to the page itself
+    exclude: Tuple[str, ...] = ()  # Article URLs containing any of these are left out
+    list_selectors: Tuple[Selector, ...] = ()
+    article_selectors: Tuple[Selector, ...] = ()
+    # CSS selectors read by the generic extractors of `NewsScraper`
+    links: Optional[str] = None  # Article links of a list page
+    next_page: Optional[str] = None  # Next page link of a list page
+    title: Optional[str] = None
+    timestamp: Optional[str] = None
+    content: Optional[str] = None  # Paragraphs, joined with `content_separator`
+    content_separator: str = " "
+    # Regular expressions of site furniture removed from the scraped text before analysis
+    boilerplate: Tuple[str, ...] = ()
+
+    @classmethod
+    def from_dict(cls, name: str, spec: Dict) -> "SiteAdapter":
+        """Build the adapter of site `name` from its sites.json entry, checking it."""
+        unknown = set(spec) - set(cls._fields[1:])
+        if unknown:
+            raise ValueError(f"site {name}: unknown adapter keys {', '.join(sorted(unknown))}")
+        adapter = cls(name=name, **spec)._replace(
+            hosts=tuple(spec.get("hosts", ())),
+            exclude=tuple(spec.get("exclude", ())),
+            boilerplate=tuple(spec.get("boilerplate", ())),
+            list_selectors=tuple(tuple(selector) for selector in spec.get("list_selectors", ())),
+            article_selectors=tuple(tuple(selector) for selector in spec.get("article_selectors", ())),
+        )
+        if adapter.pagination not in PAGINATIONS:
+            raise ValueError(f"site {name}: pagination must be one of {', '.join(PAGINATIONS)}")
+        if any(len(selector) != 3 for selector in adapter.list_selectors + adapter.article_selectors):
+            raise ValueError(f"site {name}: selectors must be [tag, attribute, value]")
+        if adapter.scraper == GENERIC_SCRAPER and not (adapter.links and adapter.title and adapter.content):
+            raise ValueError(f"site {name}: needs links, title and content selectors, or a scraper")
+        return adapter
+
+    @property
+    def list_url(self) -> str:
+        """The list page crawled by default."""
+        return self.home.rstrip("/") + self.list_path
+
+    def matches(self, url: str) -> bool:
+        """Whether `url` is on one of the site's hosts."""
+        host = (urlsplit(url).hostname or "").lower()
+        return any(host == domain or host.endswith("." + domain) for domain in self.hosts)
+
+    def excluded(self, url: str) -> bool:
+        """Whether the article at `url` is left out, e.g. a video page."""
+        return any(pattern in url for pattern in self.exclude)
+
+
+class SiteRegistry(Mapping):
+    """Site adapters by name, read from `path` on first use.
+
+    Scraper classes are imported the first time a scraper of their site is created.
+    More sites can be added with `register`, e.g. by a plugin module.
+
+    Args:
+        path (str): JSON file mapping site names to adapter fields.
+    """
+
+    def __init__(self, path: str = SITES_PATH):
+        self.path = path
+        self._adapters: Optional[Dict[str, SiteAdapter]] = None
+        self._classes: Dict[str, type] = {}
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, SiteAdapter]:
+        with self._lock:
+            if self._adapters is None:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    specs = json.load(f)
+                self._adapters = {name: SiteAdapter.from_dict(name, spec) for name, spec in specs.items()}
+            return self._adapters
+
+    def __getitem__(self, name: str) -> SiteAdapter:
+        return self._load()[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._load())
+
+    def __len__(self) -> int:
+        return len(self._load())
+
+    def register(self, adapter: SiteAdapter):
+        """Add or replace the adapter of `adapter.name`."""
+        adapters = self._load()
+        with self._lock:
+            adapters[adapter.name] = adapter
+            self._classes.pop(adapter.name, None)
+
+    def for_url(self, url: str) -> Optional[SiteAdapter]:
+        """The adapter of the site `url` belongs to, None if unsupported."""
+        for adapter in self._load().values():
+            if adapter.matches(url):
+                return adapter
+        return None
+
+    def scraper_class(self, name: str) -> type:
+        """The scraper class of site `name`, imported on first use."""
+        if name not in self._classes:
+            module_name, _, class_name = self[name].scraper.partition(":")
+            self._classes[name] = getattr(importlib.import_module(module_name), class_name)
+        return self._classes[name]
+
+    def create(self, name: str, base_url: Optional[str] = None, **kwargs):
+        """A scraper of site `name` starting from `base_url` (its list page by default).
+        Keyword arguments are passed on to the scraper class."""
+        adapter = self[name]
+        return self.scraper_class(name)(base_url or adapter.list_url, adapter=adapter, **kwargs)
+
+
+# The sites of sites.json, shared by every command
+sites = SiteRegistry()
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+# Bits per SimHash and the number of bands it is split into for candidate lookup.
+# Two hashes within `BANDS - 1` bits of each other always share at least one band.
+SIMHASH_BITS = 64
+BANDS = 4
+BAND_BITS = SIMHASH_BITS // BANDS
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase and keep only the words, so whitespace and punctuation edits don't matter."""
+    return " ".join(WORD_RE.findall((text or "").lower()))
+
+
+def simhash(text: str, shingle: int = 3) -> int:
+    """64-bit SimHash over word shingles of already normalized `text`."""
+    words = text.split()
+    grams = [" ".join(words[i : i + shingle]) for i in range(max(1, len(words) - shingle + 1))]
+    weights = [0] * SIMHASH_BITS
+    for gram in grams:
+        value = int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit in range(SIMHASH_BITS) if weights[bit] > 0)
+
+
+def article_fingerprint(title: str, content: str) -> str:
+    """SimHash of an article's normalized title and content as 16 hex digits, shared by
+    syndicated and lightly edited copies of it."""
+    return f"{simhash(normalize_text(title) + chr(10) + normalize_text(content)):016x}"
+
+
+def bands(value: int) -> List[int]:
+    mask = (1 << BAND_BITS) - 1
+    return [value >> (i * BAND_BITS) & mask for i in range(BANDS)]
+
+
+class AnalysisCache:
+    """Persistent LLM results keyed by article text, prompt and model.
+
+    The exact key is a hash of the normalized title and content plus `fingerprint`,
+    which identifies the prompt template and model: changing either starts from an
+    empty cache. With `near_duplicates`, an article whose SimHash is within
+    `max_distance` bits of a cached one (a syndicated or lightly edited copy) reuses
+    that analysis too.
+
+    Args:
+        path (str): SQLite database file.
+        fingerprint (str): Hash of the prompt template and model.
+        near_duplicates (bool): Also match near-duplicate articles.
+        max_distance (int): Largest SimHash Hamming distance treated as a duplicate,
+            at most `BANDS - 1`.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        fingerprint: str,
+        near_duplicates: bool = False,
+        max_distance: int = 3,
+    ):
+        self.fingerprint = fingerprint
+        self.near_duplicates = near_duplicates
+        self.max_distance = min(max_distance, BANDS - 1)
+        self.hits = 0
+        self.near_hits = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            f"""
+            CREATE TABLE IF NOT EXISTS analyses (
+                key TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                simhash TEXT NOT NULL,
+                {", ".join(f"band{i} INTEGER NOT NULL" for i in range(BANDS))},
+                timestamp TEXT,
+                analysis TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            {"".join(f"CREATE INDEX IF NOT EXISTS analyses_band{i} ON analyses (fingerprint, band{i});" for i in range(BANDS))}
+            """
+        )
+        self._conn.commit()
+
+    def _key(self, normalized: str) -> str:
+        return hashlib.sha256(f"{self.fingerprint}\n{normalized}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _normalized(title: str, content: str) -> str:
+        return normalize_text(title) + "\n" + normalize_text(content)
+
+    def get(self, title: str, content: str) -> Optional[Dict]:
+        """Return the cached analysis for this article or a near duplicate, if any."""
+        normalized = self._normalized(title, content)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT analysis FROM analyses WHERE key = ?",
+                (self._key(normalized),),
+            ).fetchone()
+            if row is not None:
+                self.hits += 1
+                return json.loads(row[0])
+
+            if not self.near_duplicates:
+                return None
+
+            value = simhash(normalized)
+            conditions = " OR ".join(f"band{i} = ?" for i in range(BANDS))
+            candidates = self._conn.execute(
+                f"SELECT simhash, analysis FROM analyses WHERE fingerprint = ? AND ({conditions})",
+                (self.fingerprint, *bands(value)),
+            ).fetchall()
+
+        best = None
+        for candidate_hash, analysis in candidates:
+            distance = bin(int(candidate_hash, 16) ^ value).count("1")
+            if distance <= self.max_distance and (best is None or distance < best[0]):
+                best = (distance, analysis)
+        if best is None:
+            return None
+
+        with self._lock:
+            self.near_hits += 1
+        return json.loads(best[1])
+
+    def put(self, title: str, content: str, timestamp: str, analysis: Dict):
+        normalized = self._normalized(title, content)
+        value = simhash(normalized)
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO analyses VALUES (?, ?, ?, {', '.join('?' * BANDS)}, ?, ?, ?)",
+                (
+                    self._key(normalized),
+                    self.fingerprint,
+                    f"{value:016x}",
+                    *bands(value),
+                    timestamp,
+                    json.dumps(analysis, ensure_ascii=False),
+                    time.time(),
+                ),
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,151 @@
+import io
+import json
+import os
+import time
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
+
+from tqdm import tqdm
+
+from jsonl_io import write_json_array
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+# Batch states after which no more results will come
+FINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def output_text(body: Dict) -> str:
+    """Concatenate the `output_text` parts of a Responses API body, like `Response.output_text`."""
+    return "".join(
+        part.get("text", "")
+        for item in body.get("output") or []
+        if item.get("type") == "message"
+        for part in item.get("content") or []
+        if part.get("type") == "output_text"
+    )
+
+
+def build_batch_file(requests: List[Tuple[str, Dict]]) -> bytes:
+    """Encode `(custom_id, body)` pairs as a Batch API input JSONL file for /v1/responses."""
+    lines = [
+        json.dumps(
+            {
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/responses",
+                "body": body,
+            },
+            ensure_ascii=False,
+        )
+        for custom_id, body in requests
+    ]
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def submit_batch(client: "OpenAI", requests: List[Tuple[str, Dict]]) -> str:
+    """Upload the requests and start a batch. Returns the batch ID."""
+    batch_file = client.files.create(
+        file=("batch.jsonl", io.BytesIO(build_batch_file(requests))),
+        purpose="batch",
+    )
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/responses",
+        completion_window="24h",
+    )
+    return batch.id
+
+
+def wait_for_batches(client: "OpenAI", batch_ids: List[str], poll_interval: float) -> Iterator:
+    """Poll until every batch reached a final status, yielding each batch object as it does."""
+    done = set()
+    with tqdm(total=len(batch_ids), desc="Waiting for batches", unit="batch") as prog_bar:
+        while len(done) < len(batch_ids):
+            for batch_id in batch_ids:
+                if batch_id in done:
+                    continue
+                batch = client.batches.retrieve(batch_id)
+                if batch.status in FINAL_STATUSES:
+                    done.add(batch_id)
+                    prog_bar.update(1)
+                    yield batch
+            if len(done) < len(batch_ids):
+                time.sleep(poll_interval)
+
+
+def load_manifest(path: Optional[str]) -> List[Dict]:
+    """Batches submitted but not yet consumed, as `{"id", "custom_ids"}` entries."""
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(path: Optional[str], entries: List[Dict]):
+    """Replace the manifest at `path` atomically, removing it once no batch is outstanding."""
+    if not path:
+        return
+    if not entries:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    write_json_array(path, entries)
+
+
+def read_batch_output(client: "OpenAI", batch) -> Dict[str, str]:
+    """Map custom IDs to the model's output text for every successful request of a batch."""
+    results = {}
+    if not batch.output_file_id:
+        return results
+
+    for line in client.files.content(batch.output_file_id).text.splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        response = record.get("response") or {}
+        if record.get("error") or response.get("status_code") != 200:
+            continue
+        results[record["custom_id"]] = output_text(response.get("body") or {})
+    return results
+
+
+def run_batches(
+    client: "OpenAI",
+    requests: List[Tuple[str, Dict]],
+    batch_size: int,
+    poll_interval: float = 30.0,
+    manifest_path: Optional[str] = None,
+) -> Iterator[Dict[str, str]]:
+    """Send `(custom_id, body)` requests through the Batch API, `batch_size` requests per
+    batch, and yield the output of each batch as soon as it finishes.
+
+    With `manifest_path`, every batch ID is recorded there as soon as the batch is
+    submitted, and dropped once the caller has consumed its output (asked for the next
+    one). Batches left in the manifest by an interrupted run are waited for again
+    instead of being paid for twice: their requests are not resubmitted.
+
+    Yields:
+        Dict[str, str]: Output text by custom ID for one batch. Requests that failed, or
+            whose batch did not complete, are missing.
+    """
+    manifest = load_manifest(manifest_path)
+    if manifest:
+        tqdm.write(f"Waiting again for {len(manifest)} batches of the interrupted run")
+    submitted = {custom_id for entry in manifest for custom_id in entry["custom_ids"]}
+    requests = [(custom_id, body) for custom_id, body in requests if custom_id not in submitted]
+
+    for start in range(0, len(requests), batch_size):
+        chunk = requests[start : start + batch_size]
+        batch_id = submit_batch(client, chunk)
+        manifest.append({"id": batch_id, "custom_ids": [custom_id for custom_id, _ in chunk]})
+        save_manifest(manifest_path, manifest)
+        tqdm.write(f"Submitted batch {batch_id} with {len(chunk)} requests")
+
+    for batch in wait_for_batches(client, [entry["id"] for entry in manifest], poll_interval):
+        if batch.status != "completed":
+            tqdm.write(f"Batch {batch.id} ended as {batch.status}")
+        yield read_batch_output(client, batch)
+        manifest = [entry for entry in manifest if entry["id"] != batch.id]
+        save_manifest(manifest_path, manifest)
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""Offline benchmarks, one module per concern:
+
+- bench_parse.py: HTML fixtures and parser backends
+- bench_timestamps.py: the timestamp parser on the saved articles
+- bench_trim.py: prompt trimming and extraction quality
+- bench_memory.py: memory of reading the corpus
+- bench_startup.py: CLI start-up time
+- bench_run.py: end-to-end scrape and analysis runs
+"""
+import click
+
+from bench_memory import memory
+from bench_parse import make_fixtures, parse
+from bench_run import compare_runs, run
+from bench_startup import startup
+from bench_timestamps import timestamps
+from bench_trim import compare, trim
+
+
+@click.group()
+def cli():
+    """Offline benchmarks for the scrapers."""
+
+
+for command in (make_fixtures, parse, timestamps, trim, compare, memory, startup, run, compare_runs):
+    cli.add_command(command)
+
+
+if __name__ == "__main__":
+    cli()
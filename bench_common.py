@@ -0,0 +1,38 @@
+"""Helpers shared by the benchmarks in bench_*.py."""
+import json
+import math
+import multiprocessing
+import os
+from typing import Callable, Dict, List, Optional
+
+from adapters import sites
+
+# List page of every site in sites.json; scrapers are made with `sites.create`
+list_urls = {site: sites[site].list_url for site in sites}
+
+
+def load_saved_articles(site: str) -> List[Dict]:
+    articles = []
+    for filename in sorted(os.listdir(site)):
+        if filename.endswith(".json"):
+            with open(os.path.join(site, filename), "r", encoding="utf-8") as f:
+                articles.extend(json.load(f))
+    return articles
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile `q` (0-100) of `values`, None if there are none."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def in_fresh_process(fn: Callable, *args):
+    """Call `fn(*args)` in a new interpreter, so its peak RSS and imports are its own."""
+    pool = multiprocessing.get_context("spawn").Pool(1)
+    try:
+        return pool.apply(fn, args)
+    finally:
+        pool.close()
+        pool.join()
@@ -0,0 +1,93 @@
+"""Peak memory of reading the corpus for analysis."""
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, Tuple
+
+import click
+
+from bench_common import in_fresh_process, list_urls, load_saved_articles
+from corpus_index import CorpusIndex
+from jsonl_io import iter_records
+
+
+# Ways of reading the corpus for analysis compared by `memory`
+LOADERS = {
+    "dicts": "every article as a full dict (the old load_articles)",
+    "articles": "every pending article as an Article, content left on disk (--batch)",
+    "stream": "pending Articles one at a time (the concurrent analysis loop)",
+}
+
+
+def build_corpus(workdir: str, copies: int):
+    """Write the saved articles of every source `copies` times, under distinct URLs,
+    into `workdir/<source>/` as scrape-bulk JSON files."""
+    for site in list_urls:
+        articles = load_saved_articles(site)
+        os.makedirs(os.path.join(workdir, site))
+        for copy in range(copies):
+            with open(os.path.join(workdir, site, f"articles_{copy:04d}.json"), "w", encoding="utf-8") as f:
+                json.dump(
+                    [{**article, "url": f"{article['url']}?copy={copy}"} for article in articles],
+                    f,
+                    ensure_ascii=False,
+                    indent=2,
+                )
+
+
+def measure_loader(workdir: str, loader: str) -> Dict:
+    """Read every article and its content with `loader` and measure the Python heap at
+    its peak, past the corpus index refresh."""
+    os.chdir(workdir)
+    index = CorpusIndex(os.path.join(workdir, "corpus_index.db"))
+    for site in list_urls:
+        index.refresh_source(site)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = 0
+    if loader == "dicts":
+        held = [record for site in list_urls for record in iter_records(site)]
+    elif loader == "articles":
+        held = [article for site in list_urls for article in index.iter_unanalyzed(site)]
+    else:
+        held = (article for site in list_urls for article in index.iter_unanalyzed(site))
+    for article in held:
+        count += 1
+        len(article.get("content") or "")
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"articles": count, "peak_mb": round(peak / 2**20, 2), "seconds": round(elapsed, 3)}
+
+
+@click.command()
+@click.option("--scale", type=click.IntRange(min=1), multiple=True, default=(1, 4, 16), show_default=True, help="Copies of the saved articles in the corpus, repeatable")
+def memory(scale: Tuple[int, ...]):
+    """Compare the peak memory of reading the corpus for analysis, eagerly and lazily.
+
+    The saved articles are copied `--scale` times into a scratch corpus, and each loader
+    runs in a fresh process reading every article and its content. Peak is the Python
+    heap (tracemalloc) while reading, after the corpus index is built.
+    """
+    for loader, description in LOADERS.items():
+        click.echo(f"{loader:<9} {description}")
+    for copies in scale:
+        with tempfile.TemporaryDirectory() as workdir:
+            build_corpus(workdir, copies)
+            size = sum(
+                os.path.getsize(os.path.join(workdir, site, filename))
+                for site in list_urls
+                for filename in os.listdir(os.path.join(workdir, site))
+            )
+            for loader in LOADERS:
+                if os.path.exists(os.path.join(workdir, "corpus_index.db")):
+                    os.remove(os.path.join(workdir, "corpus_index.db"))
+                result = in_fresh_process(measure_loader, workdir, loader)
+                click.echo(
+                    f"{copies:>3}x ({size / 2**20:6.1f} MB, {result['articles']:>6} articles)  {loader:<9}"
+                    f"  peak {result['peak_mb']:8.2f} MB  {result['peak_mb'] * 2**20 / result['articles']:>8.0f} B/article"
+                    f"  {result['seconds']:6.2f} s"
+                )
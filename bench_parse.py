@@ -0,0 +1,194 @@
+"""HTML fixtures built from the saved articles, and the parser benchmark."""
+import json
+import os
+import random
+import time
+from html import escape
+from typing import Dict, List
+
+import click
+from bs4.builder import builder_registry
+
+from adapters import PARSERS, sites
+from bench_common import list_urls, load_saved_articles
+from fake_sites import FIXTURES_DIR, detik_list, kompas_list, load_fixtures, page_chrome, tribunnews_list
+
+
+def split_paragraphs(content: str, separator: str) -> List[str]:
+    """Split saved `content` back into paragraphs that re-join to exactly `content`.
+
+    Scrapers join stripped paragraphs, so leading, trailing and repeated separators in
+    `content` come from empty paragraphs and are turned back into them.
+    """
+    if separator == "\n":
+        return content.split("\n")
+
+    words = content.split(" ")
+    paragraphs, current = [], []
+    for i, word in enumerate(words):
+        if not current and not word:
+            paragraphs.append("")
+            continue
+        current.append(word)
+        # Close paragraphs at a sentence end after a few dozen words, unless the next
+        # paragraph would then start with whitespace that stripping drops
+        next_word = words[i + 1] if i + 1 < len(words) else ""
+        if word.endswith(".") and len(current) >= 40 and next_word[:1].strip():
+            paragraphs.append(" ".join(current))
+            current = []
+
+    trailing = 0
+    while current and not current[-1]:
+        current.pop()
+        trailing += 1
+    if current:
+        paragraphs.append(" ".join(current))
+    return paragraphs + [""] * trailing
+
+
+def paragraphs_html(content: str, separator: str) -> str:
+    return "".join(f"<p>{escape(p)}</p>" for p in split_paragraphs(content, separator))
+
+
+def detik_article(article: Dict) -> str:
+    if "wolipop.detik.com" in article["url"]:
+        return f"""<div class="itp_detail"><h1 class="itp_title_detail">{escape(article["title"])}</h1>
+<div class="text-black-light3">{escape(article["timestamp"])}</div>
+<div class="itp_bodycontent">{paragraphs_html(article["content"], " ")}</div></div>"""
+    return f"""<article class="detail">
+<div class="detail__header"><h1 class="detail__title">
+{escape(article["title"])}
+</h1><div class="detail__author">Tim detikNews</div>
+<div class="detail__date">{escape(article["timestamp"])}</div></div>
+<div class="detail__media"><figure><img src="https://akcdn.detik.net.id/x.jpg"></figure></div>
+<div class="detail__body itp_bodycontent_wrapper"><div class="detail__body-text itp_bodycontent">
+{paragraphs_html(article["content"], " ")}
+<div class="parallaxindetail"><script>loadAds("parallax")</script></div>
+</div></div></article>"""
+
+
+def kompas_article(article: Dict) -> str:
+    return f"""<div class="read__header"><h1 class="read__title">{escape(article["title"])}</h1>
+<div class="read__time">{escape(article["timestamp"])}</div></div>
+<div class="read__article clearfix"><div class="read__content"><div class="clearfix">
+{paragraphs_html(article["content"], " ")}
+</div></div></div>"""
+
+
+def tribunnews_article(article: Dict) -> str:
+    return f"""<div id="article"><h1 id="arttitle">{escape(article["title"])}</h1>
+<div class="mt10"><time class="grey"><span>{escape(article["timestamp"])}</span></time></div>
+<div class="side-article txt-article multi-fontsize">
+{paragraphs_html(article["content"], chr(10))}
+</div></div>"""
+
+
+templates = {
+    "detik": (detik_list, detik_article),
+    "kompas": (kompas_list, kompas_article),
+    "tribunnews": (tribunnews_list, tribunnews_article),
+}
+
+
+@click.command()
+@click.option("--fixtures", "fixtures_dir", type=click.Path(), default=FIXTURES_DIR, show_default=True)
+@click.option("--articles", type=int, default=5, show_default=True, help="Article pages per site")
+@click.option("--list-pages", type=int, default=2, show_default=True, help="List pages per site")
+@click.option("--per-page", type=int, default=20, show_default=True, help="Article links per list page")
+def make_fixtures(fixtures_dir: str, articles: int, list_pages: int, per_page: int):
+    """Build HTML fixtures in each site's page layout from the saved articles.
+
+    Article fixtures re-create pages whose extracted fields equal the saved records,
+    so the parsers can be checked and timed without network access.
+    """
+    for site, (list_template, article_template) in templates.items():
+        rng = random.Random(site)
+        saved = load_saved_articles(site)
+        site_dir = os.path.join(fixtures_dir, site)
+        os.makedirs(site_dir, exist_ok=True)
+        index = []
+
+        base_url = list_urls[site]
+        urls = [article["url"] for article in saved]
+        for page in range(1, list_pages + 1):
+            page_urls = urls[(page - 1) * per_page : page * per_page]
+            filename = f"list_{page}.html"
+            with open(os.path.join(site_dir, filename), "w", encoding="utf-8", newline="") as f:
+                f.write(page_chrome(rng, site, list_template(page_urls, f"{base_url}?page={page + 1}")))
+            index.append(
+                {
+                    "kind": "list",
+                    "url": f"{base_url}?page={page}",
+                    "file": filename,
+                    "expected": {"links": page_urls, "next": f"{base_url}?page={page + 1}"},
+                }
+            )
+
+        picked = saved[:articles]
+        # Include a page with CRLF line breaks in its text, which parsers treat differently
+        picked += [article for article in saved if "\r" in article["content"]][:1]
+        for i, article in enumerate(picked, start=1):
+            filename = f"article_{i}.html"
+            with open(os.path.join(site_dir, filename), "w", encoding="utf-8", newline="") as f:
+                f.write(page_chrome(rng, site, article_template(article)))
+            index.append(
+                {"kind": "article", "url": article["url"], "file": filename, "expected": article}
+            )
+
+        with open(os.path.join(site_dir, "index.json"), "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False, indent=2)
+        click.echo(f"{site}: {len(index)} fixtures written to {site_dir}")
+
+
+def same_but_line_endings(extracted: Dict, expected: Dict) -> bool:
+    """Whether two extracted articles only differ in CRLF against LF line breaks."""
+    extracted_json, expected_json = (json.dumps(article) for article in (extracted, expected))
+    return extracted_json.replace("\\r\\n", "\\n") == expected_json.replace("\\r\\n", "\\n")
+
+
+@click.command()
+@click.option("--fixtures", "fixtures_dir", type=click.Path(exists=True), default=FIXTURES_DIR, show_default=True)
+@click.option("--repeat", type=int, default=20, show_default=True, help="Parses per fixture and backend")
+def parse(fixtures_dir: str, repeat: int):
+    """Time every parser backend on the article fixtures and check their output matches."""
+    results = {}
+    for site, base_url in list_urls.items():
+        entries = [entry for entry in load_fixtures(fixtures_dir, site) if entry["kind"] == "article"]
+        baseline = None
+
+        for parser in PARSERS:
+            if builder_registry.lookup(parser) is None:
+                click.echo(f"{site:<11} {parser:<26} skipped, not installed")
+                continue
+            for partial_parse in (False, True):
+                scraper = sites.create(site, base_url, parser=parser, partial_parse=partial_parse)
+                label = f"{parser}{' + strainer' if partial_parse else ''}"
+
+                extracted = [
+                    scraper.parse_article(scraper.make_soup(entry["html"], scraper.article_strainer), entry["url"])
+                    for entry in entries
+                ]
+                if baseline is None:
+                    # html.parser over the full document is what the scrapers always did
+                    baseline = extracted
+                    expected = [entry["expected"] for entry in entries]
+                else:
+                    expected = baseline
+                mismatches = sum(e != b for e, b in zip(extracted, expected))
+                line_endings = sum(
+                    e != b and same_but_line_endings(e, b) for e, b in zip(extracted, expected)
+                )
+
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    for entry in entries:
+                        scraper.make_soup(entry["html"], scraper.article_strainer)
+                elapsed = (time.perf_counter() - start) / (repeat * len(entries))
+
+                results.setdefault(site, {})[label] = elapsed
+                speedup = results[site]["html.parser"] / elapsed
+                click.echo(
+                    f"{site:<11} {label:<26} {elapsed * 1000:8.2f} ms/page  {speedup:5.1f}x  "
+                    f"{'identical' if not mismatches else f'{mismatches} MISMATCHES'}"
+                    f"{f' ({line_endings} in line endings only)' if line_endings else ''}"
+                )
@@ -0,0 +1,305 @@
+"""End-to-end scrape and analysis benchmark against the fake servers, and run comparison."""
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional
+
+import click
+from bs4.builder import builder_registry
+
+from adapters import PARSERS, sites
+from bench_common import in_fresh_process, list_urls, load_saved_articles, percentile
+from crawl_state import CrawlState
+from fake_sites import FIXTURES_DIR
+from metrics import registry
+from jsonl_io import JsonlWriter, iter_records
+from scrape import record_failures, record_saved
+
+
+BENCH_RESULTS_DIR = "bench_results"
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far, in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+class Timings:
+    """Wall time per call and total thread CPU time of the functions wrapped with
+    `latency` and `cpu_time`, which may run on several threads at once."""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.cpu = 0.0
+        self._lock = threading.Lock()
+
+    def latency(self, fn: Callable) -> Callable:
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self.latencies.append(elapsed)
+
+        return wrapper
+
+    def cpu_time(self, fn: Callable) -> Callable:
+        def wrapper(*args, **kwargs):
+            start = time.thread_time()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.thread_time() - start
+                with self._lock:
+                    self.cpu += elapsed
+
+        return wrapper
+
+    def metrics(self, articles: int, failed: int, elapsed: float, cpu: float) -> Dict:
+        """Throughput, latency, CPU and memory figures of a finished scenario."""
+
+        def ms(value: Optional[float]) -> Optional[float]:
+            return round(value * 1000, 2) if value is not None else None
+
+        return {
+            "articles": articles,
+            "failed": failed,
+            "seconds": round(elapsed, 3),
+            "articles_per_sec": round(articles / elapsed, 2) if elapsed else None,
+            "latency_p50_ms": ms(percentile(self.latencies, 50)),
+            "latency_p99_ms": ms(percentile(self.latencies, 99)),
+            "cpu_seconds": round(cpu, 3),
+            "parse_cpu_seconds": round(self.cpu, 3),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+        }
+
+
+def bench_scrape(site: str, base_url: str, limit: int, concurrency: int, parser: str, partial_parse: bool) -> Dict:
+    """Run what `scrape.py scrape-bulk --format jsonl` does for one site and measure it.
+
+    Latency is timed per article (fetch, parse and extraction); parse CPU is the thread
+    CPU time spent building soups and extracting fields.
+    """
+    scraper = sites.create(site, base_url, concurrency=concurrency, parser=parser, partial_parse=partial_parse)
+    timings = Timings()
+    scraper.scrape_article = timings.latency(scraper.scrape_article)
+    scraper.make_soup = timings.cpu_time(scraper.make_soup)
+    scraper.parse_article = timings.cpu_time(scraper.parse_article)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        state = CrawlState(os.path.join(workdir, "crawl_state.db"))
+        start, cpu_start = time.perf_counter(), time.process_time()
+        with JsonlWriter(workdir) as writer:
+            article_urls = scraper.iter_list_page(limit=limit, skip=state.is_known)
+            for result in record_failures(scraper.scrape_articles(article_urls, total=limit), state, scraper):
+                with registry.span("write", site=site):
+                    writer.write(result)
+                record_saved([result], state, scraper)
+        elapsed, cpu = time.perf_counter() - start, time.process_time() - cpu_start
+        state.close()
+    failed = len(timings.latencies) - writer.records_written
+    metrics = timings.metrics(writer.records_written, failed, elapsed, cpu)
+    # Seconds per stage from the scraper's own instrumentation, summed over workers
+    metrics["stages"] = {stage: round(seconds, 3) for stage, (_, seconds) in registry.stage_totals().items()}
+    return metrics
+
+
+def bench_analysis(llm_url: str, articles: int, concurrency: int) -> Dict:
+    """Run `analyze.py` on the first `articles` saved articles of each source and measure it.
+
+    It runs in a scratch directory, without the analysis cache, against `llm_url`.
+    Latency is timed per article sent to the model; parse CPU is the thread CPU time of
+    prefiltering, trimming, answer parsing and building the records.
+    """
+    saved = {site: load_saved_articles(site)[:articles] for site in list_urls}
+    workdir = tempfile.mkdtemp()
+    os.chdir(workdir)
+    for site, records in saved.items():
+        os.makedirs(site)
+        with open(os.path.join(site, "articles.json"), "w", encoding="utf-8") as f:
+            json.dump(records, f, ensure_ascii=False)
+
+    os.environ.update(OPENAI_BASE_URL=f"{llm_url}/v1", OPENAI_API_KEY="fake")
+    import analyze
+
+    timings = Timings()
+    analyze.analyze_article = timings.latency(analyze.analyze_article)
+    for name in ("prefilter_analysis", "prompt_content", "parse_analysis", "build_analyzed_article"):
+        setattr(analyze, name, timings.cpu_time(getattr(analyze, name)))
+
+    start, cpu_start = time.perf_counter(), time.process_time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        analyze.main(["--concurrency", str(concurrency), "--no-cache"], standalone_mode=False)
+    elapsed, cpu = time.perf_counter() - start, time.process_time() - cpu_start
+
+    analyzed = sum(1 for _ in iter_records("analyzed"))
+    total = sum(len(records) for records in saved.values())
+    metrics = timings.metrics(analyzed, total - analyzed, elapsed, cpu)
+    metrics["sent_to_model"] = len(timings.latencies)
+    shutil.rmtree(workdir, ignore_errors=True)
+    return metrics
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def local_server(script: str, *args: str) -> Iterator[str]:
+    """Run `script` (fake_sites.py or fake_openai.py) on a free port and yield its URL."""
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), script), "--port", str(port), *args],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                break
+            except OSError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise click.ClickException(f"{script} did not start")
+                time.sleep(0.05)
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def format_metrics(name: str, metrics: Dict) -> str:
+    return (
+        f"{name:<11} {metrics['articles']:>5} articles  {metrics['articles_per_sec']:8.1f}/s  "
+        f"p50 {metrics['latency_p50_ms'] or 0:8.1f} ms  p99 {metrics['latency_p99_ms'] or 0:8.1f} ms  "
+        f"parse CPU {metrics['parse_cpu_seconds']:6.2f} s  CPU {metrics['cpu_seconds']:6.2f} s  "
+        f"peak RSS {metrics['peak_rss_mb']:6.1f} MB"
+    )
+
+
+@click.command()
+@click.option("--articles", type=click.IntRange(min=1), default=100, show_default=True, help="Articles scraped per site and analyzed per source")
+@click.option("--concurrency", "-c", type=click.IntRange(min=1), default=8, show_default=True, help="Concurrent articles when scraping and analyzing")
+@click.option("--site-latency", type=float, default=0.05, show_default=True, help="Mean seconds per response of the fake sites")
+@click.option("--llm-latency", type=float, default=0.2, show_default=True, help="Mean seconds per response of the fake LLM")
+@click.option("--parser", type=click.Choice(PARSERS), default="html.parser", show_default=True)
+@click.option("--partial-parse", is_flag=True, help="Only build the parts of the page the extractors read")
+@click.option("--only", type=click.Choice(["scrape", "analysis"]), default=None, help="Run one of the two benchmarks")
+@click.option("--fixtures", "fixtures_dir", type=click.Path(exists=True, file_okay=False), default=FIXTURES_DIR, show_default=True)
+@click.option("--output", "output_dir", type=click.Path(file_okay=False), default=BENCH_RESULTS_DIR, show_default=True, help="Folder the results are saved to")
+def run(
+    articles: int,
+    concurrency: int,
+    site_latency: float,
+    llm_latency: float,
+    parser: str,
+    partial_parse: bool,
+    only: Optional[str],
+    fixtures_dir: str,
+    output_dir: str,
+):
+    """Benchmark scrape-bulk and the analysis loop offline and save the results as JSON.
+
+    The scrapers crawl the HTML fixtures served by fake_sites.py and analyze.py calls
+    fake_openai.py, both with the given latency. Every benchmark runs in a new process
+    so that its peak RSS is its own. Compare saved runs with `compare-runs`.
+    """
+    if builder_registry.lookup(parser) is None:
+        raise click.ClickException(f"Parser {parser} is not installed")
+    # Progress bars would interleave with the report; tqdm reads this when imported
+    os.environ["TQDM_DISABLE"] = "1"
+
+    results = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "options": {
+            "articles": articles,
+            "concurrency": concurrency,
+            "site_latency": site_latency,
+            "llm_latency": llm_latency,
+            "parser": parser,
+            "partial_parse": partial_parse,
+        },
+    }
+
+    if only != "analysis":
+        results["scrape"] = {}
+        with local_server(
+            "fake_sites.py", "--articles", str(articles), "--latency", str(site_latency), "--fixtures", fixtures_dir
+        ) as sites_url:
+            for site in list_urls:
+                metrics = in_fresh_process(
+                    bench_scrape, site, f"{sites_url}/{site}/list", articles, concurrency, parser, partial_parse
+                )
+                results["scrape"][site] = metrics
+                click.echo(format_metrics(site, metrics))
+
+    if only != "scrape":
+        with local_server("fake_openai.py", "--latency", str(llm_latency)) as llm_url:
+            metrics = in_fresh_process(bench_analysis, llm_url, articles, concurrency)
+        results["analysis"] = metrics
+        click.echo(format_metrics("analysis", metrics))
+
+    os.makedirs(output_dir, exist_ok=True)
+    output_file = os.path.join(output_dir, f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    click.echo(f"Results saved to {output_file}")
+
+
+def scenario_metrics(results: Dict) -> Dict[str, Dict]:
+    scenarios = dict(results.get("scrape", {}))
+    if "analysis" in results:
+        scenarios["analysis"] = results["analysis"]
+    return scenarios
+
+
+@click.command()
+@click.argument("baseline", type=click.File("r", encoding="utf-8"))
+@click.argument("candidate", type=click.File("r", encoding="utf-8"))
+def compare_runs(baseline, candidate):
+    """Show how each metric changed between two saved `run` results."""
+    old, new = json.load(baseline), json.load(candidate)
+    if old.get("options") != new.get("options"):
+        click.echo(f"Options differ: {old.get('options')} vs {new.get('options')}")
+
+    old_scenarios, new_scenarios = scenario_metrics(old), scenario_metrics(new)
+    for name, metrics in new_scenarios.items():
+        if name not in old_scenarios:
+            continue
+        click.echo(f"{name} ({old.get('commit')} -> {new.get('commit')})")
+        for metric, value in metrics.items():
+            before = old_scenarios[name].get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(before, (int, float)):
+                continue
+            change = f"{(value - before) / before:+7.1%}" if before else ""
+            click.echo(f"  {metric:<18} {before:>10} -> {value:>10}  {change}")
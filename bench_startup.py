@@ -0,0 +1,67 @@
+"""Start-up time of short CLI invocations."""
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import click
+
+from bench_common import percentile
+
+
+# Short CLI invocations timed by `startup`
+STARTUP_COMMANDS = [
+    ["-c", "pass"],
+    ["scrape.py", "--help"],
+    ["scrape.py", "scrape-bulk", "--help"],
+    ["analyze.py", "--help"],
+    ["pipeline.py", "--help"],
+    ["export.py", "--help"],
+    ["flood_cube.py", "--help"],
+]
+
+# Packages worth keeping out of a short invocation
+HEAVY_IMPORTS = ("bs4", "httpx", "openai", "tqdm", "lxml", "tiktoken", "detik", "kompas", "tribunnews")
+
+
+def python_command(command: List[str]) -> List[str]:
+    """`command` run by this interpreter, with the script taken from this directory."""
+    if command[0].endswith(".py"):
+        command = [os.path.join(os.path.dirname(os.path.abspath(__file__)), command[0]), *command[1:]]
+    return [sys.executable, *command]
+
+
+def imported_packages(command: List[str], env: Dict[str, str]) -> List[str]:
+    """The `HEAVY_IMPORTS` a run of `command` imports, from `python -X importtime`."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", *python_command(command)[1:]], env=env, capture_output=True, text=True
+    ).stderr
+    names = {line.rpartition("|")[2].strip() for line in stderr.splitlines() if line.startswith("import time:")}
+    return [name for name in HEAVY_IMPORTS if name in names]
+
+
+@click.command()
+@click.option("--repeat", type=click.IntRange(min=1), default=10, show_default=True, help="Runs per command")
+def startup(repeat: int):
+    """Time short CLI invocations (--help) from process start to exit.
+
+    Each command runs `--repeat` times in a new interpreter; the median and fastest
+    wall times are shown, with the heavy packages the invocation imported. `-c pass`
+    is the interpreter's own startup, which no change to this code can remove.
+    """
+    env = {**os.environ, "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "bench")}
+    # Warm the bytecode and OS caches, so the first command isn't charged for them
+    for command in STARTUP_COMMANDS:
+        subprocess.run(python_command(command), env=env, capture_output=True)
+    for command in STARTUP_COMMANDS:
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.run(python_command(command), env=env, capture_output=True, check=True)
+            times.append((time.perf_counter() - start) * 1000)
+        heavy = imported_packages(command, env)
+        click.echo(
+            f"{' '.join(command):<28} median {percentile(times, 50):7.1f} ms  min {min(times):7.1f} ms"
+            f"  imports {', '.join(heavy) or '-'}"
+        )
@@ -0,0 +1,59 @@
+"""The timestamp parser on the saved articles."""
+import os
+import time
+from datetime import datetime
+
+import click
+
+from bench_common import list_urls, load_saved_articles
+from jsonl_io import iter_records
+from timestamps import parse_timestamp
+
+
+@click.command()
+@click.option("--repeat", type=int, default=20, show_default=True, help="Passes over the saved timestamps")
+def timestamps(repeat: int):
+    """Run the timestamp parser on the saved articles and time it.
+
+    Parsed values are also compared, as instants, with the `published_time` the LLM
+    returned for the same articles in analyzed/. The parser's case table is in
+    test_timestamps.py.
+    """
+    llm_times = {}
+    if os.path.exists("analyzed"):
+        llm_times = {
+            record["url"]: record["published_time"]
+            for record in iter_records("analyzed")
+            if record.get("published_time")
+        }
+
+    all_texts = []
+    for site in list_urls:
+        texts = [(article["url"], article.get("timestamp")) for article in load_saved_articles(site)]
+        all_texts.extend(text for _, text in texts)
+        parsed = {url: parse_timestamp(text) for url, text in texts}
+        unparsed = sum(value is None for value in parsed.values())
+
+        compared = disagreements = 0
+        for url, value in parsed.items():
+            llm_value = llm_times.get(url)
+            if value is None or llm_value is None:
+                continue
+            try:
+                llm_instant = datetime.fromisoformat(llm_value)
+            except ValueError:
+                llm_instant = None
+            compared += 1
+            if llm_instant is None or llm_instant.tzinfo is None or llm_instant != datetime.fromisoformat(value):
+                disagreements += 1
+        click.echo(
+            f"{site:<11} {len(texts) - unparsed}/{len(texts)} parsed  "
+            f"{disagreements}/{compared} differ from the LLM"
+        )
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in all_texts:
+            parse_timestamp(text)
+    elapsed = (time.perf_counter() - start) / (repeat * len(all_texts))
+    click.echo(f"parse_timestamp {elapsed * 1e6:.2f} us/timestamp over {len(all_texts)} timestamps")
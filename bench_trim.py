@@ -0,0 +1,109 @@
+"""Prompt content trimming and extraction quality of analysis runs."""
+import os
+import time
+from typing import Dict, List
+
+import click
+
+from bench_common import list_urls, load_saved_articles
+from content_trim import ContentTrimmer
+from corpus_index import file_records
+from gazetteer import Gazetteer
+from jsonl_io import iter_records
+
+
+def load_results(path: str) -> Dict[str, Dict]:
+    """Analysis results by URL, from a result file or a folder of them."""
+    if os.path.isdir(path):
+        records = iter_records(path)
+    else:
+        records = (record for _, _, record in file_records(path))
+    return {record["url"]: record for record in records if record.get("url")}
+
+
+def area_names(gazetteer: Gazetteer, areas) -> set:
+    return {
+        area["regency_or_city"] or area["province"]
+        for area in gazetteer.normalize_areas(areas)
+    }
+
+
+@click.command()
+@click.option("--max-tokens", type=int, default=800, show_default=True, help="Content token budget, 0 for no limit")
+@click.option("--baseline", type=click.Path(exists=True), default="analyzed", show_default=True, help="Analysis results to check against")
+def trim(max_tokens: int, baseline: str):
+    """Measure prompt content trimming per source on the saved articles.
+
+    As an offline regression check, the affected areas of the baseline results whose
+    names appear in an article's full text are looked for again in its trimmed text,
+    and so is the word "banjir". Names are matched as substrings, since some Tribunnews
+    text lost the spaces around linked words ("diterjangbanjirSabtu").
+    """
+    gazetteer = Gazetteer.load()
+    trimmer = ContentTrimmer(gazetteer, max_tokens=max_tokens or None)
+    results = load_results(baseline)
+    places = {place.canonical: place for place in gazetteer.places}
+
+    for site in list_urls:
+        kept_areas = total_areas = kept_flood = total_flood = 0
+        start = time.perf_counter()
+        articles = load_saved_articles(site)
+        for article in articles:
+            content = (article.get("content") or "").lower()
+            trimmed = trimmer.trim(site, article.get("content") or "").lower()
+
+            if "banjir" in content:
+                total_flood += 1
+                kept_flood += "banjir" in trimmed
+            result = results.get(article["url"])
+            if not result:
+                continue
+            for name in area_names(gazetteer, result.get("affected_areas")):
+                place = places.get(name)
+                if place and place.name.lower() in content:
+                    total_areas += 1
+                    kept_areas += place.name.lower() in trimmed
+        elapsed = (time.perf_counter() - start) / max(len(articles), 1)
+
+        stats = trimmer.stats.get(site, {"articles": 0, "tokens_before": 0, "tokens_after": 0})
+        saved = stats["tokens_before"] - stats["tokens_after"]
+        click.echo(
+            f"{site:<11} {stats['tokens_before']:>8} -> {stats['tokens_after']:>8} tokens  "
+            f"{saved / max(stats['tokens_before'], 1):4.0%} saved  "
+            f"areas kept {kept_areas}/{total_areas}  \"banjir\" kept {kept_flood}/{total_flood}  "
+            f"{elapsed * 1000:.2f} ms/article"
+        )
+
+
+@click.command()
+@click.argument("baseline", type=click.Path(exists=True))
+@click.argument("candidate", type=click.Path(exists=True))
+def compare(baseline: str, candidate: str):
+    """Compare two analysis runs (result files or folders) article by article.
+
+    Use it to check that a prompt or trimming change keeps extraction quality, with the
+    existing analyzed/ results as BASELINE.
+    """
+    gazetteer = Gazetteer.load()
+    expected, got = load_results(baseline), load_results(candidate)
+    by_source: Dict[str, List] = {}
+    for url in expected.keys() & got.keys():
+        by_source.setdefault(expected[url].get("source"), []).append(url)
+
+    for source, urls in sorted(by_source.items(), key=lambda item: str(item[0])):
+        same_severity = same_time = 0
+        overlap = 0.0
+        for url in urls:
+            a, b = expected[url], got[url]
+            same_severity += str(a.get("flood_severity")).lower() == str(b.get("flood_severity")).lower()
+            same_time += a.get("flood_time") == b.get("flood_time")
+            areas_a = area_names(gazetteer, a.get("affected_areas"))
+            areas_b = area_names(gazetteer, b.get("affected_areas"))
+            union = areas_a | areas_b
+            overlap += len(areas_a & areas_b) / len(union) if union else 1.0
+        click.echo(
+            f"{str(source):<11} {len(urls):>5} articles  severity {same_severity / len(urls):4.0%}  "
+            f"flood_time {same_time / len(urls):4.0%}  areas (Jaccard) {overlap / len(urls):4.0%}"
+        )
+    if not by_source:
+        click.echo("No articles in common")
@@ -0,0 +1,148 @@
+import functools
+import re
+import threading
+from typing import Dict, List, Optional, Pattern
+
+from adapters import sites
+from gazetteer import Gazetteer
+from llm import count_tokens
+
+READ_ALSO_RE = re.compile(r"Baca juga\s*:\s*", re.IGNORECASE)
+
+# Lowercase words that appear inside Title Case headlines
+HEADLINE_CONNECTORS = {
+    "di", "ke", "dari", "dan", "atau", "yang", "untuk", "agar", "saat", "usai", "hingga",
+    "sampai", "dengan", "akibat", "karena", "jadi", "tak", "tidak", "bisa", "ini", "itu",
+    "pada", "oleh", "vs", "&",
+}
+
+# Some Tribunnews paragraphs were joined without a space ("katanya.Warga"), so a
+# period directly followed by a capital also ends a sentence
+SENTENCE_RE = re.compile(r"(?<=[.!?\"”])\s+(?=[\"“A-Z0-9])|(?<=[a-z][.!?])(?=[A-Z])|\n+")
+
+# Sentence cues for the extracted fields: impact (severity) and time (flood_time)
+IMPACT_RE = re.compile(
+    r"\b(tewas|meninggal|korban|hilang|luka|mengungsi|pengungsi|evakuasi|dievakuasi|rusak|"
+    r"hanyut|jebol|longsor|terdampak|ketinggian|sentimeter|cm|meter|rumah|jiwa|KK)\b",
+    re.IGNORECASE,
+)
+TIME_RE = re.compile(
+    r"\b(Senin|Selasa|Rabu|Kamis|Jumat|Sabtu|Minggu|pukul|sejak|kemarin|dini hari|"
+    r"pagi|siang|sore|malam|\d{1,2}/\d{1,2}/\d{4})\b",
+    re.IGNORECASE,
+)
+
+
+def strip_read_also(text: str) -> str:
+    """Remove "Baca juga: <headline>" links to other articles.
+
+    On its own line the link runs to the end of the line. Inline (Kompas), the headline
+    is the run of Title Case words, ending before the capitalized word that starts the
+    next sentence.
+    """
+    parts = []
+    position = 0
+    for match in READ_ALSO_RE.finditer(text):
+        if match.start() < position:
+            continue
+        parts.append(text[position : match.start()])
+        rest = text[match.end() :]
+
+        newline = rest.find("\n")
+        if 0 <= newline <= 200:
+            position = match.end() + newline
+            continue
+
+        words = list(re.finditer(r"\S+", rest))
+        end = len(rest)
+        for i, word in enumerate(words):
+            token = word.group().strip("\"“”'‘’(),:")
+            if not token or token[0].isupper() or token[0].isdigit() or token.lower() in HEADLINE_CONNECTORS:
+                continue
+            # First plain lowercase word: the sentence began at the word before it
+            end = words[i - 1].start() if i > 0 else word.start()
+            break
+        position = match.end() + end
+        parts.append(" ")
+    parts.append(text[position:])
+    return "".join(parts)
+
+
+@functools.lru_cache(maxsize=None)
+def boilerplate_patterns(source: str) -> List[Pattern]:
+    """Site furniture that ends up in the scraped text of `source`, from its adapter."""
+    adapter = sites.get(source)
+    return [re.compile(pattern) for pattern in adapter.boilerplate] if adapter else []
+
+
+def strip_boilerplate(source: str, content: str) -> str:
+    for pattern in boilerplate_patterns(source):
+        content = pattern.sub(" ", content)
+    content = strip_read_also(content)
+    return re.sub(r"[ \t]+", " ", content).strip()
+
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence.strip() for sentence in SENTENCE_RE.split(text) if sentence.strip()]
+
+
+class ContentTrimmer:
+    """Reduce article content to what the flood extraction needs before it is prompted.
+
+    Known boilerplate of each site and links to other articles are removed. If the rest
+    is still over `max_tokens`, sentences are kept by relevance, the lead first, then
+    sentences mentioning a flood term, a place, the impact or the time, in their original
+    order, until the budget is used. Token counts per source are kept in `stats`.
+
+    Args:
+        gazetteer (Gazetteer): Flood terms and places used to score sentences.
+        max_tokens (int|None): Content token budget, None to only strip boilerplate.
+        lead_sentences (int): Opening sentences always kept.
+    """
+
+    def __init__(self, gazetteer: Gazetteer, max_tokens: Optional[int] = 800, lead_sentences: int = 2):
+        self.gazetteer = gazetteer
+        self.max_tokens = max_tokens
+        self.lead_sentences = lead_sentences
+        self.stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def score(self, sentence: str) -> int:
+        return (
+            3 * self.gazetteer.mentions_flood(sentence)
+            + 2 * bool(self.gazetteer.find(sentence))
+            + 2 * bool(IMPACT_RE.search(sentence))
+            + bool(TIME_RE.search(sentence))
+        )
+
+    def select(self, sentences: List[str]) -> List[str]:
+        """The most relevant sentences fitting in `max_tokens`, in their original order."""
+        costs = [count_tokens(sentence) + 1 for sentence in sentences]
+        ranked = sorted(
+            range(len(sentences)),
+            key=lambda i: (i >= self.lead_sentences, -self.score(sentences[i]), i),
+        )
+        kept = set()
+        budget = self.max_tokens
+        for i in ranked:
+            if costs[i] <= budget:
+                kept.add(i)
+                budget -= costs[i]
+        return [sentence for i, sentence in enumerate(sentences) if i in kept]
+
+    def trim(self, source: str, content: str) -> str:
+        content = content or ""
+        trimmed = strip_boilerplate(source, content)
+        tokens = count_tokens(trimmed)
+        if self.max_tokens and tokens > self.max_tokens:
+            selected = " ".join(self.select(split_sentences(trimmed)))
+            # Text that doesn't split into small enough sentences is cut to the budget
+            trimmed = selected or trimmed[: len(trimmed) * self.max_tokens // tokens]
+
+        before, after = count_tokens(content), count_tokens(trimmed)
+        with self._lock:
+            stats = self.stats.setdefault(source, {"articles": 0, "tokens_before": 0, "tokens_after": 0})
+            stats["articles"] += 1
+            stats["tokens_before"] += before
+            stats["tokens_after"] += after
+        return trimmed
@@ -0,0 +1,429 @@
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+from typing import ContextManager, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from jsonl_io import is_jsonl, read_jsonl
+
+# Compressed JSONL files can't be seeked into, so their records are located by index
+COMPRESSED_SUFFIXES = (".gz", ".zst")
+
+
+def json_array_offsets(data: bytes) -> Iterator[Tuple[int, int, Dict]]:
+    """Yield `(byte offset, byte length, record)` for every element of a JSON array document."""
+    text = data.decode("utf-8")
+    decoder = json.JSONDecoder()
+    position = text.index("[") + 1
+    byte_position = len(text[:position].encode("utf-8"))
+
+    while True:
+        # Skip whitespace and the comma between elements
+        start = position
+        while position < len(text) and text[position] in " \t\r\n,":
+            position += 1
+        if position >= len(text) or text[position] == "]":
+            return
+        byte_position += len(text[start:position].encode("utf-8"))
+
+        record, end = decoder.raw_decode(text, position)
+        length = len(text[position:end].encode("utf-8"))
+        yield byte_position, length, record
+        byte_position += length
+        position = end
+
+
+def jsonl_offsets(data: bytes) -> Iterator[Tuple[int, int, Dict]]:
+    """Yield `(byte offset, byte length, record)` for every complete line of a JSONL document."""
+    position = 0
+    for line in data.splitlines(keepends=True):
+        stripped = line.strip()
+        if stripped:
+            try:
+                record = json.loads(stripped)
+            except json.JSONDecodeError:
+                # Partially written last line
+                return
+            yield position, len(line), record
+        position += len(line)
+
+
+def file_records(path: str) -> Iterator[Tuple[int, Optional[int], Dict]]:
+    """Yield `(position, length, record)` for a JSON array or (compressed) JSONL file.
+
+    `position` is a byte offset and `length` a byte count, except for compressed files
+    where `position` is the record index and `length` is None.
+    """
+    if path.endswith(COMPRESSED_SUFFIXES):
+        for i, record in enumerate(read_jsonl(path)):
+            yield i, None, record
+        return
+
+    with open(path, "rb") as f:
+        data = f.read()
+    if path.endswith(".json"):
+        yield from json_array_offsets(data)
+    else:
+        yield from jsonl_offsets(data)
+
+
+def is_record_file(filename: str) -> bool:
+    return filename.endswith(".json") or is_jsonl(filename)
+
+
+def revision(record: Dict) -> str:
+    """When an analyzed record was produced (its `analyzed_at`), '' for records written
+    before it was added. Of several records of one URL, e.g. after an updated article
+    was analyzed again, the latest revision wins, then the one from the later file."""
+    return record.get("analyzed_at") or ""
+
+
+# `flood_time` of the records the gazetteer prefilter wrote before they were flagged
+PREFILTER_REASONS = ("No flood mentioned", "No Indonesian location mentioned")
+
+
+def is_prefiltered(record: Dict) -> bool:
+    """Whether an analyzed record was written by the gazetteer prefilter rather than the
+    model. Such records are left out of the counts and can be checked again."""
+    if record.get("prefiltered"):
+        return True
+    return record.get("flood_severity") == "none" and record.get("flood_time") in PREFILTER_REASONS
+
+
+def add_column(conn: sqlite3.Connection, table: str, column: str, definition: str) -> bool:
+    """Add `column` to a `table` created before it existed. Returns whether it was added."""
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+    if column in columns:
+        return False
+    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    return True
+
+
+# Marks a field the record doesn't have, as opposed to one set to null
+MISSING = object()
+
+
+class Article:
+    """A scraped article held without its content, which is read back from its file
+    each time it is used.
+
+    Reads like the article dict (`article["title"]`, `article.get("content", "")`), so
+    the analysis code takes either. Records of compressed files can't be seeked into,
+    so those keep their content in memory. Code reading the content several times
+    holds it in memory for a while with `loaded`.
+
+    Args:
+        record (Dict): The article as read from its file.
+        path (str): File holding the article.
+        position (int): Byte offset of the record in `path`.
+        length (int|None): Byte length of the record, None for a compressed file.
+    """
+
+    __slots__ = ("url", "title", "timestamp", "published_at", "path", "position", "length", "_content")
+
+    FIELDS = ("url", "title", "timestamp", "published_at")
+
+    def __init__(self, record: Dict, path: str, position: int, length: Optional[int]):
+        for field in self.FIELDS:
+            setattr(self, field, record.get(field, MISSING))
+        self.path = path
+        self.position = position
+        self.length = length
+        self._content = record.get("content", MISSING) if length is None else None
+
+    def record(self) -> Dict:
+        """The whole article, read from its file."""
+        if self.length is None:
+            record = {field: getattr(self, field) for field in self.FIELDS}
+            record["content"] = self._content
+            return {key: value for key, value in record.items() if value is not MISSING}
+        with open(self.path, "rb") as f:
+            f.seek(self.position)
+            return json.loads(f.read(self.length))
+
+    @contextlib.contextmanager
+    def loaded(self) -> Iterator["Article"]:
+        """Keep the content in memory within the `with` block, so it is read once."""
+        if self.length is None or self._content is not None:
+            yield self
+            return
+        self._content = self.record().get("content", MISSING)
+        try:
+            yield self
+        finally:
+            self._content = None
+
+    def get(self, key: str, default=None):
+        if key in self.FIELDS:
+            value = getattr(self, key)
+        elif key == "content" and (self.length is None or self._content is not None):
+            value = self._content
+        else:
+            value = self.record().get(key, MISSING)
+        return default if value is MISSING else value
+
+    def __getitem__(self, key: str):
+        value = self.get(key, MISSING)
+        if value is MISSING:
+            raise KeyError(key)
+        return value
+
+    def __repr__(self) -> str:
+        return f"Article({self.url!r})"
+
+
+def loaded(article: Dict) -> ContextManager:
+    """`Article.loaded` for an `Article`, a no-op for an article dict."""
+    if isinstance(article, Article):
+        return article.loaded()
+    return contextlib.nullcontext(article)
+
+
+def iter_articles(folder: str) -> Iterator[Article]:
+    """Stream the articles of every record file in `folder` as `Article`s."""
+    if not os.path.exists(folder):
+        return
+    for filename in sorted(os.listdir(folder)):
+        path = os.path.join(folder, filename)
+        if is_record_file(filename) and os.path.isfile(path):
+            for position, length, record in file_records(path):
+                yield Article(record, path, position, length)
+
+
+class CorpusIndex:
+    """Persistent manifest of scraped and analyzed articles.
+
+    Scraped articles are indexed by URL with the file and byte range holding them, and
+    analyzed results by URL. Each file is read once; later refreshes only stat the
+    folders and index files that are new or changed, so startup cost doesn't grow with
+    history and only the articles still to be analyzed are ever loaded.
+
+    Args:
+        path (str): SQLite database file.
+    """
+
+    def __init__(self, path: str = "corpus_index.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS articles (
+                url TEXT PRIMARY KEY,
+                source TEXT NOT NULL,
+                path TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                length INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS articles_source ON articles (source);
+            CREATE TABLE IF NOT EXISTS analyzed (
+                url TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                revision TEXT NOT NULL DEFAULT '',
+                prefiltered INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS analyzed_path ON analyzed (path);
+            """
+        )
+        added = add_column(self._conn, "analyzed", "revision", "TEXT NOT NULL DEFAULT ''")
+        added |= add_column(self._conn, "analyzed", "prefiltered", "INTEGER NOT NULL DEFAULT 0")
+        if added:
+            # Index the result files again, as they were read before these columns existed
+            self._conn.execute("DELETE FROM files WHERE path IN (SELECT DISTINCT path FROM analyzed)")
+            self._conn.execute("DELETE FROM analyzed")
+        self._conn.commit()
+
+    def _changed_files(self, folder: str, table: str) -> List[str]:
+        """Files in `folder` that are not indexed yet, or changed since they were.
+
+        Index entries of files that disappeared from `folder` are dropped from `table`.
+        """
+        indexed = {
+            path: (size, mtime)
+            for path, size, mtime in self._conn.execute(
+                "SELECT path, size, mtime FROM files WHERE path LIKE ?",
+                (os.path.join(folder, "%"),),
+            )
+            if os.path.dirname(path) == folder
+        }
+        filenames = os.listdir(folder) if os.path.exists(folder) else []
+
+        changed = []
+        for filename in sorted(filenames):
+            if not is_record_file(filename):
+                continue
+            path = os.path.join(folder, filename)
+            stat = os.stat(path)
+            if indexed.pop(path, None) != (stat.st_size, stat.st_mtime):
+                changed.append(path)
+
+        for path in indexed:
+            self._conn.execute(f"DELETE FROM {table} WHERE path = ?", (path,))
+            self._conn.execute("DELETE FROM files WHERE path = ?", (path,))
+        return changed
+
+    def _mark_indexed(self, path: str):
+        stat = os.stat(path)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?)",
+            (path, stat.st_size, stat.st_mtime),
+        )
+
+    def refresh_source(self, source: str, folder: Optional[str] = None) -> int:
+        """Index new or changed scraped files of `source`. Returns the number of files read."""
+        folder = folder or source
+        with self._lock:
+            changed = self._changed_files(folder, "articles")
+            for path in changed:
+                self._conn.execute("DELETE FROM articles WHERE path = ?", (path,))
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO articles VALUES (?, ?, ?, ?, ?)",
+                    (
+                        (record["url"], source, path, position, length)
+                        for position, length, record in file_records(path)
+                        if record.get("url")
+                    ),
+                )
+                self._mark_indexed(path)
+            self._conn.commit()
+        return len(changed)
+
+    def _drop_missing_analyzed(self, folder: str):
+        """Forget results indexed from files of `folder` that no longer exist, including
+        checkpoints recorded with `complete=False` that never made it into `files` (e.g.
+        a checkpoint directory deleted after a crash), so their articles are analyzed again."""
+        for (path,) in self._conn.execute(
+            "SELECT DISTINCT path FROM analyzed WHERE path LIKE ?", (os.path.join(folder, "%"),)
+        ).fetchall():
+            if os.path.dirname(path) == folder and not os.path.exists(path):
+                self._conn.execute("DELETE FROM analyzed WHERE path = ?", (path,))
+
+    def refresh_analyzed(self, folder: str = "analyzed") -> int:
+        """Index new or changed result files in `folder`. Returns the number of files read."""
+        with self._lock:
+            self._drop_missing_analyzed(folder)
+            changed = self._changed_files(folder, "analyzed")
+            for path in changed:
+                self._add_analyzed(path, (record for _, _, record in file_records(path)))
+                self._mark_indexed(path)
+            self._conn.commit()
+        return len(changed)
+
+    def _add_analyzed(self, path: str, records: Iterable[Dict]):
+        """Point each record's URL at `path`, unless a later revision is indexed (see `revision`)."""
+        self._conn.executemany(
+            """
+            INSERT INTO analyzed (url, path, revision, prefiltered) VALUES (?, ?, ?, ?)
+            ON CONFLICT (url) DO UPDATE SET
+                path = excluded.path, revision = excluded.revision, prefiltered = excluded.prefiltered
+            WHERE (excluded.revision, excluded.path) > (analyzed.revision, analyzed.path)
+            """,
+            (
+                (record["url"], path, revision(record), is_prefiltered(record))
+                for record in records
+                if record.get("url")
+            ),
+        )
+
+    def add_analyzed(self, path: str, records: Iterable[Dict], complete: bool = True):
+        """Record results just written to `path`, so it never has to be re-read.
+
+        Pass `complete=False` while `path` is still being appended to.
+        """
+        with self._lock:
+            self._add_analyzed(path, records)
+            if complete:
+                self._mark_indexed(path)
+            self._conn.commit()
+
+    def move_analyzed(self, old_paths: Iterable[str], new_path: str):
+        """Point the results indexed from `old_paths` at `new_path`, which now holds them all."""
+        with self._lock:
+            for path in old_paths:
+                self._conn.execute(
+                    "UPDATE analyzed SET path = ? WHERE path = ?", (new_path, path)
+                )
+                self._conn.execute("DELETE FROM files WHERE path = ?", (path,))
+            self._mark_indexed(new_path)
+            self._conn.commit()
+
+    def requeue_prefiltered(self) -> int:
+        """Forget the results written by the gazetteer prefilter, so that their articles
+        are checked again, e.g. after the gazetteer improved. Returns their number."""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM analyzed WHERE prefiltered = 1")
+            self._conn.commit()
+        return cursor.rowcount
+
+    def is_analyzed(self, url: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM analyzed WHERE url = ?", (url,)
+            ).fetchone()
+        return row is not None
+
+    def count(self, source: str) -> int:
+        with self._lock:
+            (total,) = self._conn.execute(
+                "SELECT COUNT(*) FROM articles WHERE source = ?", (source,)
+            ).fetchone()
+        return total
+
+    def unanalyzed(self, source: str) -> List[Tuple[str, int, Optional[int]]]:
+        """`(path, position, length)` of the articles of `source` without a result, in file order."""
+        with self._lock:
+            return self._conn.execute(
+                """
+                SELECT a.path, a.position, a.length FROM articles a
+                WHERE a.source = ? AND NOT EXISTS (SELECT 1 FROM analyzed r WHERE r.url = a.url)
+                ORDER BY a.path, a.position
+                """,
+                (source,),
+            ).fetchall()
+
+    def article(self, url: str) -> Optional[Article]:
+        """The scraped article of `url`, None if it isn't indexed or its file is gone."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT path, position, length FROM articles WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None or not os.path.exists(row[0]):
+            return None
+        path, position, length = row
+        if length is None:
+            for i, record in enumerate(read_jsonl(path)):
+                if i == position:
+                    return Article(record, path, i, None)
+            return None
+        with open(path, "rb") as f:
+            f.seek(position)
+            return Article(json.loads(f.read(length)), path, position, length)
+
+    def iter_unanalyzed(self, source: str) -> Iterator[Article]:
+        """Stream the articles of `source` that have not been analyzed yet, in file order,
+        as `Article`s whose content stays on disk until it is used."""
+        by_path: Dict[str, List[Tuple[int, Optional[int]]]] = {}
+        for path, position, length in self.unanalyzed(source):
+            by_path.setdefault(path, []).append((position, length))
+
+        for path, locations in by_path.items():
+            if path.endswith(COMPRESSED_SUFFIXES):
+                wanted = {position for position, _ in locations}
+                for i, record in enumerate(read_jsonl(path)):
+                    if i in wanted:
+                        yield Article(record, path, i, None)
+                continue
+            with open(path, "rb") as f:
+                for position, length in locations:
+                    f.seek(position)
+                    yield Article(json.loads(f.read(length)), path, position, length)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
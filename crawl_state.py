@@ -0,0 +1,309 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = {
+    "fbclid",
+    "gclid",
+    "dclid",
+    "msclkid",
+    "igshid",
+    "_ga",
+    "ref",
+    "tag_from",
+}
+
+
+def canonical_url(url: str) -> str:
+    """Normalize `url` so the same article always maps to the same key.
+
+    Lowercases the scheme and host, drops the fragment, tracking parameters
+    (`utm_*`, `fbclid`, ...) and a trailing slash, and sorts what remains of the query.
+    """
+    parts = urlsplit(url.strip())
+    query = sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+    )
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit(
+        (parts.scheme.lower(), parts.netloc.lower(), path, urlencode(query), "")
+    )
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+# Flood articles are often updated in place as casualty counts rise. A scraped article
+# is revisited after REVISIT_FACTOR times the time since its text last changed (at first,
+# since it was published), within these bounds in seconds: a developing story is checked
+# again soon, a settled one ever more rarely.
+REVISIT_FACTOR = 0.5
+MIN_REVISIT = 30 * 60
+MAX_REVISIT = 2 * 24 * 60 * 60
+
+# Outcomes of a revisit
+REVISIT_OUTCOMES = ("not_modified", "unchanged", "changed", "failed")
+
+
+def revisit_delay(since_change: float) -> float:
+    """Seconds until the next revisit of an article whose text last changed `since_change` seconds ago."""
+    return min(MAX_REVISIT, max(MIN_REVISIT, since_change * REVISIT_FACTOR))
+
+
+def epoch(timestamp: Optional[str]) -> Optional[float]:
+    """Seconds since the epoch of an ISO 8601 timestamp, None if missing or invalid."""
+    if not timestamp:
+        return None
+    try:
+        parsed = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+class CrawlState:
+    """Persistent record of fetched article URLs, shared across scrape runs.
+
+    Articles recorded with their source are also scheduled for revisits (see
+    `revisit_delay`), with the validators (ETag, Last-Modified) of the last response
+    for conditional requests.
+
+    Args:
+        path (str): SQLite database file.
+    """
+
+    def __init__(self, path: str = "crawl_state.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                fetched_at TEXT NOT NULL,
+                status TEXT NOT NULL,
+                content_hash TEXT
+            );
+            CREATE TABLE IF NOT EXISTS revisits (
+                url TEXT PRIMARY KEY,
+                source TEXT NOT NULL,
+                fetch_url TEXT NOT NULL,
+                published REAL NOT NULL,
+                changed REAL NOT NULL,
+                next_check REAL NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                checks INTEGER NOT NULL DEFAULT 0,
+                changes INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS revisits_due ON revisits (source, next_check);
+            """
+        )
+        self._conn.commit()
+
+    def is_known(self, url: str) -> bool:
+        """Return True if `url` was already scraped successfully."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM urls WHERE url = ? AND status = 'ok'",
+                (canonical_url(url),),
+            ).fetchone()
+        return row is not None
+
+    def get(self, url: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, fetched_at, status, content_hash FROM urls WHERE url = ?",
+                (canonical_url(url),),
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("url", "fetched_at", "status", "content_hash"), row))
+
+    def record(
+        self,
+        url: str,
+        result: Optional[Dict],
+        fetched_at: Optional[str] = None,
+        source: Optional[str] = None,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ):
+        """Store the outcome of scraping `url`; `result` is None when it failed.
+
+        A successful result of a `source` is scheduled for revisits, unless it already is,
+        with the validators (`etag`, `last_modified`) of the page it was read from so that
+        the first revisit is already a conditional request.
+        """
+        fetched_at = fetched_at or datetime.now(timezone.utc).isoformat(timespec="seconds")
+        if result:
+            status, digest = "ok", content_hash(result.get("content") or "")
+        else:
+            status, digest = "failed", None
+
+        with self._lock:
+            if status == "failed":
+                # Never downgrade a URL that was fetched successfully before
+                self._conn.execute(
+                    """
+                    INSERT INTO urls (url, fetched_at, status, content_hash)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(url) DO UPDATE SET fetched_at = excluded.fetched_at
+                    WHERE urls.status != 'ok'
+                    """,
+                    (canonical_url(url), fetched_at, status, digest),
+                )
+            else:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO urls (url, fetched_at, status, content_hash) VALUES (?, ?, ?, ?)",
+                    (canonical_url(url), fetched_at, status, digest),
+                )
+                if source:
+                    self._schedule_revisit(source, url, result, fetched_at, etag, last_modified)
+            self._conn.commit()
+
+    def import_articles(self, articles: Iterable[Dict], fetched_at: str, source: Optional[str] = None) -> int:
+        """Mark already saved articles as fetched, and schedule their revisits if their
+        `source` is given. Returns the number of new URLs."""
+        with self._lock:
+            added = 0
+            for article in articles:
+                if not article.get("url"):
+                    continue
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO urls (url, fetched_at, status, content_hash) VALUES (?, ?, 'ok', ?)",
+                    (
+                        canonical_url(article["url"]),
+                        fetched_at,
+                        content_hash(article.get("content") or ""),
+                    ),
+                )
+                added += cursor.rowcount
+                if source:
+                    self._schedule_revisit(source, article["url"], article, fetched_at)
+            self._conn.commit()
+            return added
+
+    def _schedule_revisit(
+        self,
+        source: str,
+        url: str,
+        article: Dict,
+        fetched_at: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ):
+        fetched = epoch(fetched_at) or time.time()
+        # Articles without a parseable publication time count as published when fetched
+        published = min(epoch(article.get("published_at")) or fetched, fetched)
+        self._conn.execute(
+            """
+            INSERT OR IGNORE INTO revisits
+                (url, source, fetch_url, published, changed, next_check, etag, last_modified)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                canonical_url(url),
+                source,
+                url,
+                published,
+                published,
+                fetched + revisit_delay(fetched - published),
+                etag,
+                last_modified,
+            ),
+        )
+
+    def due_revisits(self, source: str, max_age: float, limit: Optional[int] = None, now: Optional[float] = None) -> List[Dict]:
+        """Articles of `source` due for a revisit, most overdue first.
+
+        Args:
+            source (str): Site the articles were scraped from.
+            max_age (float): Seconds since publication after which articles are no
+                longer revisited.
+            limit (int|None): Maximum number of articles returned.
+            now (float|None): Current time in seconds since the epoch.
+
+        Returns:
+            List[Dict]: `url` (canonical), `fetch_url`, `etag` and `last_modified` of each.
+        """
+        now = now or time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT url, fetch_url, etag, last_modified FROM revisits
+                WHERE source = ? AND next_check <= ? AND published >= ?
+                ORDER BY next_check LIMIT ?
+                """,
+                (source, now, now - max_age, -1 if limit is None else limit),
+            ).fetchall()
+        return [dict(zip(("url", "fetch_url", "etag", "last_modified"), row)) for row in rows]
+
+    def record_revisit(
+        self,
+        url: str,
+        outcome: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        now: Optional[float] = None,
+    ):
+        """Reschedule the article at `url` after a revisit.
+
+        Args:
+            url (str): Article URL.
+            outcome (str): "not_modified" (answered 304), "unchanged" (same extracted text),
+                "changed" (new text, saved and analyzed) or "failed". A failed revisit is
+                retried after MIN_REVISIT, keeping the validators of the last good response.
+            etag (str|None): ETag of the response, for the next conditional request.
+            last_modified (str|None): Last-Modified of the response.
+            now (float|None): Current time in seconds since the epoch.
+        """
+        now = now or time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT changed FROM revisits WHERE url = ?", (canonical_url(url),)
+            ).fetchone()
+            if row is None:
+                return
+            changed = now if outcome == "changed" else row[0]
+            if outcome == "failed":
+                self._conn.execute(
+                    "UPDATE revisits SET next_check = ?, checks = checks + 1 WHERE url = ?",
+                    (now + MIN_REVISIT, canonical_url(url)),
+                )
+            else:
+                self._conn.execute(
+                    """
+                    UPDATE revisits SET
+                        changed = ?,
+                        next_check = ?,
+                        etag = COALESCE(?, etag),
+                        last_modified = COALESCE(?, last_modified),
+                        checks = checks + 1,
+                        changes = changes + ?
+                    WHERE url = ?
+                    """,
+                    (
+                        changed,
+                        now + revisit_delay(now - changed),
+                        etag,
+                        last_modified,
+                        outcome == "changed",
+                        canonical_url(url),
+                    ),
+                )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
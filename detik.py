@@ -1,96 +1,68 @@
-from bs4 import BeautifulSoup
-
-from news_scraper import NewsScraper
+from news_scraper import NewsScraper, find_required
 
 
 class DetikScraper(NewsScraper):
     """Scraper for the Detik website."""
 
-    def do_scrape_list_page(self, url=None, limit=10):
-        """Scrape a list/index page and return article URLs.
+    site = "detik"
+
+    def parse_list_page(self, soup):
+        """Extract article URLs and the next page URL from a Detik list page.
 
         Args:
-            url (str|None): The URL of the list page to scrape. If None, uses `self.base_url`.
-            limit (int): Maximum number of article URLs to return. If the current page
-                contains fewer items, the scraper will follow pagination recursively
-                until the requested `limit` is reached or no more pages are available.
+            soup (BeautifulSoup): Parsed list page.
 
         Returns:
-            List[str]: A list of article URL strings.
-
+            Tuple[List[str], Optional[str]]: Article URLs and the next page URL, if any.
         """
-        target_url = url or self.base_url
-        response = self.client.get(target_url)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, "html.parser")
-
         article_links = []
 
         for list_feed in soup.find_all("div", class_="list--feed"):
             for item in list_feed.find_all("article"):
                 link = item.find("a")
-                if (
-                    link
-                    and link.get("href")
-                    and "20.detik.com" not in link["href"]
-                    and "news.detik.com/x/" not in link["href"]
-                    and "detim.com/pop/" not in link["href"]
-                ):
-                    href = link["href"]
-                    self.prog_bar.update(1)
-                    article_links.append(href)
-
-        if len(article_links) < limit:
-            next_page_link = soup.find(
-                "div",
-                class_="paging",
-            ).find_all(
-                "a", recursive=False
-            )[-1]
+                if link and link.get("href"):
+                    article_links.append(link["href"])
 
-            if next_page_link and next_page_link.get("href"):
-                next_page_url = next_page_link["href"]
-                article_links.extend(
-                    self.do_scrape_list_page(
-                        next_page_url,
-                        limit - len(article_links),
-                    )
-                )
+        next_page_url = None
+        paging = soup.find("div", class_="paging")
+        if paging:
+            page_links = paging.find_all("a", recursive=False)
+            if page_links and page_links[-1].get("href"):
+                next_page_url = page_links[-1]["href"]
 
-        return article_links
+        return article_links, next_page_url
 
-    def do_scrape_article(self, url):
-        """Scrape a single Detik article page.
+    def parse_article(self, soup, url):
+        """Extract the fields of a parsed Detik article page.
 
         Args:
-            url (str): Article URL to scrape.
+            soup (BeautifulSoup): Parsed article page.
+            url (str): Article URL; wolipop.detik.com pages use a different layout.
 
         Returns:
             dict: A mapping with keys `url`, `title`, `content`, and `timestamp`.
         """
-        response = self.client.get(url, follow_redirects=True)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, "html.parser")
-
         if "wolipop.detik.com" in url:
-            title = soup.find("h1", class_="itp_title_detail").text.strip()
-            timestamp = soup.find("div", class_="text-black-light3").text.strip()
+            title = find_required(soup, "h1", class_="itp_title_detail").text.strip()
+            timestamp = find_required(soup, "div", class_="text-black-light3").text.strip()
             content = " ".join(
                 [
                     p.text.strip()
-                    for p in soup.find(
+                    for p in find_required(
+                        soup,
                         "div",
                         class_="itp_bodycontent",
                     ).find_all("p")
                 ]
             )
         else:
-            title = soup.find("h1", class_="detail__title").text.strip()
-            timestamp = soup.find("div", class_="detail__date").text.strip()
+            title = find_required(soup, "h1", class_="detail__title").text.strip()
+            timestamp = find_required(soup, "div", class_="detail__date").text.strip()
             content = " ".join(
                 [
                     p.text.strip()
-                    for p in soup.find(
+                    for p in find_required(
+                        soup,
                         "div",
                         class_="detail__body-text",
                     ).find_all("p")
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""Flatten scraped and analyzed articles into indexed tables for the Metabase dashboards.
+
+    python3 export.py --db flood_export.db --parquet export
+"""
+import os
+import sqlite3
+from datetime import date, datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+import click
+from tqdm import tqdm
+
+from adapters import sites
+from corpus_index import (
+    PREFILTER_REASONS,
+    add_column,
+    file_records,
+    is_prefiltered,
+    is_record_file,
+    revision,
+)
+from gazetteer import Gazetteer
+
+SEVERITY_LEVELS = {"unknown": 0, "none": 0, "mild": 1, "moderate": 2, "severe": 3}
+
+ARTICLE_COLUMNS = ["url", "source", "title", "published_time", "published_date", "flood_severity", "flood_time", "file", "analyzed_at"]
+AREA_COLUMNS = ["url", "position", "regency", "province", "area"]
+SCRAPED_COLUMNS = ["url", "source", "title", "timestamp", "content_chars", "file"]
+
+# Publication days are counted in Jakarta time (WIB), like the articles date them
+JAKARTA = ZoneInfo("Asia/Jakarta")
+
+# Bumped with PRAGMA user_version when stored rows need updating
+SCHEMA_VERSION = 1
+
+
+def parse_time(value) -> Optional[datetime]:
+    """Parse an ISO 8601 timestamp from the model into a naive UTC datetime, None if invalid."""
+    if not isinstance(value, str) or not value.strip():
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip())
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def local_date(published: datetime) -> date:
+    """Jakarta date of a naive UTC datetime from `parse_time`."""
+    return published.replace(tzinfo=timezone.utc).astimezone(JAKARTA).date()
+
+
+def normalize_severity(value) -> str:
+    value = value.strip().lower() if isinstance(value, str) else ""
+    return value if value in SEVERITY_LEVELS else "unknown"
+
+
+def article_row(record: Dict, path: str) -> Dict:
+    published = parse_time(record.get("published_time"))
+    return {
+        "url": record["url"],
+        "source": record.get("source"),
+        "title": record.get("title"),
+        "published_time": published,
+        "published_date": local_date(published) if published else None,
+        "flood_severity": normalize_severity(record.get("flood_severity")),
+        "flood_time": record.get("flood_time"),
+        "file": path,
+        "analyzed_at": revision(record),
+    }
+
+
+def area_rows(record: Dict, gazetteer: Gazetteer) -> List[Dict]:
+    """One row per distinct affected area, with province and regency/city names normalized."""
+    return [
+        {
+            "url": record["url"],
+            "position": position,
+            "regency": area["regency_or_city"],
+            "province": area["province"],
+            "area": area.get("area"),
+        }
+        for position, area in enumerate(gazetteer.normalize_areas(record.get("affected_areas")))
+    ]
+
+
+def scraped_row(source: str, record: Dict, path: str) -> Dict:
+    return {
+        "url": record["url"],
+        "source": source,
+        "title": record.get("title"),
+        "timestamp": record.get("timestamp"),
+        "content_chars": len(record.get("content") or ""),
+        "file": path,
+    }
+
+
+def _sql_value(value):
+    """SQLite has no date types; store them as ISO text, which sorts and works with date()."""
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def _pyarrow():
+    """Return `(pyarrow, pyarrow.parquet)`, or raise if pyarrow is not installed."""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+
+        return pyarrow, pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Parquet export requires the `pyarrow` package (pip install pyarrow)")
+
+
+class ColumnarExport:
+    """SQLite store of flattened articles, appended to incrementally.
+
+    Tables:
+        article: one row per analyzed article, with `published_time` parsed.
+        affected_area: regency/city, province and finer area of each article, in the
+            gazetteer's canonical names where they match one.
+        severity: flood severity levels and their rank, for ordering.
+        scraped_article: one row per scraped article.
+
+    Files already exported are tracked by size and modification time, so a run only
+    reads new or changed files, and only records whose URL is not in the store yet, or
+    was stored from an earlier file, are written: a revisited article saved and analyzed
+    again after it was updated (`pipeline.py --recrawl`) replaces its rows. With
+    `parquet_dir`, the newly written rows of each table are also appended to
+    `<parquet_dir>/<table>/part-<timestamp>.parquet`; as the datasets are append-only,
+    readers keep the row of each URL with the latest `analyzed_at`.
+
+    Args:
+        path (str): SQLite database file.
+        parquet_dir (str|None): Directory of the Parquet datasets, None to skip them.
+    """
+
+    def __init__(self, path: str = "flood_export.db", parquet_dir: Optional[str] = None):
+        if parquet_dir:
+            _pyarrow()
+        self.parquet_dir = parquet_dir
+        self.gazetteer = Gazetteer.load()
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS severity (
+                level TEXT PRIMARY KEY,
+                rank INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS article (
+                url TEXT PRIMARY KEY,
+                source TEXT,
+                title TEXT,
+                published_time TEXT,
+                published_date TEXT,
+                flood_severity TEXT NOT NULL REFERENCES severity (level),
+                flood_time TEXT,
+                file TEXT NOT NULL,
+                analyzed_at TEXT NOT NULL DEFAULT ''
+            );
+            CREATE INDEX IF NOT EXISTS article_source ON article (source);
+            CREATE INDEX IF NOT EXISTS article_published_date ON article (published_date);
+            CREATE INDEX IF NOT EXISTS article_severity ON article (flood_severity);
+            CREATE TABLE IF NOT EXISTS affected_area (
+                url TEXT NOT NULL REFERENCES article (url),
+                position INTEGER NOT NULL,
+                regency TEXT,
+                province TEXT,
+                area TEXT,
+                PRIMARY KEY (url, position)
+            );
+            CREATE INDEX IF NOT EXISTS affected_area_province ON affected_area (province);
+            CREATE INDEX IF NOT EXISTS affected_area_regency ON affected_area (regency);
+            CREATE TABLE IF NOT EXISTS scraped_article (
+                url TEXT PRIMARY KEY,
+                source TEXT NOT NULL,
+                title TEXT,
+                timestamp TEXT,
+                content_chars INTEGER,
+                file TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS scraped_article_source ON scraped_article (source);
+            """
+        )
+        add_column(self._conn, "article", "analyzed_at", "TEXT NOT NULL DEFAULT ''")
+        # Prefiltered records exported before they were left out
+        legacy = (
+            "SELECT url FROM article WHERE flood_severity = 'none' "
+            f"AND flood_time IN ({', '.join('?' * len(PREFILTER_REASONS))})"
+        )
+        self._conn.execute(f"DELETE FROM affected_area WHERE url IN ({legacy})", PREFILTER_REASONS)
+        self._conn.execute(f"DELETE FROM article WHERE url IN ({legacy})", PREFILTER_REASONS)
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            # published_date used to be the UTC date
+            rows = self._conn.execute(
+                "SELECT url, published_time FROM article WHERE published_time IS NOT NULL"
+            ).fetchall()
+            self._conn.executemany(
+                "UPDATE article SET published_date = ? WHERE url = ?",
+                [(local_date(datetime.fromisoformat(published)).isoformat(), url) for url, published in rows],
+            )
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO severity VALUES (?, ?)", SEVERITY_LEVELS.items()
+        )
+        self._conn.commit()
+        self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+    def changed_files(self, folder: str) -> Iterator[str]:
+        """Record files in `folder` that were not exported yet, or changed since."""
+        if not os.path.exists(folder):
+            return
+        for filename in sorted(os.listdir(folder)):
+            path = os.path.join(folder, filename)
+            if not is_record_file(filename) or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            row = self._conn.execute(
+                "SELECT size, mtime FROM files WHERE path = ?", (path,)
+            ).fetchone()
+            if row != (stat.st_size, stat.st_mtime):
+                yield path
+
+    def _mark_exported(self, path: str):
+        stat = os.stat(path)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?)",
+            (path, stat.st_size, stat.st_mtime),
+        )
+
+    def _insert(self, table: str, columns: List[str], row: Dict) -> bool:
+        """Insert `row` unless its key already exists. Returns whether it was added."""
+        cursor = self._conn.execute(
+            f"INSERT OR IGNORE INTO {table} VALUES ({', '.join('?' * len(columns))})",
+            [_sql_value(row[column]) for column in columns],
+        )
+        return cursor.rowcount == 1
+
+    def _upsert(self, table: str, columns: List[str], row: Dict, key: Tuple[str, ...] = ("file",)) -> bool:
+        """Insert `row`, or replace the row of its URL if that has a lower `key`: an
+        earlier revision (see `corpus_index.revision`), or for scraped articles, which
+        have none, an earlier file. Returns whether it was written."""
+        stored = self._conn.execute(
+            f"SELECT {', '.join(key)} FROM {table} WHERE url = ?", (row["url"],)
+        ).fetchone()
+        if stored is not None and stored >= tuple(row[column] for column in key):
+            return False
+        self._conn.execute(
+            f"INSERT OR REPLACE INTO {table} VALUES ({', '.join('?' * len(columns))})",
+            [_sql_value(row[column]) for column in columns],
+        )
+        return True
+
+    def export_analyzed(self, path: str) -> Tuple[List[Dict], List[Dict]]:
+        """Add the articles of one analysis result file, replacing earlier analyses of
+        the same URLs. Records written by the gazetteer prefilter are left out, and take
+        back an earlier analysis. Returns the written article and area rows."""
+        articles, areas = [], []
+        for _, _, record in file_records(path):
+            if not record.get("url"):
+                continue
+            row = article_row(record, path)
+            if is_prefiltered(record):
+                stored = self._conn.execute(
+                    "SELECT analyzed_at, file FROM article WHERE url = ?", (row["url"],)
+                ).fetchone()
+                if stored is not None and stored < (row["analyzed_at"], row["file"]):
+                    self._conn.execute("DELETE FROM affected_area WHERE url = ?", (row["url"],))
+                    self._conn.execute("DELETE FROM article WHERE url = ?", (row["url"],))
+                continue
+            if not self._upsert("article", ARTICLE_COLUMNS, row, key=("analyzed_at", "file")):
+                continue
+            self._conn.execute("DELETE FROM affected_area WHERE url = ?", (row["url"],))
+            articles.append(row)
+            for area in area_rows(record, self.gazetteer):
+                self._insert("affected_area", AREA_COLUMNS, area)
+                areas.append(area)
+        self._mark_exported(path)
+        self._conn.commit()
+        return articles, areas
+
+    def export_scraped(self, source: str, path: str) -> List[Dict]:
+        """Add the articles of one scraped file, replacing earlier versions of the same
+        URLs. Returns the written rows."""
+        rows = []
+        for _, _, record in file_records(path):
+            if not record.get("url"):
+                continue
+            row = scraped_row(source, record, path)
+            if self._upsert("scraped_article", SCRAPED_COLUMNS, row):
+                rows.append(row)
+        self._mark_exported(path)
+        self._conn.commit()
+        return rows
+
+    def write_parquet(self, table: str, columns: List[str], rows: List[Dict]):
+        """Append `rows` to the Parquet dataset of `table` as a new part file."""
+        if not self.parquet_dir or not rows:
+            return
+        pyarrow, parquet = _pyarrow()
+        directory = os.path.join(self.parquet_dir, table)
+        os.makedirs(directory, exist_ok=True)
+        parquet.write_table(
+            pyarrow.Table.from_pylist([{column: row[column] for column in columns} for row in rows]),
+            os.path.join(directory, f"part-{self.timestamp}.parquet"),
+        )
+
+    def close(self):
+        self._conn.close()
+
+
+@click.command()
+@click.option(
+    "--db",
+    "db_path",
+    type=click.Path(dir_okay=False),
+    default="flood_export.db",
+    show_default=True,
+    help="SQLite database the tables are exported to",
+)
+@click.option(
+    "--parquet",
+    "parquet_dir",
+    type=click.Path(file_okay=False),
+    default=None,
+    help="Also append the new rows to Parquet datasets in this directory (requires pyarrow)",
+)
+@click.option(
+    "--analyzed",
+    "analyzed_folder",
+    type=click.Path(file_okay=False),
+    default="analyzed",
+    show_default=True,
+    help="Folder of analysis results",
+)
+def main(db_path: str, parquet_dir: Optional[str], analyzed_folder: str):
+    """Export scraped and analyzed articles to indexed tables, adding only new or updated records."""
+    try:
+        export = ColumnarExport(db_path, parquet_dir)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+
+    articles, areas, scraped = [], [], []
+    for path in tqdm(list(export.changed_files(analyzed_folder)), desc="Exporting analyses", unit="file"):
+        new_articles, new_areas = export.export_analyzed(path)
+        articles.extend(new_articles)
+        areas.extend(new_areas)
+
+    for source in sites:
+        for path in tqdm(list(export.changed_files(source)), desc=f"Exporting {source}", unit="file"):
+            scraped.extend(export.export_scraped(source, path))
+
+    export.write_parquet("article", ARTICLE_COLUMNS, articles)
+    export.write_parquet("affected_area", AREA_COLUMNS, areas)
+    export.write_parquet("scraped_article", SCRAPED_COLUMNS, scraped)
+    export.close()
+
+    print("\nExport Summary:")
+    print(f"New or updated analyzed articles: {len(articles)} ({len(areas)} affected areas)")
+    print(f"New or updated scraped articles: {len(scraped)}")
+    print(f"\nTables saved to: {db_path}")
+    if parquet_dir:
+        print(f"Parquet datasets saved to: {parquet_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""Local stand-in for the OpenAI Responses and Batch APIs, for exercising analyze.py offline.
+
+    python3 fake_openai.py --port 8765 --latency 0.5 --error-rate 0.1
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=fake python3 analyze.py -c 8
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=fake python3 analyze.py --batch --poll-interval 1
+"""
+import json
+import random
+import re
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import default
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import click
+
+
+def fake_analysis(prompt: str) -> dict:
+    """Deterministic analysis derived from the prompt, shaped like the real model output."""
+    title = re.search(r"Title: (.*)", prompt)
+    title = title.group(1).strip() if title else ""
+    severity = "severe" if re.search(r"tewas|meninggal|korban jiwa", prompt, re.I) else "mild"
+    return {
+        "affected_areas": [],
+        "flood_severity": severity,
+        "flood_time": "Unable to determine",
+        "title_length": len(title),
+    }
+
+
+def new_id(prefix: str) -> str:
+    return f"{prefix}_{random.getrandbits(48):x}"
+
+
+def response_body(text: str, model: str) -> dict:
+    return {
+        "id": new_id("resp"),
+        "object": "response",
+        "created_at": int(time.time()),
+        "model": model,
+        "status": "completed",
+        "output": [
+            {
+                "id": new_id("msg"),
+                "type": "message",
+                "role": "assistant",
+                "status": "completed",
+                "content": [{"type": "output_text", "text": text, "annotations": []}],
+            }
+        ],
+        "parallel_tool_calls": True,
+        "tool_choice": "auto",
+        "tools": [],
+        "usage": {
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "total_tokens": 0,
+        },
+    }
+
+
+# Uploaded files and batches, shared by every handler instance
+files = {}
+batches = {}
+
+
+def file_object(file_id: str) -> dict:
+    return {
+        "id": file_id,
+        "object": "file",
+        "bytes": len(files[file_id]["content"]),
+        "created_at": files[file_id]["created_at"],
+        "filename": files[file_id]["filename"],
+        "purpose": files[file_id]["purpose"],
+        "status": "processed",
+    }
+
+
+def run_batch(batch: dict, latency: float, error_rate: float):
+    """Answer every request of a batch's input file and store the output file."""
+    time.sleep(latency)
+    lines = []
+    failed = 0
+    for line in files[batch["input_file_id"]]["content"].decode("utf-8").splitlines():
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        if random.random() < error_rate:
+            failed += 1
+            lines.append(
+                {
+                    "id": new_id("batch_req"),
+                    "custom_id": request["custom_id"],
+                    "response": {"status_code": 500, "body": {"error": {"message": "Server error"}}},
+                    "error": None,
+                }
+            )
+            continue
+        body = request["body"]
+        text = json.dumps(fake_analysis(str(body.get("input", ""))))
+        lines.append(
+            {
+                "id": new_id("batch_req"),
+                "custom_id": request["custom_id"],
+                "response": {"status_code": 200, "body": response_body(text, body.get("model", "fake"))},
+                "error": None,
+            }
+        )
+
+    # Batch output files are not in input order
+    random.shuffle(lines)
+    output_id = new_id("file")
+    files[output_id] = {
+        "content": "".join(json.dumps(line) + "\n" for line in lines).encode("utf-8"),
+        "filename": "batch_output.jsonl",
+        "purpose": "batch_output",
+        "created_at": int(time.time()),
+    }
+    batch.update(
+        status="completed",
+        output_file_id=output_id,
+        completed_at=int(time.time()),
+        request_counts={"total": len(lines), "completed": len(lines) - failed, "failed": failed},
+    )
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    # The default backlog of 5 makes concurrent clients wait for SYN retransmits
+    request_queue_size = 128
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    error_rate = 0.0
+    requests_served = 0
+    _count_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status: int, body: dict, headers: dict = None):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def upload_file(self):
+        content_type = self.headers.get("Content-Type", "")
+        length = int(self.headers.get("Content-Length") or 0)
+        message = BytesParser(policy=default).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + self.rfile.read(length)
+        )
+        fields = {}
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            fields[name] = (part.get_filename(), part.get_payload(decode=True))
+
+        file_id = new_id("file")
+        filename, content = fields["file"]
+        files[file_id] = {
+            "content": content,
+            "filename": filename or "upload.jsonl",
+            "purpose": fields.get("purpose", (None, b"batch"))[1].decode("utf-8"),
+            "created_at": int(time.time()),
+        }
+        self.send_json(200, file_object(file_id))
+
+    def create_batch(self):
+        request = self.read_json()
+        batch = {
+            "id": new_id("batch"),
+            "object": "batch",
+            "endpoint": request["endpoint"],
+            "input_file_id": request["input_file_id"],
+            "completion_window": request.get("completion_window", "24h"),
+            "status": "in_progress",
+            "created_at": int(time.time()),
+            "output_file_id": None,
+            "error_file_id": None,
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+        }
+        batches[batch["id"]] = batch
+        threading.Thread(
+            target=run_batch, args=(batch, self.latency, self.error_rate), daemon=True
+        ).start()
+        self.send_json(200, batch)
+
+    def do_GET(self):
+        path = self.path.split("?")[0].rstrip("/")
+        parts = path.split("/")
+        if len(parts) >= 4 and parts[-2] == "batches" and parts[-1] in batches:
+            self.send_json(200, batches[parts[-1]])
+        elif len(parts) >= 5 and parts[-3] == "files" and parts[-1] == "content" and parts[-2] in files:
+            content = files[parts[-2]]["content"]
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+        else:
+            self.send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def do_POST(self):
+        path = self.path.split("?")[0].rstrip("/")
+        if path.endswith("/files"):
+            return self.upload_file()
+        if path.endswith("/batches"):
+            return self.create_batch()
+
+        request = self.read_json()
+        with self._count_lock:
+            FakeOpenAIHandler.requests_served += 1
+
+        if self.latency:
+            time.sleep(random.uniform(0.5, 1.5) * self.latency)
+
+        if random.random() < self.error_rate:
+            if random.random() < 0.5:
+                self.send_json(
+                    429,
+                    {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}},
+                    {"Retry-After": "0.1"},
+                )
+            else:
+                self.send_json(503, {"error": {"message": "Overloaded", "type": "server_error"}})
+            return
+
+        if self.path.rstrip("/").endswith("/responses"):
+            text = json.dumps(fake_analysis(str(request.get("input", ""))))
+            self.send_json(200, response_body(text, request.get("model", "fake")))
+        else:
+            self.send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+
+def serve(port: int = 8765, latency: float = 0.0, error_rate: float = 0.0) -> ThreadingHTTPServer:
+    """Start the fake server on a background thread and return it."""
+    handler = type(
+        "Handler", (FakeOpenAIHandler,), {"latency": latency, "error_rate": error_rate}
+    )
+    server = FakeOpenAIServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@click.command()
+@click.option("--port", type=int, default=8765, show_default=True)
+@click.option("--latency", type=float, default=0.0, show_default=True, help="Mean seconds per response")
+@click.option("--error-rate", type=float, default=0.0, show_default=True, help="Fraction of requests answered with 429/503")
+def main(port: int, latency: float, error_rate: float):
+    """Serve a fake OpenAI-compatible API on 127.0.0.1.
+
+    Individual /v1/responses requests and the batch workflow (/v1/files upload,
+    /v1/batches create and poll, output file download) are supported.
+    """
+    server = serve(port, latency, error_rate)
+    click.echo(f"Fake OpenAI API on http://127.0.0.1:{port}/v1")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""Local stand-in for the news sites, serving the HTML fixtures, for exercising the scrapers offline.
+
+    python3 fake_sites.py --port 8766 --articles 200 --latency 0.05
+
+Each site's list pages are at http://127.0.0.1:8766/<site>/list (paged with `?page=N`)
+and link to --articles article pages, which serve the recorded article fixtures in turn.
+Article pages carry an ETag and answer a matching If-None-Match with 304. With
+--updated, that fraction of the articles gains an update paragraph every
+--update-interval seconds, like a developing story.
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import click
+
+FIXTURES_DIR = "fixtures"
+
+
+def page_chrome(rng: random.Random, site: str, body: str) -> str:
+    """Wrap `body` in the kind of markup surrounding it on a real news page:
+    head scripts, navigation, sidebars with related articles and a footer."""
+    nav = "".join(
+        f'<li class="nav__item"><a href="https://www.{site}.com/kanal-{i}" class="nav__link">Kanal {i}</a></li>'
+        for i in range(60)
+    )
+    related = "".join(
+        f'<div class="box-related"><a href="https://www.{site}.com/related/{rng.randrange(10**7)}">'
+        f'<img src="https://cdn.{site}.com/{rng.randrange(10**7)}.jpg" alt="related"></a>'
+        f'<h3 class="related__title">{"Berita terkait " * rng.randrange(3, 8)}</h3>'
+        f'<span class="related__date">{rng.randrange(1, 28)} Nov 2025</span></div>'
+        for _ in range(40)
+    )
+    tracking = json.dumps(
+        {f"k{i}": "".join(rng.choice("abcdef0123456789") for _ in range(32)) for i in range(200)}
+    )
+    return f"""<!DOCTYPE html>
+<html lang="id"><head><meta charset="utf-8"><title>{site}</title>
+<link rel="stylesheet" href="https://cdn.{site}.com/css/main.css">
+<script type="text/javascript">var dataLayer = [{tracking}];</script>
+<script async src="https://www.googletagmanager.com/gtag/js"></script>
+</head><body>
+<header class="header"><nav class="nav"><ul class="nav__list">{nav}</ul></nav></header>
+<div class="container"><div class="column-8">{body}</div>
+<aside class="column-4 sidebar">{related}</aside></div>
+<footer class="footer"><p>Copyright &copy; 2025 {site}. All rights reserved.</p>
+<script>window.__STATE__ = {tracking};</script></footer>
+</body></html>"""
+
+
+def detik_list(urls: List[str], next_url: Optional[str]) -> str:
+    items = "".join(
+        f'<article class="list-content__item"><div class="media"><a href="{url}" class="media__link">'
+        f'<img src="https://akcdn.detik.net.id/{i}.jpg"></a><h3 class="media__title">Banjir {i}</h3></div></article>'
+        for i, url in enumerate(urls)
+    )
+    next_link = f'<a href="{next_url}">Next</a>' if next_url else ""
+    return (
+        f'<div class="list-content list--feed">{items}</div>'
+        f'<div class="paging text-center"><a href="#">1</a>{next_link}</div>'
+    )
+
+
+def kompas_list(urls: List[str], next_url: Optional[str]) -> str:
+    items = "".join(
+        f'<div class="articleItem"><a class="article-link" href="{url}"><h2 class="articleTitle">Banjir {i}</h2></a></div>'
+        for i, url in enumerate(urls)
+    )
+    next_link = f'<a class="paging__link paging__link--next" href="{next_url}">Next</a>' if next_url else ""
+    return f'<div class="articleList -list">{items}</div><div class="paging">{next_link}</div>'
+
+
+def tribunnews_list(urls: List[str], next_url: Optional[str]) -> str:
+    items = "".join(
+        f'<li class="ptb15"><h3><a href="{url}">Banjir {i}</a></h3></li>'
+        for i, url in enumerate(urls)
+    )
+    return f'<ul class="lsi">{items}</ul>'
+
+
+list_templates = {
+    "detik": detik_list,
+    "kompas": kompas_list,
+    "tribunnews": tribunnews_list,
+}
+
+
+# Opening tag of the element holding an article's paragraphs, where updates are added
+CONTENT_START = re.compile(
+    rb'<div[^>]*class="[^"]*\b(detail__body-text|itp_bodycontent|read__content|txt-article)\b[^"]*"[^>]*>'
+)
+
+
+def load_fixtures(fixtures_dir: str, site: str) -> List[Dict]:
+    """Return the fixture index entries of `site` with their HTML loaded."""
+    with open(os.path.join(fixtures_dir, site, "index.json"), "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    for entry in entries:
+        with open(os.path.join(fixtures_dir, site, entry["file"]), "r", encoding="utf-8", newline="") as f:
+            entry["html"] = f.read()
+    return entries
+
+
+class FakeSitesServer(ThreadingHTTPServer):
+    # The default backlog of 5 makes concurrent clients wait for SYN retransmits
+    request_queue_size = 128
+
+
+class FakeSitesHandler(BaseHTTPRequestHandler):
+    # Keep-alive, like the real sites
+    protocol_version = "HTTP/1.1"
+    articles = 100
+    per_page = 20
+    latency = 0.0
+    error_rate = 0.0
+    capacity = 0
+    crawl_delay = 0.0
+    updated = 0.0
+    update_interval = 60.0
+    started = 0.0
+    in_flight = 0
+    _count_lock = threading.Lock()
+    # `(html, recorded url)` of the article fixtures by site, and list pages built so far
+    pages: Dict[str, List[Tuple[bytes, str]]] = {}
+    list_pages: Dict[tuple, bytes] = {}
+    _pages_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_html(self, status: int, html: bytes, headers: Optional[Dict[str, str]] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(html)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(html)
+
+    def article_url(self, site: str, n: int) -> str:
+        """Local URL of article `n`, ending with the recorded article's own URL so that
+        URL-based checks of the scrapers (e.g. wolipop.detik.com) still apply."""
+        _, original = self.pages[site][n % len(self.pages[site])]
+        return f"http://{self.headers['Host']}/{site}/article/{n}/{original.split('://', 1)[-1]}"
+
+    def article_page(self, site: str, n: int) -> bytes:
+        """HTML of article `n`, with one paragraph per update it has had so far."""
+        html, _ = self.pages[site][n % len(self.pages[site])]
+        if random.Random(f"{site}{n}").random() >= self.updated:
+            return html
+        revision = int((time.time() - self.started) / self.update_interval)
+        if not revision:
+            return html
+        updates = "".join(
+            f"<p>Pembaruan {k}: jumlah korban banjir bertambah menjadi {k * 3} orang.</p>"
+            for k in range(1, revision + 1)
+        ).encode("utf-8")
+        match = CONTENT_START.search(html)
+        return html[: match.end()] + updates + html[match.end() :] if match else html
+
+    def list_page(self, site: str, page: int) -> bytes:
+        """List page `page` of `site`, empty past the last article."""
+        key = (site, self.headers["Host"], page)
+        with self._pages_lock:
+            if key not in self.list_pages:
+                first = (page - 1) * self.per_page
+                urls = [self.article_url(site, n) for n in range(first, min(first + self.per_page, self.articles))]
+                next_url = None
+                if first + self.per_page < self.articles:
+                    next_url = f"http://{self.headers['Host']}/{site}/list?page={page + 1}"
+                body = list_templates[site](urls, next_url)
+                self.list_pages[key] = page_chrome(random.Random(f"{site}{page}"), site, body).encode("utf-8")
+            return self.list_pages[key]
+
+    def do_GET(self):
+        handler = type(self)
+        with self._count_lock:
+            handler.in_flight += 1
+            overloaded = self.capacity and handler.in_flight > self.capacity
+        try:
+            self.respond(overloaded)
+        finally:
+            with self._count_lock:
+                handler.in_flight -= 1
+
+    def respond(self, overloaded: bool):
+        if self.latency:
+            time.sleep(random.uniform(0.5, 1.5) * self.latency)
+
+        url = urlsplit(self.path)
+        if url.path == "/robots.txt":
+            if not self.crawl_delay:
+                return self.send_html(404, b"Not found")
+            return self.send_html(200, f"User-agent: *\nCrawl-delay: {self.crawl_delay:g}\n".encode("utf-8"))
+
+        if overloaded:
+            return self.send_html(503, b"Service unavailable")
+        if random.random() < self.error_rate:
+            return self.send_html(429, b"Too many requests", {"Retry-After": "0.5"})
+
+        parts = url.path.strip("/").split("/")
+        site = parts[0]
+        if site not in self.pages:
+            return self.send_html(404, b"Not found")
+
+        if parts[1:] == ["list"]:
+            try:
+                page = int(parse_qs(url.query).get("page", ["1"])[0])
+            except ValueError:
+                return self.send_html(404, b"Not found")
+            return self.send_html(200, self.list_page(site, page))
+
+        if len(parts) > 2 and parts[1] == "article" and parts[2].isdigit() and int(parts[2]) < self.articles:
+            html = self.article_page(site, int(parts[2]))
+            etag = f'"{hashlib.sha1(html).hexdigest()[:16]}"'
+            if self.headers.get("If-None-Match") == etag:
+                return self.send_html(304, b"", {"ETag": etag})
+            return self.send_html(200, html, {"ETag": etag})
+
+        self.send_html(404, b"Not found")
+
+
+def serve(
+    port: int = 8766,
+    articles: int = 100,
+    per_page: int = 20,
+    latency: float = 0.0,
+    fixtures_dir: str = FIXTURES_DIR,
+    error_rate: float = 0.0,
+    capacity: int = 0,
+    crawl_delay: float = 0.0,
+    updated: float = 0.0,
+    update_interval: float = 60.0,
+) -> ThreadingHTTPServer:
+    """Start the fake sites on a background thread and return the server."""
+    pages = {}
+    for site in list_templates:
+        pages[site] = [
+            (entry["html"].encode("utf-8"), entry["url"])
+            for entry in load_fixtures(fixtures_dir, site)
+            if entry["kind"] == "article"
+        ]
+    handler = type(
+        "Handler",
+        (FakeSitesHandler,),
+        {
+            "articles": articles,
+            "per_page": per_page,
+            "latency": latency,
+            "error_rate": error_rate,
+            "capacity": capacity,
+            "crawl_delay": crawl_delay,
+            "updated": updated,
+            "update_interval": update_interval,
+            "started": time.time(),
+            "pages": pages,
+            "list_pages": {},
+            "in_flight": 0,
+        },
+    )
+    server = FakeSitesServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@click.command()
+@click.option("--port", type=int, default=8766, show_default=True)
+@click.option("--articles", type=click.IntRange(min=0), default=100, show_default=True, help="Articles listed per site")
+@click.option("--per-page", type=click.IntRange(min=1), default=20, show_default=True, help="Article links per list page")
+@click.option("--latency", type=float, default=0.0, show_default=True, help="Mean seconds per response")
+@click.option("--fixtures", "fixtures_dir", type=click.Path(exists=True, file_okay=False), default=FIXTURES_DIR, show_default=True)
+@click.option("--error-rate", type=float, default=0.0, show_default=True, help="Fraction of pages answered with 429 and Retry-After")
+@click.option("--capacity", type=click.IntRange(min=0), default=0, show_default=True, help="Concurrent requests served before answering 503, 0 for no limit")
+@click.option("--crawl-delay", type=float, default=0.0, show_default=True, help="Crawl-delay announced in /robots.txt, 0 for no robots.txt")
+@click.option("--updated", type=click.FloatRange(0, 1), default=0.0, show_default=True, help="Fraction of articles updated in place over time")
+@click.option("--update-interval", type=click.FloatRange(min=0.001), default=60.0, show_default=True, help="Seconds between two updates of an updated article")
+def main(
+    port: int,
+    articles: int,
+    per_page: int,
+    latency: float,
+    fixtures_dir: str,
+    error_rate: float,
+    capacity: int,
+    crawl_delay: float,
+    updated: float,
+    update_interval: float,
+):
+    """Serve the detik, kompas and tribunnews fixtures on 127.0.0.1.
+
+    Overloaded servers are simulated with --capacity and --error-rate, polite
+    crawling with --crawl-delay and live coverage with --updated.
+    """
+    server = serve(
+        port, articles, per_page, latency, fixtures_dir, error_rate, capacity, crawl_delay, updated, update_interval
+    )
+    for site in list_templates:
+        click.echo(f"{site}: http://127.0.0.1:{port}/{site}/list")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
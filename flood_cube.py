@@ -0,0 +1,564 @@
+#!/usr/bin/env python3
+"""Precomputed flood article counts by place, severity, source and date, kept up to date
+incrementally from the analysis results.
+
+    python3 flood_cube.py query --by province --by week --severity severe
+    python3 flood_cube.py serve --port 8790
+
+Queries are answered from `flood_cube.db`, refreshed first with whatever analysis
+output is new, instead of re-reading every result file.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import click
+
+from adapters import sites
+from analysis_cache import BANDS, article_fingerprint, bands
+from corpus_index import CorpusIndex, file_records, is_prefiltered, is_record_file, revision
+from export import local_date, normalize_severity, parse_time
+from gazetteer import Gazetteer
+
+# Folders scanned for analysis results; partial/ holds those of a run still going
+ANALYZED_FOLDERS = ("analyzed", os.path.join("analyzed", "partial"))
+
+# Place value of the rows counting every province or regency at once
+ALL = "*"
+
+DIMENSIONS = ("province", "regency", "severity", "source", "day", "week")
+
+# Bumped when existing cubes must be counted again from the analysis results
+SCHEMA_VERSION = 1
+
+# Largest SimHash Hamming distance between two copies of one story, at most BANDS - 1
+STORY_DISTANCE = 3
+
+Cell = Tuple[str, str]
+
+
+def week_start(day: str) -> str:
+    """Monday of the ISO week of a `YYYY-MM-DD` date, '' if unknown."""
+    parsed = parse_time(day)
+    if parsed is None:
+        return ""
+    return (parsed.date() - timedelta(days=parsed.weekday())).isoformat()
+
+
+def record_digest(record: Dict) -> str:
+    return hashlib.sha1(json.dumps(record, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def place_cells(areas: List[Dict]) -> List[Cell]:
+    """`(province, regency)` cells an article counts in: each affected regency/city, each
+    affected province as a whole, and the country as a whole. An article counts once per
+    cell however many of its areas fall in it. Unknown names are ''."""
+    pairs = {(area.get("province") or "", area.get("regency_or_city") or "") for area in areas}
+    pairs = pairs or {("", "")}
+    provinces = {(province, ALL) for province, _ in pairs}
+    return sorted(pairs | provinces | {(ALL, ALL)})
+
+
+class FloodCube:
+    """SQLite rollup of analyzed articles, counting them by province × regency/city ×
+    severity × source × day (and its ISO week).
+
+    Each cell holds `articles`, the distinct article URLs, and the stories they tell:
+    copies of one story, such as a wire story run by several sites or an article
+    re-titled after an update, are grouped by the SimHash of their title and content
+    (the record's `simhash`) and count as one story in every cell one of them covers.
+    Results analyzed before records carried a `simhash` are fingerprinted from their
+    scraped text, found through `index`.
+
+    Result files are tracked by size and modification time, so `refresh` only reads
+    new or changed ones. A URL seen again with a different analysis has its old counts
+    taken back before the new ones are added, and an unchanged one is skipped, so
+    results merged from analyze.py's checkpoints or appended by pipeline.py are never
+    counted twice.
+
+    Args:
+        path (str): SQLite database file.
+        index (CorpusIndex|None): Scraped articles, for the text of older results;
+            closed with the cube.
+    """
+
+    def __init__(self, path: str = "flood_cube.db", index: Optional[CorpusIndex] = None):
+        self.path = path
+        self.index = index
+        self.gazetteer = Gazetteer.load()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            # Older cubes keyed stories on exact titles, credited each to one
+            # article, and dated articles in UTC: count everything again
+            self._conn.executescript(
+                """
+                DROP TABLE IF EXISTS story;
+                DROP TABLE IF EXISTS story_cell;
+                DROP TABLE IF EXISTS cube;
+                DROP TABLE IF EXISTS article_cell;
+                DROP TABLE IF EXISTS article;
+                DROP TABLE IF EXISTS files;
+                """
+            )
+        self._conn.executescript(
+            f"""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS article (
+                url TEXT PRIMARY KEY,
+                digest TEXT NOT NULL,
+                story TEXT NOT NULL,
+                severity TEXT NOT NULL,
+                source TEXT NOT NULL,
+                day TEXT NOT NULL,
+                week TEXT NOT NULL,
+                revision TEXT NOT NULL DEFAULT '',
+                file TEXT NOT NULL DEFAULT '',
+                prefiltered INTEGER NOT NULL DEFAULT 0,
+                simhash TEXT NOT NULL,
+                {", ".join(f"band{i} INTEGER NOT NULL" for i in range(BANDS))}
+            );
+            {"".join(f"CREATE INDEX IF NOT EXISTS article_band{i} ON article (band{i});" for i in range(BANDS))}
+            CREATE TABLE IF NOT EXISTS article_cell (
+                url TEXT NOT NULL REFERENCES article (url),
+                province TEXT NOT NULL,
+                regency TEXT NOT NULL,
+                PRIMARY KEY (url, province, regency)
+            );
+            CREATE TABLE IF NOT EXISTS cube (
+                province TEXT NOT NULL,
+                regency TEXT NOT NULL,
+                severity TEXT NOT NULL,
+                source TEXT NOT NULL,
+                day TEXT NOT NULL,
+                week TEXT NOT NULL,
+                articles INTEGER NOT NULL,
+                PRIMARY KEY (province, regency, severity, source, day)
+            );
+            CREATE INDEX IF NOT EXISTS cube_place ON cube (regency, province);
+            CREATE INDEX IF NOT EXISTS cube_week ON cube (week);
+            CREATE TABLE IF NOT EXISTS story_cell (
+                story TEXT NOT NULL,
+                province TEXT NOT NULL,
+                regency TEXT NOT NULL,
+                severity TEXT NOT NULL,
+                source TEXT NOT NULL,
+                day TEXT NOT NULL,
+                week TEXT NOT NULL,
+                articles INTEGER NOT NULL,
+                PRIMARY KEY (province, regency, severity, source, day, story)
+            );
+            CREATE INDEX IF NOT EXISTS story_cell_place ON story_cell (regency, province);
+            """
+        )
+        self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._conn.commit()
+
+    def _changed_files(self, folder: str) -> List[str]:
+        if not os.path.exists(folder):
+            return []
+        changed = []
+        for filename in sorted(os.listdir(folder)):
+            path = os.path.join(folder, filename)
+            if not is_record_file(filename) or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            row = self._conn.execute("SELECT size, mtime FROM files WHERE path = ?", (path,)).fetchone()
+            if row != (stat.st_size, stat.st_mtime):
+                changed.append(path)
+        return changed
+
+    def _update_cells(self, url: str, sign: int):
+        """Add (`sign` 1) or take back (-1) the counts of the article stored for `url`,
+        in the cube and among its story's cells."""
+        cells = self._conn.execute(
+            "SELECT province, regency FROM article_cell WHERE url = ?", (url,)
+        ).fetchall()
+        if not cells:
+            # A prefiltered record, which counts nowhere
+            return
+        severity, source, day, week, story = self._conn.execute(
+            "SELECT severity, source, day, week, story FROM article WHERE url = ?", (url,)
+        ).fetchone()
+        self._conn.executemany(
+            """
+            INSERT INTO cube VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (province, regency, severity, source, day) DO UPDATE SET
+                articles = articles + excluded.articles
+            """,
+            [(province, regency, severity, source, day, week, sign) for province, regency in cells],
+        )
+        self._conn.executemany(
+            """
+            INSERT INTO story_cell VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (province, regency, severity, source, day, story) DO UPDATE SET
+                articles = articles + excluded.articles
+            """,
+            [(story, province, regency, severity, source, day, week, sign) for province, regency in cells],
+        )
+
+    def _fingerprint(self, record: Dict) -> str:
+        """The record's `simhash`, or that of its scraped text (its title if that's gone)."""
+        if record.get("simhash"):
+            return record["simhash"]
+        article = self.index.article(record["url"]) if self.index else None
+        if article is not None:
+            return article_fingerprint(article.get("title") or "", article.get("content") or "")
+        return article_fingerprint(record.get("title") or "", "")
+
+    def _story(self, url: str, fingerprint: str) -> str:
+        """Story of the nearest counted copy of the text with `fingerprint`, within
+        `STORY_DISTANCE` bits, or a new story named after `url`."""
+        value = int(fingerprint, 16)
+        conditions = " OR ".join(f"band{i} = ?" for i in range(BANDS))
+        candidates = self._conn.execute(
+            f"SELECT simhash, story, url FROM article WHERE prefiltered = 0 AND ({conditions})",
+            bands(value),
+        ).fetchall()
+        nearest = min(
+            (
+                (bin(int(candidate, 16) ^ value).count("1"), other_url, story)
+                for candidate, story, other_url in candidates
+            ),
+            default=None,
+        )
+        if nearest is None or nearest[0] > STORY_DISTANCE:
+            return url
+        return nearest[2]
+
+    def _remove(self, url: str):
+        self._update_cells(url, -1)
+        self._conn.execute("DELETE FROM article_cell WHERE url = ?", (url,))
+        self._conn.execute("DELETE FROM article WHERE url = ?", (url,))
+
+    def add(self, record: Dict, path: str = "") -> bool:
+        """Count one analyzed record read from `path`, replacing the counts of an earlier
+        revision of the same URL (see `corpus_index.revision`). A record written by the
+        gazetteer prefilter is stored without counting anywhere. Returns whether the cube
+        changed. The caller commits."""
+        url = record.get("url")
+        if not url:
+            return False
+        digest = record_digest(record)
+        prefiltered = is_prefiltered(record)
+        row = self._conn.execute(
+            "SELECT digest, revision, file, prefiltered FROM article WHERE url = ?", (url,)
+        ).fetchone()
+        if row is not None:
+            stored, key = (row[1], row[2]), (revision(record), path)
+            if stored > key or (row[3] == prefiltered and (stored == key or row[0] == digest)):
+                return False
+            self._remove(url)
+
+        published = parse_time(record.get("published_time"))
+        day = local_date(published).isoformat() if published else ""
+        fingerprint = self._fingerprint(record)
+        story = "" if prefiltered else self._story(url, fingerprint)
+        self._conn.execute(
+            f"INSERT INTO article VALUES ({', '.join('?' * (11 + BANDS))})",
+            (
+                url,
+                digest,
+                story,
+                normalize_severity(record.get("flood_severity")),
+                record.get("source") or "",
+                day,
+                week_start(day),
+                revision(record),
+                path,
+                prefiltered,
+                fingerprint,
+                *bands(int(fingerprint, 16)),
+            ),
+        )
+        if prefiltered:
+            return True
+        self._conn.executemany(
+            "INSERT INTO article_cell VALUES (?, ?, ?)",
+            [(url, province, regency) for province, regency in place_cells(self.gazetteer.normalize_areas(record.get("affected_areas")))],
+        )
+        self._update_cells(url, 1)
+        return True
+
+    def refresh(self, folders: Iterable[str] = ANALYZED_FOLDERS) -> int:
+        """Count the records of new or changed result files. Returns the number of
+        articles added or updated."""
+        updated = 0
+        with self._lock:
+            if self.index:
+                for source in sites:
+                    self.index.refresh_source(source)
+            for folder in folders:
+                for path in self._changed_files(folder):
+                    for _, _, record in file_records(path):
+                        updated += self.add(record, path)
+                    stat = os.stat(path)
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO files VALUES (?, ?, ?)",
+                        (path, stat.st_size, stat.st_mtime),
+                    )
+                    self._conn.commit()
+            # Empty cells left by updated analyses
+            self._conn.execute("DELETE FROM cube WHERE articles = 0")
+            self._conn.execute("DELETE FROM story_cell WHERE articles = 0")
+            self._conn.commit()
+        return updated
+
+    def query(
+        self,
+        by: Sequence[str] = (),
+        filters: Optional[Dict[str, Sequence[str]]] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        top: Optional[int] = None,
+    ) -> List[Dict]:
+        """Article and story counts grouped by the dimensions in `by`.
+
+        Args:
+            by (Sequence[str]): Dimensions among `DIMENSIONS` to group by.
+            filters (Dict[str, Sequence[str]]): Accepted values per dimension.
+            since (str|None): First day counted, `YYYY-MM-DD`.
+            until (str|None): Last day counted, `YYYY-MM-DD`.
+            top (int|None): Only the `top` groups with the most articles.
+
+        Returns:
+            List[Dict]: One mapping per group, with its dimension values, `articles`
+                and `stories`. Groups are ordered by their dimensions, or by articles
+                with `top`.
+        """
+        filters = {dimension: list(values) for dimension, values in (filters or {}).items() if values}
+        for dimension in list(by) + list(filters):
+            if dimension not in DIMENSIONS:
+                raise ValueError(f"Unknown dimension: {dimension}")
+
+        # Rows of the place level asked for; other levels hold the same articles again
+        if "regency" in by or "regency" in filters:
+            where = ["regency != ?", "province != ?"]
+        elif "province" in by or "province" in filters:
+            where = ["regency = ?", "province != ?"]
+        else:
+            where = ["regency = ?", "province = ?"]
+        params: List[str] = [ALL, ALL]
+        for dimension, values in filters.items():
+            where.append(f"{dimension} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+        if since:
+            where.append("day >= ?")
+            params.append(since)
+        if until:
+            where.append("day <= ? AND day != ''")
+            params.append(until)
+
+        columns = ", ".join(by)
+        select = f"SELECT {columns + ', ' if by else ''}"
+        group = f" GROUP BY {columns}" if by else ""
+        sql = f"{select}SUM(articles) FROM cube WHERE {' AND '.join(where)}{group}"
+        if top:
+            sql += f" ORDER BY SUM(articles) DESC LIMIT {int(top)}"
+        elif by:
+            sql += f" ORDER BY {columns}"
+        # A story counts once per group, however many of its cells the group spans
+        stories_sql = f"{select}COUNT(DISTINCT story) FROM story_cell WHERE {' AND '.join(where)}{group}"
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+            stories = {tuple(row[:-1]): row[-1] for row in self._conn.execute(stories_sql, params)}
+        return [
+            {**dict(zip(by, row)), "articles": row[len(by)] or 0, "stories": stories.get(tuple(row[:-1]), 0)}
+            for row in rows
+        ]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+        if self.index:
+            self.index.close()
+
+
+def format_rows(rows: List[Dict], by: Sequence[str]) -> List[str]:
+    columns = list(by) + ["articles", "stories"]
+    cells = [[str(row[column]) if row[column] != "" else "(unknown)" for column in columns] for row in rows]
+    widths = [max([len(column)] + [len(cell[i]) for cell in cells]) for i, column in enumerate(columns)]
+    lines = ["  ".join(column.ljust(width) for column, width in zip(columns, widths))]
+    for cell in cells:
+        lines.append("  ".join(value.ljust(width) for value, width in zip(cell, widths)))
+    return lines
+
+
+def parse_query(query: str) -> Dict:
+    """`FloodCube.query` arguments from a URL query string like
+    `by=province&by=week&severity=severe&since=2025-11-01&top=10`."""
+    params = parse_qs(query)
+    top = params.pop("top", [None])[0]
+    return {
+        "by": params.pop("by", []),
+        "since": params.pop("since", [None])[0],
+        "until": params.pop("until", [None])[0],
+        "top": int(top) if top else None,
+        "filters": params,
+    }
+
+
+def serve_cube(cube: FloodCube, port: int, refresh_interval: float) -> ThreadingHTTPServer:
+    """Answer `GET /query?...` with JSON from `cube`, refreshing it at most every
+    `refresh_interval` seconds."""
+    last_refresh = [0.0]
+    refresh_lock = threading.Lock()
+
+    class CubeHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, status: int, body: Dict):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path.rstrip("/") != "/query":
+                return self.send_json(404, {"error": "Not found; use /query"})
+            start = time.perf_counter()
+            with refresh_lock:
+                if time.monotonic() - last_refresh[0] >= refresh_interval:
+                    cube.refresh()
+                    last_refresh[0] = time.monotonic()
+            try:
+                rows = cube.query(**parse_query(url.query))
+            except ValueError as e:
+                return self.send_json(400, {"error": str(e)})
+            self.send_json(200, {"rows": rows, "took_ms": round((time.perf_counter() - start) * 1000, 2)})
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), CubeHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def cube_option(fn):
+    fn = click.option(
+        "--index",
+        "index_path",
+        type=click.Path(dir_okay=False),
+        default="corpus_index.db",
+        show_default=True,
+        help="Corpus index of the scraped articles, to fingerprint results analyzed before they carried a simhash",
+    )(fn)
+    return click.option(
+        "--db",
+        "db_path",
+        type=click.Path(dir_okay=False),
+        default="flood_cube.db",
+        show_default=True,
+        help="SQLite database of the rollups",
+    )(fn)
+
+
+def open_cube(db_path: str, index_path: str) -> FloodCube:
+    return FloodCube(db_path, CorpusIndex(index_path))
+
+
+@click.group()
+def cli():
+    """Flood article counts by place, severity, source and date."""
+    pass
+
+
+@cli.command()
+@cube_option
+def update(db_path: str, index_path: str):
+    """Count the analysis results that are new or changed since the last update."""
+    start = time.perf_counter()
+    cube = open_cube(db_path, index_path)
+    updated = cube.refresh()
+    cube.close()
+    click.echo(f"{updated} articles added or updated in {time.perf_counter() - start:.2f}s")
+
+
+@cli.command()
+@cube_option
+@click.option("--by", type=click.Choice(DIMENSIONS), multiple=True, help="Dimension to group by, repeatable")
+@click.option("--province", multiple=True, help="Only these provinces, repeatable")
+@click.option("--regency", multiple=True, help="Only these regencies/cities, repeatable")
+@click.option("--severity", multiple=True, help="Only these severities (none, mild, moderate, severe, unknown), repeatable")
+@click.option("--source", multiple=True, help="Only these sources, repeatable")
+@click.option("--since", default=None, help="First published day counted, YYYY-MM-DD")
+@click.option("--until", default=None, help="Last published day counted, YYYY-MM-DD")
+@click.option("--top", type=click.IntRange(min=1), default=None, help="Only the groups with the most articles")
+@click.option("--json", "as_json", is_flag=True, help="Print the rows as JSON")
+@click.option("--no-refresh", is_flag=True, help="Answer from the rollups as they are, without reading new results")
+def query(
+    db_path: str,
+    index_path: str,
+    by: Tuple[str, ...],
+    province: Tuple[str, ...],
+    regency: Tuple[str, ...],
+    severity: Tuple[str, ...],
+    source: Tuple[str, ...],
+    since: Optional[str],
+    until: Optional[str],
+    top: Optional[int],
+    as_json: bool,
+    no_refresh: bool,
+):
+    """Count articles (and distinct stories) per group, e.g. severe floods per province per week."""
+    cube = open_cube(db_path, index_path)
+    if not no_refresh:
+        cube.refresh()
+    start = time.perf_counter()
+    rows = cube.query(
+        by,
+        {"province": province, "regency": regency, "severity": severity, "source": source},
+        since,
+        until,
+        top,
+    )
+    took = time.perf_counter() - start
+    cube.close()
+
+    if as_json:
+        click.echo(json.dumps(rows, ensure_ascii=False, indent=2))
+        return
+    for line in format_rows(rows, by):
+        click.echo(line)
+    click.echo(f"{len(rows)} groups in {took * 1000:.1f} ms", err=True)
+
+
+@cli.command()
+@cube_option
+@click.option("--port", type=int, default=8790, show_default=True)
+@click.option(
+    "--refresh-interval",
+    type=click.FloatRange(min=0),
+    default=10.0,
+    show_default=True,
+    help="Seconds between checks for new analysis results",
+)
+def serve(db_path: str, index_path: str, port: int, refresh_interval: float):
+    """Answer queries over HTTP, e.g. http://127.0.0.1:8790/query?by=province&by=week&severity=severe"""
+    cube = open_cube(db_path, index_path)
+    server = serve_cube(cube, port, refresh_interval)
+    click.echo(f"Serving http://127.0.0.1:{port}/query")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        cube.close()
+
+
+if __name__ == "__main__":
+    cli()
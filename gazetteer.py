@@ -0,0 +1,306 @@
+import json
+import os
+import re
+from collections import deque
+from typing import Dict, Generic, Iterable, Iterator, List, NamedTuple, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gazetteer.json")
+
+# Words that mark a flood report in Indonesian news text
+FLOOD_TERMS = (
+    "banjir",
+    "banjir bandang",
+    "banjir rob",
+    "rob",
+    "genangan",
+    "tergenang",
+    "terendam",
+    "merendam",
+    "luapan",
+    "meluap",
+    "air bah",
+)
+
+# The model names the affected area fields inconsistently; the first key present wins
+REGENCY_KEYS = ("regency_or_city", "regency_city", "regency/city", "city_or_regency", "regency", "city")
+AREA_KEYS = ("area", "area_name", "village", "kelurahan")
+
+# Regency/city names that are also everyday words; in article text they only count
+# with a "Kabupaten"/"Kota" prefix
+COMMON_WORD_NAMES = {"banjar", "batang", "batu", "bone", "buru", "kapuas", "kudus", "landak", "metro", "palu", "puncak", "tegal"}
+
+# English compass words and their Indonesian equivalents, which follow the name
+DIRECTIONS = {
+    "north": "utara",
+    "south": "selatan",
+    "east": "timur",
+    "west": "barat",
+    "central": "tengah",
+    "southeast": "tenggara",
+    "southwest": "barat daya",
+}
+DIRECTION_NAMES = {local: english for english, local in DIRECTIONS.items()}
+
+PREFIXES = ("kabupaten", "kab", "kota", "kotamadya", "kota administrasi", "provinsi", "prov", "regency of", "city of", "province of")
+SUFFIXES = ("regency", "city", "province", "municipality")
+PREFIX_KINDS = {"kabupaten": "regency", "kab": "regency", "regency of": "regency", "kota": "city", "kotamadya": "city", "kota administrasi": "city", "city of": "city"}
+SUFFIX_KINDS = {"regency": "regency", "city": "city", "municipality": "city"}
+
+NON_WORD_RE = re.compile(r"[^\w]+", re.UNICODE)
+
+
+class Place(NamedTuple):
+    kind: str  # "province", "regency" or "city"
+    name: str  # Indonesian name, e.g. "Bandung Barat"
+    province: str  # Canonical (English) province name
+
+    @property
+    def canonical(self) -> str:
+        """English name like the model writes it, e.g. "West Bandung Regency"."""
+        if self.kind == "province":
+            return self.province
+        words = self.name.replace(" Bagian", "").split()
+        # Names end with at most one (possibly two-word) direction: "Sumba Barat Daya"
+        for size in (2, 1):
+            direction = " ".join(words[-size:]).lower()
+            if len(words) > size and direction in DIRECTION_NAMES:
+                words = [DIRECTION_NAMES[direction].capitalize()] + words[:-size]
+                break
+        return f"{' '.join(words)} {'Regency' if self.kind == 'regency' else 'City'}"
+
+
+def normalize_name(name: str) -> str:
+    """Lowercase and collapse punctuation and spacing."""
+    return NON_WORD_RE.sub(" ", name.lower()).strip()
+
+
+def place_key(name: str) -> Tuple[str, Optional[str]]:
+    """Reduce a place name in English or Indonesian to a lookup key.
+
+    Returns `(key, kind)` where `kind` is "regency" or "city" when the name said so
+    ("Kabupaten Bandung", "Bandung City") and None otherwise. "West Bandung Regency" and
+    "Kab. Bandung Barat" both give `("bandung barat", "regency")`.
+    """
+    key = normalize_name(name).replace("sumatra", "sumatera")
+    kind = None
+    for prefix in sorted(PREFIXES, key=len, reverse=True):
+        if key.startswith(prefix + " "):
+            key = key[len(prefix) + 1 :]
+            kind = PREFIX_KINDS.get(prefix)
+            break
+    for suffix in SUFFIXES:
+        if key.endswith(" " + suffix):
+            key = key[: -len(suffix) - 1]
+            kind = SUFFIX_KINDS.get(suffix, kind)
+            break
+
+    words = key.split()
+    if len(words) > 1 and words[0] in DIRECTIONS:
+        key = " ".join(words[1:] + [DIRECTIONS[words[0]]])
+    return key, kind
+
+
+class AhoCorasick(Generic[T]):
+    """Multi-pattern matcher finding every pattern occurrence in one pass over the text.
+
+    Patterns are matched case-insensitively and only on word boundaries. Overlapping
+    matches are resolved leftmost-longest, so "Jakarta Selatan" wins over "Jakarta".
+
+    Args:
+        patterns (Iterable[Tuple[str, T]]): `(pattern, value)` pairs. A pattern may
+            carry several values.
+    """
+
+    def __init__(self, patterns: Iterable[Tuple[str, T]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, T]]] = [[]]
+
+        for pattern, value in patterns:
+            pattern = pattern.lower()
+            state = 0
+            for char in pattern:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._out[state].append((len(pattern), value))
+
+        # Breadth-first, so the failure state of a node is always complete before its children
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def _raw_matches(self, text: str) -> Iterator[Tuple[int, int, T]]:
+        state = 0
+        for end, char in enumerate(text, start=1):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for length, value in self._out[state]:
+                start = end - length
+                if (start == 0 or not text[start - 1].isalnum()) and (
+                    end == len(text) or not text[end].isalnum()
+                ):
+                    yield start, end, value
+
+    def search(self, text: str) -> List[Tuple[int, int, List[T]]]:
+        """`(start, end, values)` of the non-overlapping matches in `text`, in order."""
+        by_span: Dict[Tuple[int, int], List[T]] = {}
+        for start, end, value in self._raw_matches(text.lower()):
+            by_span.setdefault((start, end), []).append(value)
+
+        matches = []
+        last_end = 0
+        for (start, end), values in sorted(by_span.items(), key=lambda item: (item[0][0], -item[0][1])):
+            if start >= last_end:
+                matches.append((start, end, values))
+                last_end = end
+        return matches
+
+
+class Gazetteer:
+    """Indonesian provinces and regencies/cities, for finding and normalizing locations.
+
+    Args:
+        provinces (List[Dict]): Entries of `gazetteer.json`, each with the English
+            `province` name, its `local_name`, `aliases`, `regencies` and `cities`.
+    """
+
+    def __init__(self, provinces: List[Dict]):
+        self.places: List[Place] = []
+        self._index: Dict[str, List[Place]] = {}
+        text_patterns = []
+
+        for entry in provinces:
+            province = Place("province", entry["local_name"], entry["province"])
+            self.places.append(province)
+            for name in [entry["province"], entry["local_name"], *entry["aliases"]]:
+                self._add_key(name, province)
+                text_patterns.append((name, province))
+                text_patterns.append((f"provinsi {name}", province))
+
+            for kind, names, prefixes in (
+                ("regency", entry["regencies"], ("kabupaten", "kab.", "kab")),
+                ("city", entry["cities"], ("kota", "kota administrasi")),
+            ):
+                for name in names:
+                    place = Place(kind, name, entry["province"])
+                    self.places.append(place)
+                    self._add_key(name, place)
+                    self._add_key(place.canonical, place)
+                    for prefix in prefixes:
+                        text_patterns.append((f"{prefix} {name}", place))
+                    if name.lower() not in COMMON_WORD_NAMES:
+                        text_patterns.append((name, place))
+
+        self._places_matcher = AhoCorasick(text_patterns)
+        self._flood_matcher = AhoCorasick((term, term) for term in FLOOD_TERMS)
+
+    @classmethod
+    def load(cls, path: str = GAZETTEER_PATH) -> "Gazetteer":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def _add_key(self, name: str, place: Place):
+        key, _ = place_key(name)
+        places = self._index.setdefault(key, [])
+        if place not in places:
+            places.append(place)
+
+    def mentions_flood(self, text: str) -> bool:
+        return bool(self._flood_matcher.search(text))
+
+    def find(self, text: str) -> List[Place]:
+        """Places mentioned in `text`, in order of first mention.
+
+        A bare name shared by a regency and a city ("Bandung") yields both.
+        """
+        found = []
+        for _, _, places in self._places_matcher.search(text):
+            for place in places:
+                if place not in found:
+                    found.append(place)
+        return found
+
+    def lookup(self, name: str, kind: Optional[str] = None) -> List[Place]:
+        """Places whose name matches `name`, in English or Indonesian, with or without
+        "Kabupaten"/"Kota"/"Regency"/"City"."""
+        key, name_kind = place_key(name)
+        kind = kind or name_kind
+        places = self._index.get(key, [])
+        if kind:
+            places = [place for place in places if place.kind == kind]
+        return places
+
+    def normalize_areas(self, areas, mentioned: Optional[List[Place]] = None) -> List[Dict]:
+        """Map the model's `affected_areas` onto canonical regency/city and province names.
+
+        Names that are not in the gazetteer (districts, villages, typos) are kept as
+        written. When a name is ambiguous, the places mentioned in the article decide.
+        Duplicate areas are dropped.
+
+        Returns:
+            List[Dict]: `{"regency_or_city", "province"}` mappings, plus `area` when the
+                model named a finer area.
+        """
+        normalized = []
+        for area in areas if isinstance(areas, list) else []:
+            if not isinstance(area, dict):
+                continue
+            regency = first_value(area, REGENCY_KEYS)
+            province = first_value(area, ("province",))
+            finer_area = first_value(area, AREA_KEYS)
+
+            province_place = None
+            if province:
+                matches = self.lookup(province, "province")
+                province_place = matches[0] if matches else None
+
+            regency_place = None
+            if regency:
+                key, kind = place_key(regency)
+                candidates = [place for place in self._index.get(key, []) if kind is None or place.kind == kind]
+                if province_place:
+                    candidates = [place for place in candidates if place.province == province_place.province]
+                regencies = [place for place in candidates if place.kind != "province"]
+                if len(regencies) > 1 and mentioned:
+                    regencies = [place for place in regencies if place in mentioned] or regencies
+                if len(regencies) == 1:
+                    regency_place = regencies[0]
+                elif not regencies and len(candidates) == 1 and province_place is None:
+                    # The model put a province in the regency field
+                    province_place, regency = candidates[0], None
+                elif regencies and len({place.province for place in regencies}) == 1 and province_place is None:
+                    province_place = self.lookup(regencies[0].province, "province")[0]
+
+            row = {
+                "regency_or_city": regency_place.canonical if regency_place else regency,
+                "province": (
+                    regency_place.province if regency_place else province_place.province if province_place else province
+                ),
+            }
+            if finer_area:
+                row["area"] = finer_area
+            if row not in normalized and any(row.values()):
+                normalized.append(row)
+        return normalized
+
+
+def first_value(area: Dict, keys: Tuple[str, ...]) -> Optional[str]:
+    for key in keys:
+        value = area.get(key)
+        if isinstance(value, str) and value.strip():
+            return value.strip()
+    return None
@@ -0,0 +1,196 @@
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from typing import TYPE_CHECKING, Dict, Optional
+
+# httpx is imported on first use, so that CLIs reading DEFAULT_TTL start fast
+if TYPE_CHECKING:
+    import httpx
+
+# Seconds a cached page is served without revalidation, per URL class
+DEFAULT_TTL = {
+    "list": 10 * 60,
+    "article": 7 * 24 * 60 * 60,
+}
+
+# Response headers kept alongside the body so replayed pages decode the same way
+STORED_HEADERS = ("content-type", "etag", "last-modified")
+
+
+class CacheMiss(Exception):
+    """Raised in offline mode when a URL has never been cached."""
+
+
+class ResponseCache:
+    """On-disk HTTP response cache with conditional-GET revalidation and LRU eviction.
+
+    Bodies are stored zlib-compressed in a SQLite database. Entries younger than the
+    TTL of their URL class are served directly; older ones are revalidated with
+    `If-None-Match`/`If-Modified-Since`. When the compressed bodies exceed `max_bytes`,
+    the least recently used entries are evicted.
+
+    Args:
+        path (str): SQLite database file.
+        max_bytes (int): Size cap for the stored (compressed) bodies.
+        ttl (Dict[str, int]|None): Freshness lifetime in seconds per URL class,
+            merged over `DEFAULT_TTL`.
+        offline (bool): Serve only cached pages, whatever their age, and raise
+            `CacheMiss` for anything else.
+    """
+
+    def __init__(
+        self,
+        path: str = "http_cache.db",
+        max_bytes: int = 512 * 1024 * 1024,
+        ttl: Optional[Dict[str, int]] = None,
+        offline: bool = False,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = {**DEFAULT_TTL, **(ttl or {})}
+        self.offline = offline
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                final_url TEXT NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access);
+            """
+        )
+        self._conn.commit()
+
+    def _load(self, url: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT final_url, headers, body, stored_at FROM responses WHERE url = ?",
+                (url,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE responses SET last_access = ? WHERE url = ?", (time.time(), url)
+            )
+            self._conn.commit()
+
+        final_url, headers, body, stored_at = row
+        return {
+            "final_url": final_url,
+            "headers": json.loads(headers),
+            "body": body,
+            "stored_at": stored_at,
+        }
+
+    @staticmethod
+    def _to_response(entry: Dict) -> "httpx.Response":
+        import httpx
+
+        return httpx.Response(
+            200,
+            headers=entry["headers"],
+            content=zlib.decompress(entry["body"]),
+            request=httpx.Request("GET", entry["final_url"]),
+        )
+
+    def store(self, url: str, response: "httpx.Response"):
+        """Cache a successful response for `url`."""
+        headers = {
+            name: response.headers[name]
+            for name in STORED_HEADERS
+            if name in response.headers
+        }
+        body = zlib.compress(response.content)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, str(response.url), json.dumps(headers), body, len(body), now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits `max_bytes`. Caller holds the lock."""
+        (total,) = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+
+        for url, size in self._conn.execute(
+            "SELECT url, size FROM responses ORDER BY last_access"
+        ).fetchall():
+            self._conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def _revalidated(self, url: str):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE responses SET stored_at = ? WHERE url = ?", (time.time(), url)
+            )
+            self._conn.commit()
+
+    def is_fresh(self, url: str, kind: str = "article") -> bool:
+        """Whether `get` would answer without any network request."""
+        if self.offline:
+            return True
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT stored_at FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+        return row is not None and time.time() - row[0] < self.ttl.get(kind, 0)
+
+    def get(self, client: "httpx.Client", url: str, kind: str = "article", **kwargs) -> "httpx.Response":
+        """GET `url` through the cache.
+
+        Args:
+            client (httpx.Client): Client used when the network has to be hit.
+            url (str): URL to fetch.
+            kind (str): URL class selecting the TTL, e.g. "list" or "article".
+            **kwargs: Passed on to `client.get`.
+
+        Returns:
+            httpx.Response: The cached or freshly downloaded response. Error statuses
+                are returned as-is and never cached.
+        """
+        entry = self._load(url)
+
+        if self.offline:
+            if entry is None:
+                raise CacheMiss(f"{url} is not cached")
+            return self._to_response(entry)
+
+        if entry is not None and time.time() - entry["stored_at"] < self.ttl.get(kind, 0):
+            return self._to_response(entry)
+
+        headers = dict(kwargs.pop("headers", None) or {})
+        if entry is not None:
+            if "etag" in entry["headers"]:
+                headers["If-None-Match"] = entry["headers"]["etag"]
+            if "last-modified" in entry["headers"]:
+                headers["If-Modified-Since"] = entry["headers"]["last-modified"]
+
+        response = client.get(url, headers=headers, **kwargs)
+
+        if response.status_code == 304 and entry is not None:
+            self._revalidated(url)
+            return self._to_response(entry)
+
+        if response.is_success:
+            self.store(url, response)
+        return response
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,207 @@
+import gzip
+import json
+import os
+import textwrap
+from datetime import datetime
+from typing import IO, Callable, Dict, Iterable, Iterator, List, Optional
+
+JSONL_SUFFIXES = (".jsonl", ".jsonl.gz", ".jsonl.zst")
+
+COMPRESSION_SUFFIX = {
+    None: "",
+    "gzip": ".gz",
+    "zstd": ".zst",
+}
+
+
+def _zstd():
+    """Return a module exposing `open()` for zstd files, or raise if none is installed."""
+    try:
+        from compression import zstd  # Python 3.14+
+
+        return zstd
+    except ImportError:
+        pass
+
+    try:
+        import zstandard
+
+        return zstandard
+    except ImportError:
+        raise RuntimeError(
+            "zstd compression requires the `zstandard` package (pip install zstandard)"
+        )
+
+
+def open_jsonl(path: str, mode: str = "r") -> IO[str]:
+    """Open a plain, gzip or zstd compressed JSONL file in text mode based on its suffix."""
+    text_mode = mode.replace("t", "") + "t"
+    if path.endswith(".gz"):
+        return gzip.open(path, text_mode, encoding="utf-8")
+    if path.endswith(".zst"):
+        return _zstd().open(path, text_mode, encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def is_jsonl(filename: str) -> bool:
+    return filename.endswith(JSONL_SUFFIXES)
+
+
+def read_jsonl(path: str) -> Iterator[Dict]:
+    """
+    Yield every record of a JSONL file.
+    A file cut short by a crash is read up to its last complete line.
+    """
+    try:
+        with open_jsonl(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # Only the final line can be partially written
+                    return
+    except EOFError:
+        # Compressed stream without its end marker
+        return
+
+
+def write_json_array(path: str, records: Iterable[Dict]) -> int:
+    """
+    Stream records into `path` as an indented JSON array, like `json.dump(list, f, indent=2)`
+    without holding the list in memory. The file is replaced atomically.
+    Returns the number of records written.
+    """
+    count = 0
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write("[\n" if count == 0 else ",\n")
+            f.write(textwrap.indent(json.dumps(record, indent=2, ensure_ascii=False), "  "))
+            count += 1
+        f.write("\n]" if count else "[]")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return count
+
+
+def iter_records(folder: str) -> Iterator[Dict]:
+    """Yield the records of every JSON array and JSONL file in `folder`, in file name order."""
+    for filename in sorted(os.listdir(folder)):
+        path = os.path.join(folder, filename)
+        if filename.endswith(".json"):
+            with open(path, "r", encoding="utf-8") as f:
+                yield from json.load(f)
+        elif is_jsonl(filename):
+            yield from read_jsonl(path)
+
+
+class JsonlWriter:
+    """Append-only JSONL writer that rotates output files.
+
+    Files are named `<prefix>_<timestamp>_<part>.jsonl` inside `directory`, with a
+    `.gz` or `.zst` suffix when compressed. Plain files are flushed after every record.
+    Compressed ones are flushed only when closed or rotated, unless `sync` is set, since
+    flushing a compressor after each short record ruins its ratio; a crash loses the
+    buffered records, and `read_jsonl` reads such a file up to its last complete line.
+
+    Args:
+        directory (str): Output directory, created if missing.
+        prefix (str): File name prefix.
+        max_records (int|None): Start a new file after this many records.
+        max_bytes (int|None): Start a new file once this many (uncompressed) bytes were written.
+        compression (str|None): None, "gzip" or "zstd".
+        sync (bool): Flush and fsync after every record, so written records survive a
+            power loss and not only a crash of the process.
+        on_flush (callable|None): Called with the records that reached the file, each
+            time the writer flushes.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        prefix: str = "articles",
+        max_records: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        compression: Optional[str] = None,
+        sync: bool = False,
+        on_flush: Optional[Callable[[List[Dict]], None]] = None,
+    ):
+        if compression not in COMPRESSION_SUFFIX:
+            raise ValueError(f"Unsupported compression: {compression}")
+        if compression == "zstd":
+            _zstd()
+
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.prefix = prefix
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.compression = compression
+        self.sync = sync
+        self.on_flush = on_flush
+        self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.paths: List[str] = []
+        self.records_written = 0
+
+        self._file: Optional[IO[str]] = None
+        self._file_records = 0
+        self._file_bytes = 0
+        self._unflushed: List[Dict] = []
+
+    def _flushed(self):
+        records, self._unflushed = self._unflushed, []
+        if records and self.on_flush:
+            self.on_flush(records)
+
+    def _rotate(self):
+        self._close_file()
+        part = len(self.paths) + 1
+        path = os.path.join(
+            self.directory,
+            f"{self.prefix}_{self.timestamp}_{part:04d}.jsonl"
+            + COMPRESSION_SUFFIX[self.compression],
+        )
+        self._file = open_jsonl(path, "w")
+        self._file_records = 0
+        self._file_bytes = 0
+        self.paths.append(path)
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._flushed()
+
+    def write(self, record: Dict):
+        """Append one record, flushing it to disk unless the file is compressed."""
+        if (
+            self._file is None
+            or (self.max_records and self._file_records >= self.max_records)
+            or (self.max_bytes and self._file_bytes >= self.max_bytes)
+        ):
+            self._rotate()
+
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        self._file.write(line)
+        self._file_records += 1
+        self._file_bytes += len(line.encode("utf-8"))
+        self.records_written += 1
+        self._unflushed.append(record)
+        if self.compression is None or self.sync:
+            self._file.flush()
+            if self.sync:
+                os.fsync(self._file.fileno())
+            self._flushed()
+
+    def close(self):
+        self._close_file()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
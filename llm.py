@@ -0,0 +1,134 @@
+import functools
+import random
+import threading
+import time
+from typing import Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+# HTTP statuses worth retrying: rate limiting and server-side failures
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for rate budgeting, about four characters per token."""
+    return len(text) // 4 + 1
+
+
+@functools.lru_cache(maxsize=1)
+def _encoding():
+    """The o200k_base tokenizer if tiktoken and its vocabulary are available, else None."""
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # Not installed, or the vocabulary file couldn't be downloaded
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Token count with the local tokenizer (`pip install tiktoken`), estimated without it."""
+    encoding = _encoding()
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `rate_per_minute`.
+
+    Args:
+        rate_per_minute (float): Tokens added per minute.
+        capacity (float|None): Bucket size, i.e. the largest burst. Defaults to one
+            minute worth of tokens.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1):
+        """Block until `amount` tokens are available and take them."""
+        # A request larger than the bucket could never fit, so clamp it to a full bucket
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                wait = (amount - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute budget shared by all workers.
+
+    Args:
+        rpm (int|None): Maximum requests per minute, None for unlimited.
+        tpm (int|None): Maximum tokens per minute, None for unlimited.
+    """
+
+    def __init__(self, rpm: Optional[int] = None, tpm: Optional[int] = None):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+
+    def acquire(self, tokens: int):
+        if self.requests:
+            self.requests.acquire(1)
+        if self.tokens:
+            self.tokens.acquire(tokens)
+
+
+def is_retryable(error: Exception) -> bool:
+    # Imported here, as the SDK is only loaded once a client is created
+    import openai
+
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRY_STATUSES
+    return False
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Seconds the server asked us to wait, from the Retry-After header if any."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    value = response.headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def call_with_retries(
+    fn: Callable[[], T],
+    max_retries: int = 5,
+    base_delay: float = 1.0,
+    max_delay: float = 60.0,
+) -> T:
+    """Call `fn`, retrying 429/5xx and connection errors with jittered exponential backoff.
+
+    The delay before attempt `n` is drawn uniformly from `[0, min(max_delay, base_delay * 2**n)]`
+    ("full jitter"), or taken from the server's Retry-After header when it sends one.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == max_retries or not is_retryable(e):
+                raise
+            delay = retry_after(e)
+            if delay is None:
+                delay = random.uniform(0, min(max_delay, base_delay * 2**attempt))
+            time.sleep(delay)
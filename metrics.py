@@ -0,0 +1,269 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, Iterator, Optional, Tuple
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+# Upper bounds (seconds) of the stage time histogram buckets, Prometheus' defaults
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRIC_HELP = {
+    "scrape_stage_seconds": "Time spent per request or article in each stage: connect (DNS and TCP), tls, ttfb, download, parse, extract, write",
+    "scrape_responses_total": "HTTP responses received, by status code (cached for fresh cache hits)",
+    "scrape_articles_total": "Articles scraped, by outcome",
+    "scrape_revisits_total": "Articles revisited for updates, by outcome: not_modified, unchanged, changed, failed",
+    "scrape_parse_failures_total": "Pages missing an element the extractor needs, by selector",
+    "scrape_errors_total": "Failed scraper operations, by exception type",
+    "scrape_retries_total": "Requests retried, by status code or connection error",
+    "scrape_host_concurrency": "Current adaptive concurrency window per host",
+}
+
+# httpcore trace phases timed as stages, besides ttfb which spans several of them
+TRACE_STAGES = {
+    "connect_tcp": "connect",
+    "start_tls": "tls",
+    "receive_response_body": "download",
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, object]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+class Metrics:
+    """Thread-safe counters, gauges and stage time histograms.
+
+    Exported in the Prometheus text format (`prometheus_text`) or as a JSON-serializable
+    snapshot (`snapshot`).
+    """
+
+    def __init__(self):
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._gauges: Dict[str, Dict[Labels, float]] = {}
+        # name -> labels -> [bucket counts..., count, sum]
+        self._histograms: Dict[str, Dict[Labels, list]] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def set(self, name: str, value: float, **labels):
+        key = _labels(labels)
+        with self._lock:
+            self._gauges.setdefault(name, {})[key] = value
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = _labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            values = series.setdefault(key, [0] * (len(BUCKETS) + 2))
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    values[i] += 1
+            values[-2] += 1
+            values[-1] += seconds
+
+    @contextmanager
+    def span(self, stage: str, **labels) -> Iterator[None]:
+        """Time the body of the `with` block as `stage`, whether or not it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("scrape_stage_seconds", time.perf_counter() - start, stage=stage, **labels)
+
+    def stage_totals(self) -> Dict[str, Tuple[int, float]]:
+        """`(count, seconds)` per stage, summed over sites, in the order stages were first seen."""
+        totals: Dict[str, Tuple[int, float]] = {}
+        with self._lock:
+            for labels, values in self._histograms.get("scrape_stage_seconds", {}).items():
+                stage = dict(labels).get("stage", "")
+                count, seconds = totals.get(stage, (0, 0.0))
+                totals[stage] = (count + values[-2], seconds + values[-1])
+        return totals
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "timestamp": time.time(),
+                "counters": {
+                    name: [{"labels": dict(labels), "value": value} for labels, value in series.items()]
+                    for name, series in self._counters.items()
+                },
+                "gauges": {
+                    name: [{"labels": dict(labels), "value": value} for labels, value in series.items()]
+                    for name, series in self._gauges.items()
+                },
+                "histograms": {
+                    name: [
+                        {
+                            "labels": dict(labels),
+                            "count": values[-2],
+                            "sum": values[-1],
+                            "buckets": dict(zip(map(str, BUCKETS), values[: len(BUCKETS)])),
+                        }
+                        for labels, values in series.items()
+                    ]
+                    for name, series in self._histograms.items()
+                },
+            }
+
+    def merge(self, snapshot: Dict):
+        """Add the counters and histograms of a `snapshot` (e.g. from a worker process)
+        to this registry, and take over its gauges."""
+        for name, series in snapshot["counters"].items():
+            for entry in series:
+                self.inc(name, entry["value"], **entry["labels"])
+        for name, series in snapshot["gauges"].items():
+            for entry in series:
+                self.set(name, entry["value"], **entry["labels"])
+        with self._lock:
+            for name, series in snapshot["histograms"].items():
+                for entry in series:
+                    values = self._histograms.setdefault(name, {}).setdefault(
+                        _labels(entry["labels"]), [0] * (len(BUCKETS) + 2)
+                    )
+                    for i, bound in enumerate(BUCKETS):
+                        values[i] += entry["buckets"][str(bound)]
+                    values[-2] += entry["count"]
+                    values[-1] += entry["sum"]
+
+    def prometheus_text(self) -> str:
+        lines = []
+        with self._lock:
+            for kind, metrics in (("counter", self._counters), ("gauge", self._gauges)):
+                for name, series in sorted(metrics.items()):
+                    lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+                    lines.append(f"# TYPE {name} {kind}")
+                    for labels, value in series.items():
+                        lines.append(f"{name}{_format_labels(labels)} {value:g}")
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, values in series.items():
+                    for bound, count in zip(BUCKETS, values):
+                        lines.append(f"{name}_bucket{_format_labels(labels, ('le', f'{bound:g}'))} {count}")
+                    lines.append(f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {values[-2]}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {values[-1]:g}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {values[-2]}")
+        return "\n".join(lines) + "\n"
+
+
+# Shared by every scraper unless one is given its own
+registry = Metrics()
+
+
+class RequestTrace:
+    """httpx `trace` extension timing the network stages of one request and its redirects.
+
+    httpcore resolves the host inside its TCP connect, so DNS time is part of `connect`.
+    `ttfb` runs from sending the request headers to receiving the response headers.
+    Stages of a reused keep-alive connection are skipped, as they didn't happen.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self._started: Dict[str, float] = {}
+
+    def __call__(self, event_name: str, info: Dict):
+        now = time.perf_counter()
+        phase, _, state = event_name.rpartition(".")
+        phase = phase.rpartition(".")[2]
+        if state == "started":
+            self._started[phase] = now
+            return
+        if state != "complete" or phase not in self._started:
+            return
+        if phase in TRACE_STAGES:
+            self._add(TRACE_STAGES[phase], now - self._started[phase])
+        elif phase == "receive_response_headers" and "send_request_headers" in self._started:
+            self._add("ttfb", now - self._started["send_request_headers"])
+
+    def _add(self, stage: str, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def record(self, metrics: Metrics, **labels):
+        for stage, seconds in self.stages.items():
+            metrics.observe("scrape_stage_seconds", seconds, stage=stage, **labels)
+
+
+def serve_metrics(metrics: Metrics, port: int) -> "ThreadingHTTPServer":
+    """Serve `metrics` in the Prometheus text format at http://127.0.0.1:<port>/metrics
+    from a background thread, and return the server."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0].rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class MetricsDump:
+    """Write a JSON snapshot of `metrics` to `path` every `interval` seconds, and once
+    more when stopped. Each snapshot replaces the previous one atomically.
+
+    Args:
+        metrics (Metrics): Registry to dump.
+        path (str): Output JSON file.
+        interval (float): Seconds between snapshots.
+    """
+
+    def __init__(self, metrics: Metrics, path: str, interval: float = 10.0):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def write(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.metrics.snapshot(), f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.write()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stopped.set()
+        self._thread.join()
+        self.write()
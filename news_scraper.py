@@ -1,66 +1,524 @@
+import functools
+import itertools
+import json
+import os
 import sys
+import time
 import traceback
-from typing import Optional
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 import httpx
+from bs4 import BeautifulSoup, SoupStrainer, Tag
 from tqdm import tqdm
 
+from adapters import SiteAdapter, sites
+from http_cache import ResponseCache
+from metrics import Metrics, RequestTrace, registry
+from politeness import RETRY_STATUSES, HostScheduler, backoff_delay, parse_retry_after
+from politeness import scheduler as default_scheduler
+from timestamps import parse_timestamp
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class SelectorNotFound(Exception):
+    """Raised when a page lacks an element an extractor needs, e.g. after a site redesign."""
+
+    def __init__(self, selector: str):
+        super().__init__(f"{selector} not found")
+        self.selector = selector
+
+
+def find_required(soup, name: str, **attrs) -> Tag:
+    """`soup.find(name, **attrs)`, raising `SelectorNotFound` instead of returning None."""
+    element = soup.find(name, **attrs)
+    if element is None:
+        selector = name
+        if "class_" in attrs:
+            selector += f".{attrs['class_']}"
+        if "id" in attrs:
+            selector += f"#{attrs['id']}"
+        raise SelectorNotFound(selector)
+    return element
+
+
+def select_required(soup, selector: str) -> Tag:
+    """`soup.select_one(selector)`, raising `SelectorNotFound` instead of returning None."""
+    element = soup.select_one(selector)
+    if element is None:
+        raise SelectorNotFound(selector)
+    return element
+
+
+def error_event(site: str, operation: str, error: BaseException, url: Optional[str] = None) -> Dict:
+    """Describe a failed operation in one flat mapping: what failed, where and why."""
+    event = {
+        "event": "error",
+        "site": site,
+        "operation": operation,
+        "url": url,
+        "error": type(error).__name__,
+        "message": str(error).splitlines()[0][:300] if str(error) else "",
+    }
+    if isinstance(error, SelectorNotFound):
+        event["selector"] = error.selector
+    if isinstance(error, httpx.HTTPStatusError):
+        event["status"] = error.response.status_code
+    # The innermost frame of our own code, e.g. the extractor line, not httpx or find_required
+    frames = [
+        frame
+        for frame in traceback.extract_tb(error.__traceback__)
+        if os.path.dirname(os.path.abspath(frame.filename)) == PROJECT_DIR
+        and frame.name not in ("find_required", "select_required")
+    ]
+    if frames:
+        event["location"] = f"{os.path.basename(frames[-1].filename)}:{frames[-1].lineno} in {frames[-1].name}"
+    return event
+
 
 def err_logger(fn):
-    """Decorator to log errors during scraping."""
+    """Decorator reporting errors during scraping as structured events; the call returns None."""
 
+    @functools.wraps(fn)
     def wrapper(self, *args, **kwargs):
         try:
             return fn(self, *args, **kwargs)
         except Exception as e:
-            _, _, tb = sys.exc_info()
+            url = args[0] if args and isinstance(args[0], str) else kwargs.get("url")
+            self.report_error(fn.__name__, e, url)
+            return None
+
+    return wrapper
 
-            second_to_last_tb = None
-            # Get the frame where the exception actually occurred
-            # The last frame in the traceback is usually where the error happened
-            while tb.tb_next:
-                second_to_last_tb = tb
-                tb = tb.tb_next
 
-            # Access the local variables of that frame
-            local_vars = second_to_last_tb.tb_frame.f_locals
+class SelectorStrainer(SoupStrainer):
+    """SoupStrainer that only builds the subtrees rooted at matching elements.
 
-            traceback.print_exc()
-            print("Local variables at the point of exception:")
-            for var_name, var_value in local_vars.items():
-                print(f"  {var_name}: {var_value}")
+    Each selector is a `(tag, attribute, value)` tuple, e.g. `("div", "class", "read__content")`
+    or `("time", None, None)`. A `None` tag matches any tag. For `class`, `value` only has
+    to be one of the element's classes. Everything outside the matched subtrees, including
+    top-level text, is skipped while parsing.
+    """
 
-            return None
+    def __init__(self, *selectors: Tuple[Optional[str], Optional[str], Optional[str]]):
+        super().__init__()
+        self.selectors = selectors
 
-    return wrapper
+    def allow_tag_creation(self, nsprefix, name, attrs) -> bool:
+        attrs = attrs or {}
+        for tag, attribute, value in self.selectors:
+            if tag is not None and tag != name:
+                continue
+            if attribute is None:
+                return True
+            actual = attrs.get(attribute)
+            if actual is None:
+                continue
+            if attribute == "class":
+                classes = actual.split() if isinstance(actual, str) else actual
+                if value in classes:
+                    return True
+            elif actual == value:
+                return True
+        return False
+
+    def allow_string_creation(self, string: str) -> bool:
+        return False
 
 
 class NewsScraper:
+    """Scraper of a news site described by a `SiteAdapter`.
 
-    def __init__(self, base_url: str):
+    The adapter sets the pagination, the excluded article URLs and the elements kept
+    when parsing partially. Sites with their own extraction code override
+    `parse_list_page` and `parse_article`; the others are read with the adapter's CSS
+    selectors.
+    """
+
+    # Name of the site in metrics and error events, and of its adapter in sites.json
+    site = "news"
+
+    # Number of list pages fetched ahead of the one currently being consumed
+    list_prefetch = 1
+
+    # Elements the extractors read; with partial parsing only these subtrees are built
+    list_strainer: Optional[SelectorStrainer] = None
+    article_strainer: Optional[SelectorStrainer] = None
+
+    def __init__(
+        self,
+        base_url: str,
+        concurrency: int = 1,
+        per_host: Optional[int] = None,
+        cache: Optional[ResponseCache] = None,
+        parser: str = "html.parser",
+        partial_parse: bool = False,
+        metrics: Optional[Metrics] = None,
+        scheduler: Optional[HostScheduler] = None,
+        max_retries: int = 3,
+        progress: bool = True,
+        adapter: Optional[SiteAdapter] = None,
+    ):
         self.base_url = base_url
+        self.adapter = adapter or sites.get(self.site) or SiteAdapter(self.site, base_url)
+        self.site = self.adapter.name
+        self.list_prefetch = self.adapter.list_prefetch
+        if self.adapter.list_selectors:
+            self.list_strainer = SelectorStrainer(*self.adapter.list_selectors)
+        if self.adapter.article_selectors:
+            self.article_strainer = SelectorStrainer(*self.adapter.article_selectors)
+        self.metrics = metrics or registry
+        self.scheduler = scheduler or default_scheduler
+        self.max_retries = max_retries
+        self.progress = progress
+        self.cache = cache
+        # (ETag, Last-Modified) of each article page downloaded, until `pop_validators`
+        self.validators: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+        self.parser = parser
+        self.partial_parse = partial_parse
+        self.concurrency = max(1, concurrency)
+        self.per_host = max(1, per_host or self.concurrency)
         self.client = httpx.Client(
             timeout=30.0,
             headers={
                 "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
             },
+            # Leave room for list page prefetches next to the article workers
+            limits=httpx.Limits(
+                max_connections=self.concurrency + self.list_prefetch,
+                max_keepalive_connections=self.concurrency + self.list_prefetch,
+            ),
         )
 
+    def fetch_robots(self, url: str) -> Optional[str]:
+        """Text of the robots.txt at `url`, None if there is none or it can't be fetched."""
+        if self.cache is not None and self.cache.offline:
+            return None
+        try:
+            response = self.client.get(url, timeout=10.0)
+        except httpx.HTTPError:
+            return None
+        return response.text if response.is_success else None
+
+    def fetch(self, url: str, kind: str = "article", **kwargs) -> httpx.Response:
+        """GET `url` when its host's scheduler allows, and raise on HTTP error statuses.
+
+        429/5xx responses and connection errors are retried up to `self.max_retries`
+        times, after the server's Retry-After (which pauses the whole host) or a
+        jittered backoff. With a response cache configured, the request goes through
+        it; `kind` ("list" or "article") selects the cache TTL, and fresh cached pages
+        are served without waiting for the host. Network stage times, status codes
+        and retries are recorded in `self.metrics`.
+        """
+        if self.cache is not None and self.cache.is_fresh(url, kind):
+            response = self.cache.get(self.client, url, kind=kind, **kwargs)
+            self.metrics.inc("scrape_responses_total", site=self.site, status="cached")
+            return response
+
+        host = self.scheduler.host(url, self.per_host, self.fetch_robots, self.client.headers["User-Agent"])
+        for attempt in itertools.count():
+            trace = RequestTrace()
+            request_kwargs = {**kwargs, "extensions": {**kwargs.get("extensions", {}), "trace": trace}}
+            response, error = None, None
+            status = retry_after = None
+
+            self.scheduler.acquire(host)
+            start = time.perf_counter()
+            try:
+                if self.cache is not None:
+                    response = self.cache.get(self.client, url, kind=kind, **request_kwargs)
+                else:
+                    response = self.client.get(url, **request_kwargs)
+                status = response.status_code
+                retry_after = parse_retry_after(response.headers.get("retry-after"))
+            except httpx.TransportError as e:
+                error = e
+            finally:
+                self.scheduler.release(host, time.perf_counter() - start, status, retry_after)
+            trace.record(self.metrics, site=self.site)
+            self.metrics.set("scrape_host_concurrency", host.window(), host=host.host)
+
+            if response is not None:
+                self.metrics.inc("scrape_responses_total", site=self.site, status=status)
+                if status not in RETRY_STATUSES or attempt >= self.max_retries:
+                    response.raise_for_status()
+                    return response
+                reason = str(status)
+            elif attempt >= self.max_retries:
+                raise error
+            else:
+                reason = type(error).__name__
+
+            self.metrics.inc("scrape_retries_total", site=self.site, reason=reason)
+            if retry_after is None:
+                time.sleep(backoff_delay(attempt))
+
+    def make_soup(self, markup: str, strainer: Optional[SoupStrainer] = None) -> BeautifulSoup:
+        """Parse `markup` with the configured parser, limited to `strainer` when partial parsing is on."""
+        parse_only = strainer if self.partial_parse else None
+        with self.metrics.span("parse", site=self.site):
+            return BeautifulSoup(markup, self.parser, parse_only=parse_only)
+
+    def extract(self, soup: BeautifulSoup, url: str) -> dict:
+        """`parse_article`, timed as the extract stage."""
+        with self.metrics.span("extract", site=self.site):
+            return self.parse_article(soup, url)
+
+    def report_error(self, operation: str, error: BaseException, url: Optional[str] = None):
+        """Count a failed operation and write it to stderr as one JSON line."""
+        event = error_event(self.site, operation, error, url)
+        self.metrics.inc("scrape_errors_total", site=self.site, operation=operation, error=event["error"])
+        if isinstance(error, SelectorNotFound):
+            self.metrics.inc("scrape_parse_failures_total", site=self.site, selector=error.selector)
+        tqdm.write(json.dumps(event, ensure_ascii=False), file=sys.stderr)
+
+    def fetch_soup(self, url: str, kind: str = "article", **kwargs) -> BeautifulSoup:
+        """Fetch `url` and parse the response body."""
+        strainer = self.list_strainer if kind == "list" else self.article_strainer
+        return self.make_soup(self.fetch(url, kind=kind, **kwargs).text, strainer)
+
     @err_logger
     def scrape_article(self, url: str) -> dict:
-        """Scrape a single article page."""
-        return self.do_scrape_article(url)
+        """Scrape a single article page.
+
+        The site's raw `timestamp` is also normalized into `published_at` (ISO 8601 UTC,
+        None when it can't be parsed).
+        """
+        try:
+            result = self.do_scrape_article(url)
+        except Exception:
+            self.metrics.inc("scrape_articles_total", site=self.site, outcome="failed")
+            raise
+        self.metrics.inc("scrape_articles_total", site=self.site, outcome="ok")
+        return result
+
+    def scrape_articles(self, urls: Iterable[str], total: Optional[int] = None) -> Iterator[Tuple[str, Optional[dict]]]:
+        """Scrape many articles with up to `self.concurrency` requests in flight.
+
+        Args:
+            urls (Iterable[str]): Article URLs. Consumed lazily, so a generator works.
+            total (int|None): Expected number of URLs, used for the progress bar.
+
+        Yields:
+            Tuple[str, Optional[dict]]: `(url, result)` pairs in the same order as `urls`.
+                `result` is None when the article failed (already reported by `err_logger`).
+        """
+        prog_bar = tqdm(total=total, desc="Scraping articles", unit="article", disable=not self.progress)
+        # Keep a bounded window of submitted work so a lazy `urls` isn't drained up front
+        window = self.concurrency * 2
+
+        with prog_bar, ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            pending = deque()
+            for url in urls:
+                future = executor.submit(self.scrape_article, url)
+                future.add_done_callback(lambda _: prog_bar.update(1))
+                pending.append((url, future))
+
+                while len(pending) >= window:
+                    url, future = pending.popleft()
+                    yield url, future.result()
+
+            while pending:
+                url, future = pending.popleft()
+                yield url, future.result()
+
+            # `total` is only an upper bound when `urls` is a lazy listing
+            if prog_bar.total != prog_bar.n:
+                prog_bar.total = prog_bar.n
+                prog_bar.refresh()
 
     def do_scrape_article(self, url: str) -> dict:
-        """Actual implementation of scraping a single article. To be overridden by subclasses."""
-        pass
+        """Actual implementation of scraping a single article."""
+        return self.read_article(self.fetch_article(url), url)
+
+    def fetch_article(self, url: str) -> str:
+        """Download an article page and return its HTML. The page's validators are kept
+        for `pop_validators`."""
+        response = self.fetch(url, kind="article", follow_redirects=self.adapter.follow_redirects)
+        self.validators[url] = (response.headers.get("etag"), response.headers.get("last-modified"))
+        return response.text
+
+    def pop_validators(self, url: str) -> Tuple[Optional[str], Optional[str]]:
+        """`(etag, last_modified)` of the article page last downloaded from `url`, for
+        conditional revisits; `(None, None)` if unknown."""
+        return self.validators.pop(url, (None, None))
+
+    def revalidate_article(
+        self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None
+    ) -> Optional[httpx.Response]:
+        """Download an article page again, unless the server says it is unchanged since
+        the response that had validators `etag`/`last_modified`.
+
+        The request always reaches the network ("revisit" has no cache TTL). With a
+        response cache, its own validators are sent instead and a 304 returns the cached
+        page, whose text the caller compares with what it has.
+
+        Returns:
+            httpx.Response|None: The page, None if the server answered 304 Not Modified.
+        """
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        try:
+            return self.fetch(
+                url, kind="revisit", headers=headers, follow_redirects=self.adapter.follow_redirects
+            )
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 304:
+                return None
+            raise
+
+    def read_article(self, html: str, url: str) -> dict:
+        """Parse a downloaded article page and extract its fields, normalizing the site's
+        raw `timestamp` into `published_at`."""
+        result = self.extract(self.make_soup(html, self.article_strainer), url)
+        if result is not None:
+            result["published_at"] = parse_timestamp(result.get("timestamp"))
+        return result
+
+    def parse_article(self, soup: BeautifulSoup, url: str) -> dict:
+        """Extract the article fields from a parsed article page with the adapter's
+        `title`, `timestamp` and `content` CSS selectors. Overridden by site scrapers."""
+        adapter = self.adapter
+        return {
+            "url": url,
+            "title": select_required(soup, adapter.title).text.strip(),
+            "content": adapter.content_separator.join(
+                p.text.strip() for p in soup.select(adapter.content)
+            ),
+            "timestamp": select_required(soup, adapter.timestamp).text.strip() if adapter.timestamp else None,
+        }
 
     @err_logger
-    def scrape_list_page(self, url: Optional[str] = None, limit: int = 10) -> list:
+    def scrape_list_page(self, url: Optional[str] = None, limit: int = 10, skip: Optional[Callable[[str], bool]] = None) -> list:
         """Scrape the list of articles from the main page or category page."""
-        self.prog_bar = tqdm(total=limit, desc="Listing articles", unit="article")
-        return self.do_scrape_list_page(url=url, limit=limit)
+        return list(self.iter_list_page(url=url, limit=limit, skip=skip))
+
+    def iter_list_page(self, url: Optional[str] = None, limit: int = 10, skip: Optional[Callable[[str], bool]] = None) -> Iterator[str]:
+        """Yield article URLs from the list pages as soon as each page is parsed.
+
+        URLs for which `skip` returns True are left out and don't count toward
+        `limit`; listing stops at the first page where every URL is skipped.
+        Errors are reported like `err_logger` does and end the listing early.
+        """
+        self.prog_bar = tqdm(total=limit, desc="Listing articles", unit="article", disable=not self.progress)
+        with self.prog_bar:
+            try:
+                yield from self.do_scrape_list_page(url=url, limit=limit, skip=skip)
+            except Exception as e:
+                self.report_error("iter_list_page", e, url or self.base_url)
+
+    def do_scrape_list_page(self, url: Optional[str] = None, limit: int = 10, skip: Optional[Callable[[str], bool]] = None) -> Iterator[str]:
+        """Scrape list pages and yield article URLs, paginating as the site's adapter says.
+
+        Args:
+            url (str|None): The URL of the list page to scrape. If None, uses `self.base_url`.
+            limit (int): Maximum number of article URLs to yield.
+            skip (Callable[[str], bool]|None): Predicate for URLs to leave out, e.g. ones
+                already scraped. Pagination stops at a page where every URL is skipped.
+
+        Yields:
+            str: Article URLs, as soon as each list page is parsed. "next_link" sites
+                follow each page's next link, prefetching it in the background; "numbered"
+                sites are read from `?page=1`, `?page=2`, ... with `list_prefetch` pages
+                fetched in parallel ahead of time.
+        """
+        target_url = url or self.base_url
+        if self.adapter.pagination == "numbered":
+            separator = "&" if "?" in target_url else "?"
+            return self.walk_numbered_pages(
+                lambda page: f"{target_url}{separator}{self.adapter.page_param}={page}", limit, skip
+            )
+        return self.follow_list_pages(target_url, limit, skip)
+
+    def parse_list_page(self, soup: BeautifulSoup) -> Tuple[List[str], Optional[str]]:
+        """Return the article URLs on a list page and the next page URL, with the adapter's
+        `links` and `next_page` CSS selectors. Overridden by site scrapers."""
+        if not self.adapter.links:
+            return [], None
+        links = [link["href"] for link in soup.select(self.adapter.links) if link.get("href")]
+        next_link = soup.select_one(self.adapter.next_page) if self.adapter.next_page else None
+        return links, next_link.get("href") if next_link is not None else None
+
+    def read_list_page(self, soup: BeautifulSoup) -> Tuple[List[str], Optional[str]]:
+        """`parse_list_page`, without the article URLs the adapter excludes."""
+        links, next_url = self.parse_list_page(soup)
+        return [link for link in links if not self.adapter.excluded(link)], next_url
+
+    @staticmethod
+    def _new_links(links: List[str], skip: Optional[Callable[[str], bool]], seen: set) -> List[str]:
+        """Drop empty links, links already listed in this run and those rejected by `skip`."""
+        fresh = []
+        for link in links:
+            if not link or link in seen or (skip and skip(link)):
+                continue
+            seen.add(link)
+            fresh.append(link)
+        return fresh
+
+    def follow_list_pages(self, url: str, limit: int, skip: Optional[Callable[[str], bool]] = None) -> Iterator[str]:
+        """Walk list pages linked by a "next" link, yielding up to `limit` article URLs.
+
+        The next page is requested in the background as soon as its URL is known,
+        so it downloads while the links of the current page are being consumed.
+        """
+        count = 0
+        seen = set()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(self.fetch_soup, url, "list")
+            try:
+                while future is not None:
+                    page_links, next_url = self.read_list_page(future.result())
+                    links = self._new_links(page_links, skip, seen)
+                    future = None
+                    if page_links and not links:
+                        return
+                    if next_url and count + len(links) < limit:
+                        future = executor.submit(self.fetch_soup, next_url, "list")
+
+                    for link in links:
+                        if count >= limit:
+                            return
+                        self.prog_bar.update(1)
+                        count += 1
+                        yield link
+            finally:
+                if future is not None:
+                    future.cancel()
+
+    def walk_numbered_pages(self, page_url: Callable[[int], str], limit: int, skip: Optional[Callable[[str], bool]] = None) -> Iterator[str]:
+        """Walk list pages addressed by page number, yielding up to `limit` article URLs.
+
+        `self.list_prefetch` pages are requested speculatively in parallel. Listing
+        stops at the first page without articles.
+        """
+        count = 0
+        seen = set()
+        pages = itertools.count(1)
+        with ThreadPoolExecutor(max_workers=self.list_prefetch) as executor:
+            pending = deque(
+                executor.submit(self.fetch_soup, page_url(next(pages)), "list")
+                for _ in range(self.list_prefetch)
+            )
+            try:
+                while pending:
+                    page_links, _ = self.read_list_page(pending.popleft().result())
+                    links = self._new_links(page_links, skip, seen)
+                    if not links:
+                        return
+                    if count + len(links) < limit:
+                        pending.append(executor.submit(self.fetch_soup, page_url(next(pages)), "list"))
 
-    def do_scrape_list_page(self, url: Optional[str] = None, limit: int = 10) -> list:
-        """Actual implementation of scraping the list page. To be overridden by subclasses."""
-        pass
+                    for link in links:
+                        if count >= limit:
+                            return
+                        self.prog_bar.update(1)
+                        count += 1
+                        yield link
+            finally:
+                for future in pending:
+                    future.cancel()
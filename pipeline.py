@@ -0,0 +1,632 @@
+#!/usr/bin/env python3
+"""Scrape and analyze in one streaming run, instead of `scrape.py` then `analyze.py`.
+
+    python3 pipeline.py --limit 200 --fetch-workers 8 --analyze-workers 4
+    python3 pipeline.py --recrawl --max-age 7 --limit 500
+
+List crawling, article downloads, parsing, LLM analysis and saving run as concurrent
+stages connected by bounded queues, so every article is analyzed and saved moments
+after it is downloaded, and a slow stage holds back the ones feeding it. With
+`--recrawl`, recently published articles are revisited instead, and only those whose
+text changed since they were last analyzed are sent to the model again.
+"""
+import os
+import queue
+import statistics
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Optional, Tuple
+
+import click
+from tqdm import tqdm
+
+from adapters import sites
+from analysis_cache import AnalysisCache
+from analyze import (
+    analyze_article,
+    build_analyzed_article,
+    get_gazetteer,
+    prefilter_analysis,
+    prompt_fingerprint,
+)
+from content_trim import ContentTrimmer
+from corpus_index import CorpusIndex
+from crawl_state import REVISIT_OUTCOMES, CrawlState, content_hash
+from jsonl_io import JsonlWriter
+from llm import RateLimiter
+from scrape import cache_options, make_cache, parser_options, site_list_urls
+
+if TYPE_CHECKING:
+    from news_scraper import NewsScraper
+
+# Put on a stage's input queue once per worker when no more items will come
+DONE = object()
+
+
+class Stage:
+    """Workers taking items from `inbox` and putting what `fn` yields for each on `outbox`.
+
+    `fn` is a generator function, so a stage can drop an item or fan it out. A worker
+    stops on `DONE`; the last one to stop passes `DONE` on to every worker of the
+    next stage. Worker time is split into busy (running `fn`), blocked (waiting for
+    room in `outbox`, i.e. backpressure from the next stage) and idle (waiting for
+    input).
+
+    Args:
+        name (str): Stage name, for the report.
+        fn (Callable): Generator function of one item.
+        workers (int): Number of worker threads.
+        inbox (queue.Queue): Input items.
+        outbox (queue.Queue|None): Output items, None for the last stage.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[object], Iterator[object]],
+        workers: int,
+        inbox: queue.Queue,
+        outbox: Optional[queue.Queue] = None,
+    ):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.inbox = inbox
+        self.outbox = outbox
+        # Workers of the stage reading `outbox`, each of which needs a DONE
+        self.downstream_workers = 0
+        self.items_in = 0
+        self.items_out = 0
+        self.failed = 0
+        self.busy = 0.0
+        self.blocked = 0.0
+        self._running = workers
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"{name}-{i}", daemon=True) for i in range(workers)
+        ]
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def _run(self):
+        while True:
+            item = self.inbox.get()
+            if item is DONE:
+                break
+            start = time.perf_counter()
+            blocked, out, failed = 0.0, 0, False
+            try:
+                for result in self.fn(item):
+                    if self.outbox is not None:
+                        put_start = time.perf_counter()
+                        self.outbox.put(result)
+                        blocked += time.perf_counter() - put_start
+                    out += 1
+            except Exception as e:
+                failed = True
+                tqdm.write(f"Error in pipeline stage {self.name}: {e!r}")
+            with self._lock:
+                self.items_in += 1
+                self.items_out += out
+                self.failed += failed
+                self.busy += time.perf_counter() - start - blocked
+                self.blocked += blocked
+
+        with self._lock:
+            self._running -= 1
+            last = self._running == 0
+        if last and self.outbox is not None:
+            for _ in range(self.downstream_workers):
+                self.outbox.put(DONE)
+
+
+def connect(stages: List[Stage]):
+    for stage, downstream in zip(stages, stages[1:]):
+        stage.downstream_workers = downstream.workers
+
+
+class FloodPipeline:
+    """The stages turning list pages into saved analyses.
+
+    Scraped articles are appended to `<output>/<site>/` and their analyses to
+    `analyzed/`, both as JSON Lines, where `analyze.py` and `export.py` pick them up.
+    Articles whose analysis failed are still saved as scraped, for `analyze.py` to retry.
+
+    Args:
+        scrapers (Dict[str, NewsScraper]): Scraper of each site, by site name.
+        state (CrawlState): Crawl state; URLs it has are skipped unless `refetch`.
+        index (CorpusIndex): Manifest of analyzed articles, kept up to date.
+        output (str): Directory holding a folder of scraped articles per site.
+        limit (int): Maximum number of articles listed per site.
+        refetch (bool): Scrape articles even if the crawl state already has them.
+        prefilter (bool): Don't send articles without a flood term or location to the model.
+        analyze_kwargs: Passed on to `analyze.analyze_article`.
+    """
+
+    def __init__(
+        self,
+        scrapers: Dict[str, "NewsScraper"],
+        state: CrawlState,
+        index: CorpusIndex,
+        output: str,
+        limit: int,
+        refetch: bool = False,
+        prefilter: bool = True,
+        **analyze_kwargs,
+    ):
+        self.scrapers = scrapers
+        self.state = state
+        self.index = index
+        self.limit = limit
+        self.refetch = refetch
+        self.prefilter = prefilter
+        self.analyze_kwargs = analyze_kwargs
+        self.scraped_writers = {site: JsonlWriter(os.path.join(output, site)) for site in scrapers}
+        self.analyzed_writer = JsonlWriter("analyzed", prefix="flood_analysis", sync=True)
+        self.prefiltered = 0
+        self.analysis_failed = 0
+        # Seconds from an article's download to its analysis being saved
+        self.latencies: List[float] = []
+        self.prog_bar: Optional[tqdm] = None
+        self._lock = threading.Lock()
+
+    def list_articles(self, site: str) -> Iterator[Tuple[str, str]]:
+        skip = None if self.refetch else self.state.is_known
+        for url in self.scrapers[site].iter_list_page(limit=self.limit, skip=skip):
+            yield site, url
+
+    def fetch(self, item: Tuple[str, str]) -> Iterator[Tuple[str, str, str, float]]:
+        site, url = item
+        scraper_instance = self.scrapers[site]
+        try:
+            html = scraper_instance.fetch_article(url)
+        except Exception as e:
+            scraper_instance.report_error("fetch_article", e, url)
+            scraper_instance.metrics.inc("scrape_articles_total", site=site, outcome="failed")
+            self.state.record(url, None)
+            return
+        yield site, url, html, time.perf_counter()
+
+    def parse(self, item: Tuple[str, str, str, float]) -> Iterator[Tuple[str, Dict, float]]:
+        site, url, html, fetched = item
+        scraper_instance = self.scrapers[site]
+        try:
+            article = scraper_instance.read_article(html, url)
+        except Exception as e:
+            scraper_instance.report_error("read_article", e, url)
+            article = None
+        scraper_instance.metrics.inc(
+            "scrape_articles_total", site=site, outcome="ok" if article else "failed"
+        )
+        if not article:
+            scraper_instance.pop_validators(url)
+            self.state.record(url, None)
+            return
+        yield site, article, fetched
+
+    def analyze(self, item: Tuple[str, Dict, float]) -> Iterator[Tuple[str, Dict, Optional[Dict], float]]:
+        site, article, fetched = item
+        analysis = prefilter_analysis(article) if self.prefilter else None
+        if analysis is not None:
+            with self._lock:
+                self.prefiltered += 1
+            analyzed = build_analyzed_article(site, article, analysis)
+        else:
+            analyzed = analyze_article(site, article, **self.analyze_kwargs)
+        yield site, article, analyzed, fetched
+
+    def save(self, item: Tuple[str, Dict, Optional[Dict], float]) -> Iterator[None]:
+        site, article, analyzed, fetched = item
+        self.scraped_writers[site].write(article)
+        etag, last_modified = self.scrapers[site].pop_validators(article["url"])
+        self.state.record(article["url"], article, source=site, etag=etag, last_modified=last_modified)
+        if analyzed:
+            self.analyzed_writer.write(analyzed)
+            self.index.add_analyzed(self.analyzed_writer.paths[-1], [analyzed], complete=False)
+            self.latencies.append(time.perf_counter() - fetched)
+        else:
+            self.analysis_failed += 1
+        if self.prog_bar is not None:
+            self.prog_bar.update(1)
+        return iter(())
+
+    def run(
+        self,
+        fetch_workers: int,
+        parse_workers: int,
+        analyze_workers: int,
+        queue_size: int,
+    ) -> List[Stage]:
+        """Run the pipeline to completion. Returns its stages, with their statistics."""
+        queues = [queue.Queue(maxsize=queue_size) for _ in range(4)]
+        sites_queue = queue.Queue()
+        stages = [
+            Stage("list", self.list_articles, len(self.scrapers), sites_queue, queues[0]),
+            Stage("fetch", self.fetch, fetch_workers, queues[0], queues[1]),
+            Stage("parse", self.parse, parse_workers, queues[1], queues[2]),
+            Stage("analyze", self.analyze, analyze_workers, queues[2], queues[3]),
+            Stage("save", self.save, 1, queues[3]),
+        ]
+        connect(stages)
+        for site in self.scrapers:
+            sites_queue.put(site)
+        for _ in range(len(self.scrapers)):
+            sites_queue.put(DONE)
+
+        total = self.limit * len(self.scrapers)
+        with tqdm(total=total, desc="Scraping and analyzing", unit="article") as self.prog_bar:
+            for stage in stages:
+                stage.start()
+            for stage in stages:
+                stage.join()
+            # `total` is only an upper bound, as listings can run out
+            self.prog_bar.total = self.prog_bar.n
+            self.prog_bar.refresh()
+        self.prog_bar = None
+        self.close()
+        return stages
+
+    def close(self):
+        for writer in self.scraped_writers.values():
+            writer.close()
+        self.analyzed_writer.close()
+        for path in self.analyzed_writer.paths:
+            self.index.add_analyzed(path, [], complete=True)
+
+
+class RecrawlPipeline(FloodPipeline):
+    """Revisits of recently published articles, re-analyzing only those whose text changed.
+
+    Articles due for a revisit (see `crawl_state.revisit_delay`) are requested
+    conditionally. A 304 answer, or a page whose extracted `content` hashes the same as
+    the recorded one, only reschedules the article. A changed article is saved and
+    analyzed again, and its new content hash recorded once the analysis is saved, so a
+    failed analysis is retried at the next revisit. `limit` is the number of revisits
+    per site.
+
+    Args:
+        max_age (float): Seconds after publication when articles stop being revisited.
+        Other arguments are as for `FloodPipeline`.
+    """
+
+    def __init__(self, *args, max_age: float, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_age = max_age
+        self.outcomes = dict.fromkeys(REVISIT_OUTCOMES, 0)
+        # (ETag, Last-Modified) of the page each article in flight was read from, by URL
+        self._validators: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+
+    def revisited(self, site: str, url: str, outcome: str):
+        """Reschedule the article at `url` and count the outcome of its revisit."""
+        with self._lock:
+            validators = self._validators.pop(url, (None, None))
+            self.outcomes[outcome] += 1
+        if outcome == "failed":
+            validators = (None, None)
+        self.state.record_revisit(url, outcome, *validators)
+        self.scrapers[site].metrics.inc("scrape_revisits_total", site=site, outcome=outcome)
+        if self.prog_bar is not None:
+            self.prog_bar.update(1)
+
+    def list_articles(self, site: str) -> Iterator[Tuple[str, Dict]]:
+        for revisit in self.state.due_revisits(site, self.max_age, limit=self.limit):
+            yield site, revisit
+
+    def fetch(self, item: Tuple[str, Dict]) -> Iterator[Tuple[str, str, str, float]]:
+        site, revisit = item
+        url = revisit["fetch_url"]
+        scraper_instance = self.scrapers[site]
+        try:
+            response = scraper_instance.revalidate_article(url, revisit["etag"], revisit["last_modified"])
+        except Exception as e:
+            scraper_instance.report_error("revalidate_article", e, url)
+            self.revisited(site, url, "failed")
+            return
+        if response is None:
+            self.revisited(site, url, "not_modified")
+            return
+        with self._lock:
+            self._validators[url] = (response.headers.get("etag"), response.headers.get("last-modified"))
+        yield site, url, response.text, time.perf_counter()
+
+    def parse(self, item: Tuple[str, str, str, float]) -> Iterator[Tuple[str, Dict, float]]:
+        site, url, html, fetched = item
+        scraper_instance = self.scrapers[site]
+        try:
+            article = scraper_instance.read_article(html, url)
+        except Exception as e:
+            scraper_instance.report_error("read_article", e, url)
+            article = None
+        if not article:
+            self.revisited(site, url, "failed")
+            return
+        known = self.state.get(url)
+        if known and known["content_hash"] == content_hash(article.get("content") or ""):
+            self.revisited(site, url, "unchanged")
+            return
+        yield site, article, fetched
+
+    def save(self, item: Tuple[str, Dict, Optional[Dict], float]) -> Iterator[None]:
+        site, article, analyzed, fetched = item
+        if not analyzed:
+            self.analysis_failed += 1
+            self.revisited(site, article["url"], "failed")
+            return iter(())
+        self.scraped_writers[site].write(article)
+        self.analyzed_writer.write(analyzed)
+        self.index.add_analyzed(self.analyzed_writer.paths[-1], [analyzed], complete=False)
+        self.state.record(article["url"], article)
+        self.latencies.append(time.perf_counter() - fetched)
+        self.revisited(site, article["url"], "changed")
+        return iter(())
+
+
+def stage_report(stages: List[Stage], elapsed: float) -> List[str]:
+    """Lines of a table of items, throughput and busy/blocked share per stage, ending
+    with the stage whose workers were busiest: the bottleneck."""
+    lines = [f"{'stage':<8} {'workers':>7} {'items':>6} {'failed':>6} {'items/s':>8} {'busy':>6} {'blocked':>8}"]
+    for stage in stages:
+        capacity = stage.workers * elapsed or 1.0
+        lines.append(
+            f"{stage.name:<8} {stage.workers:>7} {stage.items_in:>6} {stage.failed:>6} "
+            f"{stage.items_in / (elapsed or 1.0):>8.1f} {stage.busy / capacity:>6.0%} {stage.blocked / capacity:>8.0%}"
+        )
+    bottleneck = max(stages, key=lambda stage: stage.busy / stage.workers)
+    lines.append(
+        f"Bottleneck: {bottleneck.name} ({bottleneck.busy / (bottleneck.workers * elapsed or 1.0):.0%} busy); "
+        "stages before it spend their time blocked"
+    )
+    return lines
+
+
+@click.command()
+@click.option(
+    "--output",
+    "-o",
+    type=click.Path(file_okay=False),
+    default=".",
+    show_default=True,
+    help="Directory holding a folder of scraped articles per site, named after the site",
+)
+@click.option(
+    "--site",
+    "site_names",
+    type=click.Choice(list(sites)),
+    multiple=True,
+    help="Site to crawl, repeatable (defaults to every site)",
+)
+@click.option(
+    "--url",
+    "url_overrides",
+    multiple=True,
+    metavar="SITE=URL",
+    help="List page to crawl for a site instead of its banjir tag page, repeatable",
+)
+@click.option(
+    "--limit",
+    "-l",
+    type=int,
+    default=10,
+    help="Maximum number of articles to scrape (with --recrawl, to revisit) per site",
+)
+@click.option(
+    "--fetch-workers",
+    type=click.IntRange(min=1),
+    default=8,
+    show_default=True,
+    help="Article pages downloaded in parallel, over all sites",
+)
+@click.option(
+    "--parse-workers",
+    type=click.IntRange(min=1),
+    default=2,
+    show_default=True,
+    help="Article pages parsed in parallel",
+)
+@click.option(
+    "--analyze-workers",
+    type=click.IntRange(min=1),
+    default=4,
+    show_default=True,
+    help="Articles analyzed by the LLM in parallel",
+)
+@click.option(
+    "--queue-size",
+    type=click.IntRange(min=1),
+    default=16,
+    show_default=True,
+    help="Items waiting between two stages before the earlier one is held back",
+)
+@click.option(
+    "--per-host",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Maximum concurrent requests to a single host (defaults to --fetch-workers)",
+)
+@click.option(
+    "--state",
+    "state_path",
+    type=click.Path(dir_okay=False),
+    default="crawl_state.db",
+    show_default=True,
+    help="Crawl-state database recording already scraped URLs",
+)
+@click.option(
+    "--refetch",
+    is_flag=True,
+    help="Scrape articles even if the crawl state already has them",
+)
+@click.option(
+    "--recrawl",
+    is_flag=True,
+    help="Revisit scraped articles that are due instead of crawling the list pages, "
+    "re-analyzing those whose text changed",
+)
+@click.option(
+    "--max-age",
+    type=click.FloatRange(min=0),
+    default=7,
+    show_default=True,
+    help="With --recrawl, days after publication when articles stop being revisited",
+)
+@click.option(
+    "--rpm",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Maximum LLM requests per minute",
+)
+@click.option(
+    "--tpm",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Maximum LLM tokens per minute (estimated from the prompt size)",
+)
+@click.option(
+    "--llm-retries",
+    type=click.IntRange(min=0),
+    default=5,
+    show_default=True,
+    help="Retries for rate-limited (429) and failed (5xx) LLM requests",
+)
+@click.option(
+    "--analysis-cache",
+    "analysis_cache_path",
+    type=click.Path(dir_okay=False),
+    default="analysis_cache.db",
+    show_default=True,
+    help="Database of LLM results reused for articles with the same text",
+)
+@click.option("--no-analysis-cache", is_flag=True, help="Always call the model")
+@click.option(
+    "--index",
+    "index_path",
+    type=click.Path(dir_okay=False),
+    default="corpus_index.db",
+    show_default=True,
+    help="Manifest of scraped and analyzed articles, updated incrementally",
+)
+@click.option(
+    "--max-content-tokens",
+    type=click.IntRange(min=0),
+    default=800,
+    show_default=True,
+    help="Token budget for the article text in the prompt (0 for no limit)",
+)
+@click.option(
+    "--no-trim",
+    is_flag=True,
+    help="Send the article text as scraped, without removing boilerplate or enforcing the budget",
+)
+@click.option(
+    "--no-prefilter",
+    is_flag=True,
+    help="Send every article to the model, even without a flood term or Indonesian location",
+)
+@cache_options
+@parser_options
+def main(
+    output: str,
+    site_names: Tuple[str, ...],
+    url_overrides: Tuple[str, ...],
+    limit: int,
+    fetch_workers: int,
+    parse_workers: int,
+    analyze_workers: int,
+    queue_size: int,
+    per_host: Optional[int],
+    state_path: str,
+    refetch: bool,
+    recrawl: bool,
+    max_age: float,
+    rpm: Optional[int],
+    tpm: Optional[int],
+    llm_retries: int,
+    analysis_cache_path: str,
+    no_analysis_cache: bool,
+    index_path: str,
+    max_content_tokens: int,
+    no_trim: bool,
+    no_prefilter: bool,
+    parser: str,
+    partial_parse: bool,
+    **cache_kwargs,
+):
+    """Scrape the sites and analyze every article as soon as it is downloaded, or with
+    --recrawl, re-analyze the recent articles that were updated since."""
+    cache = make_cache(**cache_kwargs)
+    scrapers = {
+        site: sites.create(
+            site,
+            url,
+            concurrency=fetch_workers,
+            per_host=per_host,
+            cache=cache,
+            parser=parser,
+            partial_parse=partial_parse,
+            progress=False,
+        )
+        for site, url in site_list_urls(site_names, url_overrides).items()
+    }
+
+    analysis_cache = None
+    if not no_analysis_cache:
+        analysis_cache = AnalysisCache(analysis_cache_path, prompt_fingerprint())
+    trimmer = None
+    if not no_trim:
+        trimmer = ContentTrimmer(get_gazetteer(), max_tokens=max_content_tokens or None)
+
+    state = CrawlState(state_path)
+    recrawl_kwargs = {"max_age": max_age * 24 * 60 * 60} if recrawl else {"refetch": refetch}
+    pipeline = (RecrawlPipeline if recrawl else FloodPipeline)(
+        scrapers,
+        state,
+        CorpusIndex(index_path),
+        output,
+        limit,
+        **recrawl_kwargs,
+        prefilter=not no_prefilter,
+        trimmer=trimmer,
+        limiter=RateLimiter(rpm=rpm, tpm=tpm),
+        max_retries=llm_retries,
+        cache=analysis_cache,
+    )
+    start = time.perf_counter()
+    stages = pipeline.run(fetch_workers, parse_workers, analyze_workers, queue_size)
+    elapsed = time.perf_counter() - start
+    state.close()
+
+    print("\nPipeline Summary:")
+    if recrawl:
+        outcomes = (f"{count} {outcome.replace('_', ' ')}" for outcome, count in pipeline.outcomes.items())
+        print(f"Revisited: {', '.join(outcomes)}")
+    for site, writer in pipeline.scraped_writers.items():
+        print(f"{site}: {writer.records_written} articles scraped to {', '.join(writer.paths) or '-'}")
+    print(f"Analyzed: {pipeline.analyzed_writer.records_written} in {elapsed:.1f}s")
+    if pipeline.prefiltered:
+        print(f"Not sent to the model (no flood term or location): {pipeline.prefiltered}")
+    if pipeline.analysis_failed:
+        retry = "retried at the next revisit" if recrawl else "left for analyze.py"
+        print(f"Analysis failed, {retry}: {pipeline.analysis_failed}")
+    if pipeline.latencies:
+        print(
+            f"Download to saved analysis: median {statistics.median(pipeline.latencies):.2f}s, "
+            f"slowest {max(pipeline.latencies):.2f}s"
+        )
+    print("\nStage throughput:")
+    for line in stage_report(stages, elapsed):
+        print(line)
+    if pipeline.analyzed_writer.paths:
+        print(f"\nResults saved to: {', '.join(pipeline.analyzed_writer.paths)}")
+
+
+if __name__ == "__main__":
+    if not os.getenv("OPENAI_API_KEY"):
+        print("Error: OPENAI_API_KEY environment variable is not set")
+    else:
+        main()
@@ -0,0 +1,228 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional
+from urllib.parse import urlsplit
+
+# Responses telling us to slow down, and the ones worth retrying
+CONGESTION_STATUSES = {429, 503}
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+# Longest pause honored from a Retry-After header
+MAX_PAUSE = 300.0
+
+# A host whose average latency exceeds this multiple of its baseline latency is treated
+# as overloaded, like an error response. The baseline follows the lowest average seen,
+# creeping up by BASELINE_DRIFT per response so that a lasting slowdown is accepted.
+LATENCY_FACTOR = 2.0
+BASELINE_DRIFT = 1.02
+# Responses averaged before latency is trusted as a signal
+MIN_SAMPLES = 5
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header, given in seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base_delay: float = 1.0, max_delay: float = 30.0) -> float:
+    """Full-jitter exponential backoff before retry `attempt` (0 for the first retry)."""
+    return random.uniform(0, min(max_delay, base_delay * 2**attempt))
+
+
+class HostState:
+    """Scheduling state of one host: its adaptive concurrency window, request spacing
+    and pause, guarded by `cond`."""
+
+    def __init__(self, host: str, max_concurrency: int):
+        self.host = host
+        self.max_concurrency = max_concurrency
+        self.cond = threading.Condition()
+        self.ready = threading.Event()
+        self.in_flight = 0
+        # Congestion window, grown like TCP: doubling up to `ssthresh`, then by one per window
+        self.limit = 1.0
+        self.ssthresh = float(max_concurrency)
+        self.delay = 0.0
+        self.next_send = 0.0
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.samples = 0
+        self.latency: Optional[float] = None
+        self.base_latency: Optional[float] = None
+
+    def window(self) -> int:
+        return max(1, min(self.max_concurrency, int(self.limit)))
+
+
+class HostScheduler:
+    """Per-host politeness and adaptive concurrency shared by all scrapers in a process.
+
+    Requests to one host are spaced by its robots.txt Crawl-delay (or Request-rate) and
+    limited to a congestion window adapted AIMD-style. The window grows while responses
+    come back fast and succeed. It halves, at most once per round trip, on a 429/5xx, a
+    connection error or rising latency. A Retry-After header pauses the whole host.
+
+    Args:
+        min_delay (float): Seconds between request starts to any one host, at least.
+        robots (bool): Read each host's robots.txt for its crawl delay.
+    """
+
+    def __init__(self, min_delay: float = 0.0, robots: bool = True):
+        self.min_delay = min_delay
+        self.robots = robots
+        self._hosts: Dict[str, HostState] = {}
+        self._lock = threading.Lock()
+
+    def host(self, url: str, max_concurrency: int, fetch_robots: Optional[Callable[[str], Optional[str]]] = None, user_agent: str = "*") -> HostState:
+        """The state of the host of `url`, reading its robots.txt on first use."""
+        parts = urlsplit(url)
+        with self._lock:
+            state = self._hosts.get(parts.netloc)
+            created = state is None
+            if created:
+                state = self._hosts[parts.netloc] = HostState(parts.netloc, max_concurrency)
+                state.delay = self.min_delay
+
+        if created:
+            try:
+                if self.robots and fetch_robots is not None:
+                    text = fetch_robots(f"{parts.scheme}://{parts.netloc}/robots.txt")
+                    state.delay = max(state.delay, robots_delay(text, user_agent))
+            finally:
+                state.ready.set()
+        state.ready.wait()
+
+        with state.cond:
+            state.max_concurrency = max(state.max_concurrency, max_concurrency)
+        return state
+
+    def acquire(self, state: HostState):
+        """Block until a request to the host may start, then count it in flight."""
+        with state.cond:
+            while state.in_flight >= state.window():
+                state.cond.wait()
+            state.in_flight += 1
+            start = max(time.monotonic(), state.next_send, state.paused_until)
+            state.next_send = start + state.delay
+
+        # A Retry-After may arrive from another request while waiting for our turn
+        while True:
+            wait = max(start, state.paused_until) - time.monotonic()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def release(self, state: HostState, latency: float, status: Optional[int], retry_after: Optional[float] = None):
+        """Account for a finished request and adapt the window.
+
+        Args:
+            state (HostState): Host of the request.
+            latency (float): Seconds the request took.
+            status (int|None): Response status, None if the request failed to connect,
+                timed out or broke off.
+            retry_after (float|None): Seconds the server asked us to wait.
+        """
+        now = time.monotonic()
+        with state.cond:
+            state.in_flight -= 1
+            if retry_after:
+                state.paused_until = max(state.paused_until, now + min(retry_after, MAX_PAUSE))
+
+            congested = status is None or status in CONGESTION_STATUSES or status >= 500
+            if not congested:
+                state.samples += 1
+                state.latency = latency if state.latency is None else 0.8 * state.latency + 0.2 * latency
+                if state.samples >= MIN_SAMPLES:
+                    if state.base_latency is None:
+                        state.base_latency = state.latency
+                    state.base_latency = min(state.latency, state.base_latency * BASELINE_DRIFT)
+                    congested = state.latency > LATENCY_FACTOR * state.base_latency
+
+            if congested:
+                # Once per round trip, so a burst of failures doesn't collapse the window
+                if now - state.last_decrease > (state.latency or latency):
+                    state.ssthresh = max(1.0, state.limit / 2)
+                    state.limit = state.ssthresh
+                    state.last_decrease = now
+            elif state.limit < state.ssthresh:
+                state.limit += 1
+            else:
+                state.limit += 1 / state.limit
+            state.limit = min(state.limit, float(state.max_concurrency))
+            state.cond.notify_all()
+
+
+# Seconds per unit of a Request-rate period, e.g. "1/5m"; a bare number is seconds
+RATE_UNITS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+
+def rate_period(period: str) -> float:
+    """Seconds in a Request-rate period such as "10s", "5m", "1h" or "30"."""
+    unit = period[-1].lower()
+    if unit in RATE_UNITS:
+        return float(period[:-1]) * RATE_UNITS[unit]
+    return float(period)
+
+
+# Lines that belong to the group of the User-agent lines above them; others (Sitemap,
+# Host, unknown extensions) don't close the group
+RULE_DIRECTIVES = ("allow", "disallow", "crawl-delay", "request-rate")
+
+
+def robots_delay(text: Optional[str], user_agent: str = "*") -> float:
+    """Seconds between requests asked by a robots.txt, from Crawl-delay or Request-rate.
+
+    The group naming our user agent's product token (compared case-insensitively)
+    wins over the `*` group. Delays may be fractional, which `urllib.robotparser`
+    doesn't accept.
+    """
+    if not text:
+        return 0.0
+    agent = user_agent.split("/")[0].strip().lower()
+    delays: Dict[str, float] = {}
+    group, in_rules = [], False
+    for line in text.splitlines():
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        key, _, value = line.partition(":")
+        key, value = key.strip().lower(), value.strip()
+        if key == "user-agent":
+            if in_rules:
+                group, in_rules = [], False
+            group.append(value.lower())
+            continue
+        if key not in RULE_DIRECTIVES:
+            continue
+        in_rules = True
+        try:
+            if key == "crawl-delay":
+                delay = float(value)
+            elif key == "request-rate":
+                requests, _, seconds = value.partition("/")
+                delay = (rate_period(seconds.split()[0]) if seconds else 1.0) / float(requests)
+            else:
+                continue
+        except (ValueError, ZeroDivisionError, IndexError):
+            continue
+        for name in group:
+            delays[name] = max(delays.get(name, 0.0), delay)
+
+    if agent in delays:
+        return delays[agent]
+    return delays.get("*", 0.0)
+
+
+# Shared by every scraper unless one is given its own
+scheduler = HostScheduler()
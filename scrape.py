@@ -1,46 +1,399 @@
 #!/usr/bin/env python3
 import json
-from datetime import datetime
-from typing import Optional
+import multiprocessing
+import os
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 import click
-from tqdm import tqdm
 
-from detik import DetikScraper
-from kompas import KompasScraper
-from news_scraper import NewsScraper
-from tribunnews import TribunNewsScraper
+from adapters import PARSERS, sites
+from crawl_state import CrawlState
+from http_cache import DEFAULT_TTL, ResponseCache
+from jsonl_io import JsonlWriter, iter_records, write_json_array
+from metrics import MetricsDump, registry, serve_metrics
 
-sites = {
-    "detik": "https://www.detik.com",
-    "kompas": "https://www.kompas.com",
-    "tribunnews": "https://www.tribunnews.com",
-}
-
-scraper = {
-    "detik": DetikScraper,
-    "kompas": KompasScraper,
-    "tribunnews": TribunNewsScraper,
-}
+# The scrapers and tqdm are imported when a command runs, so that --help and other
+# short invocations don't pay for BeautifulSoup and httpx
+if TYPE_CHECKING:
+    from news_scraper import NewsScraper
 
 
 def get_site(url: str) -> Optional[str]:
-    for site_key, site_url in sites.items():
-        if site_url in url:
-            return site_key
-    return None
+    adapter = sites.for_url(url)
+    return adapter.name if adapter else None
 
 
-def get_scraper_instance(base_url: str) -> Optional[NewsScraper]:
+def get_scraper_instance(base_url: str, **kwargs) -> Optional["NewsScraper"]:
     site = get_site(base_url)
 
     if site is None:
         return None
 
-    scraper_class = scraper.get(site)
-    if scraper_class:
-        return scraper_class(base_url)
-    return None
+    return sites.create(site, base_url, **kwargs)
+
+
+def site_list_urls(site_names: Iterable[str], url_overrides: Iterable[str]) -> Dict[str, str]:
+    """List page to crawl per site: the list page of each of `site_names` (every site
+    if empty) in sites.json, unless overridden by a `SITE=URL` of `url_overrides`."""
+    list_urls = {site: sites[site].list_url for site in site_names or sites}
+    for override in url_overrides:
+        site, _, url = override.partition("=")
+        if site not in list_urls or not url:
+            raise click.BadParameter(
+                f"expected SITE=URL with SITE one of {', '.join(list_urls)}", param_hint="--url"
+            )
+        list_urls[site] = url
+    return list_urls
+
+
+def cache_options(fn):
+    """Add the HTTP response cache options to a command."""
+    options = [
+        click.option(
+            "--cache",
+            "cache_path",
+            type=click.Path(dir_okay=False),
+            default=None,
+            help="Cache responses in this database file (e.g. http_cache.db)",
+        ),
+        click.option(
+            "--offline",
+            is_flag=True,
+            help="Serve pages only from the cache, without any network request",
+        ),
+        click.option(
+            "--list-ttl",
+            type=click.IntRange(min=0),
+            default=DEFAULT_TTL["list"],
+            show_default=True,
+            help="Seconds a cached list page is used without revalidation",
+        ),
+        click.option(
+            "--article-ttl",
+            type=click.IntRange(min=0),
+            default=DEFAULT_TTL["article"],
+            show_default=True,
+            help="Seconds a cached article page is used without revalidation",
+        ),
+        click.option(
+            "--cache-size",
+            type=click.IntRange(min=1),
+            default=512,
+            show_default=True,
+            help="Cache size cap in MB; least recently used pages are evicted",
+        ),
+    ]
+    for option in reversed(options):
+        fn = option(fn)
+    return fn
+
+
+def parser_options(fn):
+    """Add the HTML parser options to a command."""
+    fn = click.option(
+        "--partial-parse",
+        is_flag=True,
+        help="Only build the parts of the page the extractors read (experimental)",
+    )(fn)
+    fn = click.option(
+        "--parser",
+        type=click.Choice(PARSERS),
+        default="html.parser",
+        show_default=True,
+        help="BeautifulSoup parser; lxml is faster but must be installed separately, and reads CRLF line breaks as LF",
+    )(fn)
+    return fn
+
+
+def metrics_options(fn):
+    """Add the metrics reporting options to a command."""
+    options = [
+        click.option(
+            "--metrics-port",
+            type=click.IntRange(min=1, max=65535),
+            default=None,
+            help="Serve metrics in the Prometheus text format at http://127.0.0.1:PORT/metrics",
+        ),
+        click.option(
+            "--metrics-file",
+            type=click.Path(dir_okay=False),
+            default=None,
+            help="Dump metrics as JSON to this file periodically and when the run ends",
+        ),
+        click.option(
+            "--metrics-interval",
+            type=click.FloatRange(min=0.1),
+            default=10.0,
+            show_default=True,
+            help="Seconds between metrics dumps",
+        ),
+    ]
+    for option in reversed(options):
+        fn = option(fn)
+    return fn
+
+
+def crawl_options(fn):
+    """Add the options of a bulk crawl (limits, concurrency, output format, crawl state) to a command."""
+    options = [
+        click.option(
+            "--limit", "-l", type=int, default=10, help="Maximum number of articles to scrape"
+        ),
+        click.option(
+            "--concurrency",
+            "-c",
+            type=click.IntRange(min=1),
+            default=1,
+            help="Number of articles fetched in parallel",
+        ),
+        click.option(
+            "--per-host",
+            type=click.IntRange(min=1),
+            default=None,
+            help="Maximum concurrent requests to a single host (defaults to --concurrency); the "
+            "actual number adapts to the host's latency and errors",
+        ),
+        click.option(
+            "--max-retries",
+            type=click.IntRange(min=0),
+            default=3,
+            show_default=True,
+            help="Retries of a request answered with 429/5xx or failing to connect",
+        ),
+        click.option(
+            "--format",
+            "output_format",
+            type=click.Choice(["json", "jsonl"]),
+            default="json",
+            help="json writes one file at the end; jsonl appends each article as soon as it is scraped",
+        ),
+        click.option(
+            "--max-records",
+            type=click.IntRange(min=1),
+            default=None,
+            help="jsonl only: start a new file after this many articles",
+        ),
+        click.option(
+            "--max-bytes",
+            type=click.IntRange(min=1),
+            default=None,
+            help="jsonl only: start a new file after this many bytes",
+        ),
+        click.option(
+            "--compress",
+            type=click.Choice(["none", "gzip", "zstd"]),
+            default="none",
+            help="jsonl only: compress output files",
+        ),
+        click.option(
+            "--state",
+            "state_path",
+            type=click.Path(dir_okay=False),
+            default="crawl_state.db",
+            show_default=True,
+            help="Crawl-state database recording already scraped URLs",
+        ),
+        click.option(
+            "--refetch",
+            is_flag=True,
+            help="Scrape articles even if the crawl state already has them",
+        ),
+    ]
+    for option in reversed(options):
+        fn = option(fn)
+    return fn
+
+
+@contextmanager
+def metrics_reporting(metrics_port: Optional[int], metrics_file: Optional[str], metrics_interval: float):
+    """Expose the scraper metrics while the block runs, then print the time spent per stage."""
+    with ExitStack() as stack:
+        if metrics_port:
+            stack.callback(serve_metrics(registry, metrics_port).shutdown)
+        if metrics_file:
+            stack.enter_context(MetricsDump(registry, metrics_file, metrics_interval))
+        yield
+
+    totals = registry.stage_totals()
+    if totals:
+        click.echo(
+            "Time by stage, summed over workers: "
+            + ", ".join(f"{stage} {seconds:.2f}s ({count})" for stage, (count, seconds) in totals.items()),
+            err=True,
+        )
+
+
+def make_cache(
+    cache_path: Optional[str],
+    offline: bool,
+    list_ttl: int,
+    article_ttl: int,
+    cache_size: int,
+) -> Optional[ResponseCache]:
+    if offline and not cache_path:
+        cache_path = "http_cache.db"
+    if not cache_path:
+        return None
+    return ResponseCache(
+        cache_path,
+        max_bytes=cache_size * 1024 * 1024,
+        ttl={"list": list_ttl, "article": article_ttl},
+        offline=offline,
+    )
+
+
+def record_failures(
+    results: Iterable[Tuple[str, Optional[dict]]],
+    state: CrawlState,
+    scraper: Optional["NewsScraper"] = None,
+) -> Iterator[dict]:
+    """Record the failed scrapes in the crawl state and yield the successful results.
+    These are recorded with `record_saved` once written, so that the articles an
+    interrupted run never saved are scraped again."""
+    for url, result in results:
+        if result:
+            yield result
+            continue
+        if scraper is not None:
+            scraper.pop_validators(url)
+        state.record(url, None)
+
+
+def record_saved(articles: Iterable[dict], state: CrawlState, scraper: Optional["NewsScraper"] = None):
+    """Record written articles as scraped. Articles of `scraper` are scheduled for
+    revisits (see `pipeline.py --recrawl`), with the validators of their pages."""
+    for article in articles:
+        if scraper is None:
+            state.record(article["url"], article)
+            continue
+        etag, last_modified = scraper.pop_validators(article["url"])
+        state.record(article["url"], article, source=scraper.site, etag=etag, last_modified=last_modified)
+
+
+def save_articles(
+    site: str,
+    articles: Iterable[dict],
+    output: str,
+    output_format: str,
+    max_records: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    compress: str = "none",
+    on_saved: Optional[Callable[[List[dict]], None]] = None,
+) -> Tuple[int, List[str]]:
+    """Write `articles` to the `output` directory as one JSON file, or as JSON Lines
+    files written as the articles arrive. `on_saved` is called with the articles once
+    they are written: as each is flushed in JSON Lines (when a compressed file is
+    closed or rotated), all of them after the JSON file is in place. Returns the
+    number written and the files."""
+    if output_format == "jsonl":
+        with JsonlWriter(
+            output,
+            max_records=max_records,
+            max_bytes=max_bytes,
+            compression=None if compress == "none" else compress,
+            on_flush=on_saved,
+        ) as writer:
+            for article in articles:
+                with registry.span("write", site=site):
+                    writer.write(article)
+        return writer.records_written, writer.paths
+
+    results = list(articles)
+    if not results:
+        return 0, []
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_file = f"{output.rstrip('/')}/articles_{timestamp}.json"
+    with registry.span("write", site=site):
+        write_json_array(output_file, results)
+    if on_saved:
+        on_saved(results)
+    return len(results), [output_file]
+
+
+def crawl_site(
+    site: str,
+    list_url: str,
+    options: Dict,
+    state: CrawlState,
+    cache: Optional[ResponseCache],
+    progress: "queue.Queue",
+) -> Dict:
+    """Crawl one site for `scrape-all` as `scrape-bulk` would, saving to `<output>/<site>`.
+
+    `(site, ok)` is put on `progress` for every article attempted. Returns a summary of
+    the crawl: articles saved, failures, files written and seconds taken.
+    """
+    start = time.perf_counter()
+    scraper_instance = sites.create(
+        site,
+        list_url,
+        concurrency=options["concurrency"],
+        per_host=options["per_host"],
+        max_retries=options["max_retries"],
+        cache=cache,
+        parser=options["parser"],
+        partial_parse=options["partial_parse"],
+        progress=False,
+    )
+    failed = 0
+
+    def report(results: Iterable[Tuple[str, Optional[dict]]]) -> Iterator[Tuple[str, Optional[dict]]]:
+        nonlocal failed
+        for url, result in results:
+            failed += result is None
+            progress.put((site, result is not None))
+            yield url, result
+
+    article_urls = scraper_instance.iter_list_page(
+        limit=options["limit"], skip=None if options["refetch"] else state.is_known
+    )
+    scraped = record_failures(
+        report(scraper_instance.scrape_articles(article_urls, total=options["limit"])),
+        state,
+        scraper_instance,
+    )
+    output = os.path.join(options["output"], site)
+    os.makedirs(output, exist_ok=True)
+    written, paths = save_articles(
+        site,
+        scraped,
+        output,
+        options["output_format"],
+        options["max_records"],
+        options["max_bytes"],
+        options["compress"],
+        on_saved=lambda articles: record_saved(articles, state, scraper_instance),
+    )
+    return {
+        "articles": written,
+        "failed": failed,
+        "paths": paths,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def crawl_site_process(
+    site: str,
+    list_url: str,
+    options: Dict,
+    state_path: str,
+    cache_kwargs: Dict,
+    progress: "queue.Queue",
+) -> Dict:
+    """`crawl_site` in a worker process, with its own crawl state and cache connections.
+    The summary also carries the process' metrics, for the parent to merge."""
+    state = CrawlState(state_path)
+    try:
+        summary = crawl_site(site, list_url, options, state, make_cache(**cache_kwargs), progress)
+    finally:
+        state.close()
+    summary["metrics"] = registry.snapshot()
+    return summary
 
 
 @click.group()
@@ -52,9 +405,18 @@ def cli():
 @cli.command()
 @click.argument("url")
 @click.option("--output", "-o", type=click.Path(), help="Output file path (JSON)")
-def scrape_single(url: str, output: Optional[str]):
+@cache_options
+@parser_options
+def scrape_single(
+    url: str, output: Optional[str], parser: str, partial_parse: bool, **cache_kwargs
+):
     """Scrape a single article from the given URL."""
-    scraper = get_scraper_instance(url)
+    scraper = get_scraper_instance(
+        url,
+        cache=make_cache(**cache_kwargs),
+        parser=parser,
+        partial_parse=partial_parse,
+    )
 
     if not scraper:
         click.echo("Unsupported site or unable to determine site from URL.", err=True)
@@ -78,36 +440,256 @@ def scrape_single(url: str, output: Optional[str]):
 @click.option(
     "--output", "-o", type=click.Path(), help="Output directory for JSON files"
 )
-@click.option(
-    "--limit", "-l", type=int, default=10, help="Maximum number of articles to scrape"
-)
-def scrape_bulk(base_url: str, output: Optional[str], limit: int):
+@crawl_options
+@cache_options
+@parser_options
+@metrics_options
+def scrape_bulk(
+    base_url: str,
+    output: Optional[str],
+    limit: int,
+    concurrency: int,
+    per_host: Optional[int],
+    max_retries: int,
+    output_format: str,
+    max_records: Optional[int],
+    max_bytes: Optional[int],
+    compress: str,
+    state_path: str,
+    refetch: bool,
+    parser: str,
+    partial_parse: bool,
+    metrics_port: Optional[int],
+    metrics_file: Optional[str],
+    metrics_interval: float,
+    **cache_kwargs,
+):
     """Scrape multiple articles from the news website."""
-    scraper = get_scraper_instance(base_url)
+    with metrics_reporting(metrics_port, metrics_file, metrics_interval):
+        scraper = get_scraper_instance(
+            base_url,
+            concurrency=concurrency,
+            per_host=per_host,
+            max_retries=max_retries,
+            cache=make_cache(**cache_kwargs),
+            parser=parser,
+            partial_parse=partial_parse,
+        )
 
-    if not scraper:
-        click.echo("Unsupported site or unable to determine site from URL.", err=True)
-        return
+        if not scraper:
+            click.echo("Unsupported site or unable to determine site from URL.", err=True)
+            return
 
-    article_urls = scraper.scrape_list_page(limit=limit)
+        state = CrawlState(state_path)
+        try:
+            # Articles start downloading while later list pages are still being crawled
+            article_urls = scraper.iter_list_page(
+                limit=limit, skip=None if refetch else state.is_known
+            )
+            scraped = record_failures(
+                scraper.scrape_articles(article_urls, total=limit), state, scraper
+            )
 
-    results = []
-    for url in tqdm(article_urls[:limit], desc="Scraping articles", unit="article"):
-        result = scraper.scrape_article(url)
-        if result:
-            results.append(result)
+            if not output:
+                if output_format == "jsonl":
+                    for result in scraped:
+                        click.echo(json.dumps(result, ensure_ascii=False))
+                        record_saved([result], state, scraper)
+                    return
+                results = list(scraped)
+                if results:
+                    click.echo(json.dumps(results, ensure_ascii=False, indent=2))
+                    record_saved(results, state, scraper)
+                else:
+                    click.echo("No articles were successfully scraped.", err=True)
+                return
 
-    if results:
-        if output:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_file = f"{output.rstrip('/')}/articles_{timestamp}.json"
-            with open(output_file, "w", encoding="utf-8") as f:
-                json.dump(results, f, ensure_ascii=False, indent=2)
-            click.echo(f"Articles saved to {output_file}")
+            written, paths = save_articles(
+                scraper.site,
+                scraped,
+                output,
+                output_format,
+                max_records,
+                max_bytes,
+                compress,
+                on_saved=lambda articles: record_saved(articles, state, scraper),
+            )
+            if not written:
+                click.echo("No articles were successfully scraped.", err=True)
+            elif output_format == "jsonl":
+                click.echo(f"{written} articles saved to {', '.join(paths)}")
+            else:
+                click.echo(f"Articles saved to {paths[0]}")
+        finally:
+            state.close()
+
+
+@cli.command()
+@click.option(
+    "--output",
+    "-o",
+    type=click.Path(file_okay=False),
+    default=".",
+    show_default=True,
+    help="Directory holding a folder of results per site, named after the site",
+)
+@click.option(
+    "--site",
+    "site_names",
+    type=click.Choice(list(sites)),
+    multiple=True,
+    help="Site to crawl, repeatable (defaults to every site)",
+)
+@click.option(
+    "--url",
+    "url_overrides",
+    multiple=True,
+    metavar="SITE=URL",
+    help="List page to crawl for a site instead of its banjir tag page, repeatable",
+)
+@click.option(
+    "--processes",
+    is_flag=True,
+    help="Crawl each site in its own process, so HTML parsing of one site doesn't hold up the others",
+)
+@crawl_options
+@cache_options
+@parser_options
+@metrics_options
+def scrape_all(
+    output: str,
+    site_names: Tuple[str, ...],
+    url_overrides: Tuple[str, ...],
+    processes: bool,
+    limit: int,
+    concurrency: int,
+    per_host: Optional[int],
+    max_retries: int,
+    output_format: str,
+    max_records: Optional[int],
+    max_bytes: Optional[int],
+    compress: str,
+    state_path: str,
+    refetch: bool,
+    parser: str,
+    partial_parse: bool,
+    metrics_port: Optional[int],
+    metrics_file: Optional[str],
+    metrics_interval: float,
+    **cache_kwargs,
+):
+    """Scrape every site at the same time, up to --limit articles each.
+
+    Each site has its own connection pool and per-host request budget, and is saved to
+    OUTPUT/<site>. The crawl state and the response cache are shared.
+    """
+    from tqdm import tqdm
+
+    list_urls = site_list_urls(site_names, url_overrides)
+    options = {
+        "output": output,
+        "limit": limit,
+        "concurrency": concurrency,
+        "per_host": per_host,
+        "max_retries": max_retries,
+        "output_format": output_format,
+        "max_records": max_records,
+        "max_bytes": max_bytes,
+        "compress": compress,
+        "refetch": refetch,
+        "parser": parser,
+        "partial_parse": partial_parse,
+    }
+    summaries = {}
+    start = time.perf_counter()
+
+    with ExitStack() as stack:
+        stack.enter_context(metrics_reporting(metrics_port, metrics_file, metrics_interval))
+        if processes:
+            context = multiprocessing.get_context("spawn")
+            progress = stack.enter_context(context.Manager()).Queue()
+            executor = stack.enter_context(
+                ProcessPoolExecutor(max_workers=len(list_urls), mp_context=context)
+            )
+            futures = {
+                executor.submit(
+                    crawl_site_process, site, url, options, state_path, cache_kwargs, progress
+                ): site
+                for site, url in list_urls.items()
+            }
         else:
-            click.echo(json.dumps(results, ensure_ascii=False, indent=2))
-    else:
-        click.echo("No articles were successfully scraped.", err=True)
+            progress = queue.Queue()
+            state = CrawlState(state_path)
+            stack.callback(state.close)
+            cache = make_cache(**cache_kwargs)
+            executor = stack.enter_context(ThreadPoolExecutor(max_workers=len(list_urls)))
+            futures = {
+                executor.submit(crawl_site, site, url, options, state, cache, progress): site
+                for site, url in list_urls.items()
+            }
+
+        counts = {site: 0 for site in list_urls}
+        with tqdm(total=limit * len(list_urls), desc="Scraping articles", unit="article") as prog_bar:
+            while not all(future.done() for future in futures) or not progress.empty():
+                try:
+                    site, _ = progress.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                counts[site] += 1
+                prog_bar.set_postfix(counts, refresh=False)
+                prog_bar.update(1)
+
+        for future, site in futures.items():
+            try:
+                summaries[site] = future.result()
+            except Exception as e:
+                click.echo(f"{site}: crawl failed: {e!r}", err=True)
+                continue
+            if "metrics" in summaries[site]:
+                registry.merge(summaries[site].pop("metrics"))
+
+    elapsed = time.perf_counter() - start
+    click.echo("\nScrape Summary:")
+    for site, summary in summaries.items():
+        saved = f" saved to {', '.join(summary['paths'])}" if summary["paths"] else ""
+        click.echo(
+            f"{site}: {summary['articles']} articles, {summary['failed']} failed "
+            f"in {summary['seconds']:.1f}s{saved}"
+        )
+    click.echo(
+        f"Total: {sum(summary['articles'] for summary in summaries.values())} articles "
+        f"in {elapsed:.1f}s (sites summed: {sum(summary['seconds'] for summary in summaries.values()):.1f}s)"
+    )
+
+
+@cli.command()
+@click.argument("folders", nargs=-1, required=True, type=click.Path(exists=True, file_okay=False))
+@click.option(
+    "--state",
+    "state_path",
+    type=click.Path(dir_okay=False),
+    default="crawl_state.db",
+    show_default=True,
+    help="Crawl-state database to update",
+)
+def index_existing(folders: Tuple[str, ...], state_path: str):
+    """Mark the articles already saved in FOLDERS as scraped.
+
+    Articles of a folder named after a site (e.g. `detik`) are also scheduled for revisits.
+    """
+    state = CrawlState(state_path)
+    try:
+        for folder in folders:
+            fetched_at = datetime.fromtimestamp(os.path.getmtime(folder), timezone.utc)
+            site = os.path.basename(os.path.normpath(folder))
+            added = state.import_articles(
+                iter_records(folder),
+                fetched_at.isoformat(timespec="seconds"),
+                source=site if site in sites else None,
+            )
+            click.echo(f"{folder}: {added} new URLs indexed")
+    finally:
+        state.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,42 @@
+import pytest
+
+from timestamps import parse_timestamp
+
+# Raw timestamps in each site's format and their expected ISO 8601 UTC value
+TIMESTAMP_CASES = [
+    # Detik: abbreviated months, zero-padded days
+    ("Senin, 10 Nov 2025 17:43 WIB", "2025-11-10T10:43:00Z"),
+    ("Rabu, 05 Nov 2025 22:30 WIB", "2025-11-05T15:30:00Z"),
+    ("Jumat, 31 Okt 2025 23:54 WIB", "2025-10-31T16:54:00Z"),
+    ("Sabtu, 02 Agu 2025 07:05 WIB", "2025-08-02T00:05:00Z"),
+    ("Kamis, 01 Jan 2026 00:00 WIB", "2025-12-31T17:00:00Z"),
+    ("Selasa, 30 Des 2025 12:00 WITA", "2025-12-30T04:00:00Z"),
+    ("Senin, 29 Sep 2025 22:17 WIT", "2025-09-29T13:17:00Z"),
+    # Kompas: full month names, and the numeric form
+    ("Kompas.com, 9 November 2025, 19:43 WIB", "2025-11-09T12:43:00Z"),
+    ("Kompas.com, 31 Oktober 2025, 23:27 WIB", "2025-10-31T16:27:00Z"),
+    ("Kompas.com - 29/10/2025, 21:04 WIB", "2025-10-29T14:04:00Z"),
+    ("Kompas.com - 01/02/2025, 08:15 WITA", "2025-02-01T00:15:00Z"),
+    # Tribunnews: full month names, unpadded days
+    ("Jumat, 28 Maret 2025 21:50 WIB", "2025-03-28T14:50:00Z"),
+    ("Selasa, 8 Juli 2025 23:04 WIB", "2025-07-08T16:04:00Z"),
+    ("Minggu, 21 September 2025 06:00 WIB", "2025-09-20T23:00:00Z"),
+    ("Rabu, 21 Mei 2025 05:23 WIB", "2025-05-20T22:23:00Z"),
+    ("Kamis, 14 Agustus 2025 10:30 WIB", "2025-08-14T03:30:00Z"),
+    ("Senin, 3 Februari 2025 13:00 WIB", "2025-02-03T06:00:00Z"),
+    # Variants: no zone (Jakarta time), seconds, dotted times, "pukul"
+    ("Senin, 10 Nov 2025 17:43", "2025-11-10T10:43:00Z"),
+    ("10 Nov 2025 17:43:21 WIB", "2025-11-10T10:43:21Z"),
+    ("Senin, 10 November 2025 pukul 17.43 WIB", "2025-11-10T10:43:00Z"),
+    ("Senin, 10 Nopember 2025 17:43 wib", "2025-11-10T10:43:00Z"),
+    # Not timestamps
+    ("", None),
+    ("Kompas.com", None),
+    ("Senin, 31 Februari 2025 10:00 WIB", None),
+    ("Senin, 10 Foo 2025 17:43 WIB", None),
+]
+
+
+@pytest.mark.parametrize("text, expected", TIMESTAMP_CASES)
+def test_parse_timestamp(text, expected):
+    assert parse_timestamp(text) == expected
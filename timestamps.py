@@ -0,0 +1,88 @@
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+# Indonesian month names and the abbreviations the sites use, lowercased
+MONTHS = {
+    "jan": 1, "januari": 1,
+    "feb": 2, "februari": 2, "pebruari": 2,
+    "mar": 3, "maret": 3,
+    "apr": 4, "april": 4,
+    "mei": 5,
+    "jun": 6, "juni": 6,
+    "jul": 7, "juli": 7,
+    "agu": 8, "agt": 8, "ags": 8, "agus": 8, "agustus": 8,
+    "sep": 9, "sept": 9, "september": 9,
+    "okt": 10, "oktober": 10,
+    "nov": 11, "nop": 11, "november": 11, "nopember": 11,
+    "des": 12, "desember": 12,
+}
+
+# Indonesian time zones; timestamps without one are in Jakarta time
+ZONES = {
+    "WIB": timezone(timedelta(hours=7)),
+    "WITA": timezone(timedelta(hours=8)),
+    "WIT": timezone(timedelta(hours=9)),
+}
+DEFAULT_ZONE = "WIB"
+
+# Matches, after an optional weekday or "Kompas.com" prefix:
+#   Detik       "Senin, 10 Nov 2025 17:43 WIB"
+#   Kompas      "Kompas.com, 9 November 2025, 19:43 WIB" and "Kompas.com - 29/10/2025, 21:04 WIB"
+#   Tribunnews  "Jumat, 28 Maret 2025 21:50 WIB"
+TIMESTAMP_RE = re.compile(
+    r"""
+    (?:
+        (?P<day>\d{1,2})\s+(?P<month_name>[A-Za-z]+)\.?\s+(?P<year>\d{4})
+        |
+        (?P<nday>\d{1,2})[/-](?P<nmonth>\d{1,2})[/-](?P<nyear>\d{4})
+    )
+    [\s,|-]*
+    (?:pukul\s+)?
+    (?P<hour>\d{1,2})[:.](?P<minute>\d{2})(?:[:.](?P<second>\d{2}))?
+    \s*(?P<zone>WITA|WIB|WIT)?
+    """,
+    re.VERBOSE | re.IGNORECASE,
+)
+
+
+def parse_timestamp_datetime(text: Optional[str]) -> Optional[datetime]:
+    """Parse a scraped Indonesian timestamp into an aware datetime, None if it isn't one."""
+    if not text:
+        return None
+    match = TIMESTAMP_RE.search(text)
+    if match is None:
+        return None
+
+    if match["day"]:
+        month = MONTHS.get(match["month_name"].lower())
+        if month is None:
+            return None
+        day, year = int(match["day"]), int(match["year"])
+    else:
+        day, month, year = int(match["nday"]), int(match["nmonth"]), int(match["nyear"])
+
+    zone = ZONES[(match["zone"] or DEFAULT_ZONE).upper()]
+    try:
+        return datetime(
+            year,
+            month,
+            day,
+            int(match["hour"]),
+            int(match["minute"]),
+            int(match["second"] or 0),
+            tzinfo=zone,
+        )
+    except ValueError:
+        return None
+
+
+def parse_timestamp(text: Optional[str]) -> Optional[str]:
+    """Convert a scraped Indonesian timestamp to ISO 8601 UTC (`2025-11-10T10:43:00Z`).
+
+    Returns None when `text` is not a recognizable timestamp.
+    """
+    parsed = parse_timestamp_datetime(text)
+    if parsed is None:
+        return None
+    return parsed.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")